@@ -1,6 +1,8 @@
 import streamlit as st
 from datetime import datetime, date
 import json
+import os
+import uuid
 from typing import Optional
 import base64
 import pandas as pd
@@ -17,33 +19,53 @@ def auto_run_sorteo():
         now = now_utc.astimezone(tz)
         
         try:
-            from lib.appwrite_client import get_settings, get_participants, update_settings, update_participant_assignment
-            from lib.sorteo import perform_sorteo, validate_assignments
+            from lib.repository import get_repository
+            from lib.sorteo import perform_sorteo_batch, validate_assignments, new_seed, create_audit_record
+            from lib.assignment_store import commit_draw, reset_draw
             
-            settings = get_settings()
+            repo = get_repository()
+            # Sin caché: una copia vencida permitiría sortear dos veces
+            settings = repo.get_settings_uncached()
             
             # Ejecutar solo si no se ha hecho y ya es la fecha
             if not settings.get('sorteo_completed', False) and now >= sorteo_time:
-                participants = get_participants()
-                
                 # REGLA: Ignorar categoría Élite (se queda como está)
-                elite_parts = [] 
                 # REGLA: Procesar solo categoría Diversión
-                div_parts = [{'id': p['id'], 'category': p['category']} for p in participants if p['category'] == 'diversion']
+                # Solo se traen id y categoría: el sorteo no necesita el resto del documento
+                div_parts = repo.get_participants_by_category('diversion', fields=['id', 'category'])
                 
                 if len(div_parts) >= 2:
                     try:
-                        assignments = perform_sorteo(elite_parts, div_parts)
+                        seed = new_seed()
+                        result = perform_sorteo_batch({'diversion': div_parts}, seed=seed)
+                        if result['errors']:
+                            raise Exception('; '.join(result['errors'].values()))
+                        assignments = result['assignments']
                         
                         # Validar solo los participantes de diversión porque los elite fueron excluidos
                         validation = validate_assignments(div_parts, assignments)
                         
                         if validation['valid']:
-                            for participant_id, assigned_to_id in assignments.items():
-                                update_participant_assignment(participant_id, assigned_to_id)
+                            audit = create_audit_record(div_parts, assignments, seed)
+                            try:
+                                # Todo el sorteo en un solo documento (una escritura)
+                                snapshot = commit_draw(repo, assignments, seed, {'category': 'diversion', 'audit': audit})
+                                print(f"🗂️  Sorteo guardado como snapshot {snapshot['draw_id']}")
+                            except Exception as e:
+                                # Sin colección de asignaciones: guardar en cada participante
+                                print(f'⚠️  No se pudo guardar el snapshot ({e}); guardando por participante')
+                                failures = repo.commit_assignments(assignments)
+                                if failures:
+                                    raise Exception(f'{len(failures)} asignaciones no se guardaron: ' +
+                                                    '; '.join(f'{pid}: {error}' for pid, error in list(failures.items())[:5]))
+                                # Un snapshot anterior tendría prioridad sobre assigned_to_id
+                                # (si esto falla, el sorteo no se marca como hecho y se reintenta)
+                                if repo.get_current_draw_id():
+                                    reset_draw(repo, {'superseded_by': 'commit_assignments'})
                             
-                            update_settings({'sorteo_completed': True})
+                            repo.update_settings({'sorteo_completed': True})
                             print('✅ Sorteo realizado automáticamente (Solo Categoría Diversión)')
+                            print('🧾 Auditoría del sorteo:', json.dumps(audit))
                         else:
                             print('❌ Validación falló:', validation['errors'])
                     except Exception as e:
@@ -166,11 +188,12 @@ def show_register():
                     try:
                         with st.spinner("Registrando..."):
                             encrypted_name = encrypt(name.strip(), DEFAULT_ENCRYPTION_PASSWORD)
-                            if check_name_exists(encrypted_name):
+                            name_idx = name_index(name, DEFAULT_ENCRYPTION_PASSWORD)
+                            if repo.check_name_index_exists(name_idx):
                                 st.error("Ya existe un registro con este nombre.")
                             else:
                                 pwd_hash = hash_password(password)
-                                participant = create_participant(encrypted_name, category, gift_options, pwd_hash)
+                                participant = repo.create_participant(encrypted_name, category, gift_options, pwd_hash, name_index=name_idx)
                                 p_id = participant['id']
                                 
                                 # Subir imágenes
@@ -179,19 +202,14 @@ def show_register():
                                     if f and idx < len(gift_options):
                                         try:
                                             from lib.appwrite_client import upload_gift_image
-                                            url = upload_gift_image(p_id, idx, f, f.name)
+                                            url = upload_gift_image(p_id, idx, f, f.name, encryption_password=DEFAULT_ENCRYPTION_PASSWORD)
                                             img_urls.append(url)
                                         except:
                                             img_urls.append(None)
                                     else:
                                         img_urls.append(None)
 
-                                databases.update_document(
-                                    database_id=APPWRITE_DATABASE_ID,
-                                    collection_id=APPWRITE_PARTICIPANTS_COLLECTION_ID,
-                                    document_id=p_id,
-                                    data={"gift_images": img_urls}
-                                )
+                                repo.update_participant(p_id, {"gift_images": img_urls})
 
                                 st.session_state.participant_id = p_id
                                 st.success("✅ ¡Registro exitoso!")
@@ -211,24 +229,22 @@ st.set_page_config(
 )
 
 # Importar módulos locales
-from lib.encryption import encrypt, decrypt, hash_password, verify_password
-from lib.sorteo import perform_sorteo, validate_assignments
-from lib.appwrite_client import (
-    get_participant_by_id,
-    create_participant,
-    check_name_exists,
-    get_participants,
-    get_settings,
-    update_settings,
-    update_participant_assignment,
-    upload_gift_image,
-    databases, 
-    APPWRITE_DATABASE_ID, 
-    APPWRITE_PARTICIPANTS_COLLECTION_ID
-)
+from lib.encryption import encrypt, decrypt, hash_password, verify_password, name_index
+from lib.password_hashing import needs_rehash
+from lib.image_cache import cached_image, file_id_from_url, invalidate as invalidate_image
+from lib.rate_limit import login_guard, LoginThrottled
+from lib.repository import get_repository
+from lib.assignment_store import resolve_match
+
+# Backend de datos (DATA_BACKEND en .env; AppWrite por defecto)
+repo = get_repository()
 
-# Contraseña por defecto
-DEFAULT_ENCRYPTION_PASSWORD = 'GiftExchange2025!'
+# Contraseña de encriptación de los nombres (ENCRYPTION_PASSWORD en .env / Secrets)
+# Sin valor por defecto: una contraseña conocida dejaría los nombres expuestos
+DEFAULT_ENCRYPTION_PASSWORD = os.getenv('ENCRYPTION_PASSWORD')
+if not DEFAULT_ENCRYPTION_PASSWORD:
+    st.error("❌ Falta ENCRYPTION_PASSWORD en .env / Secrets")
+    st.stop()
 
 # Función para reproducir música de fondo
 def add_bg_music():
@@ -605,6 +621,9 @@ if 'view' not in st.session_state:
         st.session_state.view = 'home'
 if 'simulated_date' not in st.session_state:
     st.session_state.simulated_date = datetime.now()
+if 'session_key' not in st.session_state:
+    # Identificador de la sesión para el control de intentos de login
+    st.session_state.session_key = uuid.uuid4().hex
 
 
 def show_home():
@@ -796,15 +815,18 @@ def show_register():
                             # Encriptar nombre
                             encrypted_name = encrypt(name.strip(), DEFAULT_ENCRYPTION_PASSWORD)
                             
+                            # Índice ciego del nombre (búsqueda sin desencriptar)
+                            name_idx = name_index(name, DEFAULT_ENCRYPTION_PASSWORD)
+                            
                             # Hash de contraseña
                             password_hash = hash_password(password)
                             
                             # Verificar si ya existe
-                            if check_name_exists(encrypted_name):
+                            if repo.check_name_index_exists(name_idx):
                                 st.error("Ya existe un registro con este nombre.")
                             else:
                                 # Crear participante primero
-                                participant = create_participant(encrypted_name, category, gift_options, password_hash)
+                                participant = repo.create_participant(encrypted_name, category, gift_options, password_hash, name_index=name_idx)
                                 participant_id = participant['id']
                                 
                                 # Subir imágenes si existen
@@ -815,7 +837,7 @@ def show_register():
                                             # Se usa importación tardía para evitar problemas circulares si ocurren
                                             from lib.appwrite_client import upload_gift_image
                                             if uploaded_file is not None and hasattr(uploaded_file, 'read') and hasattr(uploaded_file, 'name'):
-                                                image_url = upload_gift_image(participant_id, idx, uploaded_file, uploaded_file.name)
+                                                image_url = upload_gift_image(participant_id, idx, uploaded_file, uploaded_file.name, encryption_password=DEFAULT_ENCRYPTION_PASSWORD)
                                             else:
                                                 image_url = None
                                             gift_image_urls.append(image_url)
@@ -826,13 +848,7 @@ def show_register():
                                         gift_image_urls.append(None)
 
                                 # Actualizar participante con las URLs de imágenes
-                                from lib.appwrite_client import databases, APPWRITE_DATABASE_ID, APPWRITE_PARTICIPANTS_COLLECTION_ID
-                                databases.update_document(
-                                    database_id=APPWRITE_DATABASE_ID,
-                                    collection_id=APPWRITE_PARTICIPANTS_COLLECTION_ID,
-                                    document_id=participant_id,
-                                    data={"gift_images": gift_image_urls}
-                                )
+                                repo.update_participant(participant_id, {"gift_images": gift_image_urls})
 
                                 st.session_state.participant_id = participant_id
                                 st.session_state.participant_name = encrypted_name
@@ -916,24 +932,32 @@ def show_dashboard():
                 
                 if btn_enter:
                     try:
-                        participants = get_participants()
-                        found = False
-                        for p in participants:
-                            try:
-                                db_name = decrypt(p['encrypted_name'], DEFAULT_ENCRYPTION_PASSWORD)
-                                if db_name.lower().strip() == login_name.lower().strip():
-                                    if verify_password(login_password, p['password_hash']):
-                                        st.session_state.participant_id = p['id']
-                                        found = True
-                                        break
-                            except:
-                                continue
+                        with login_guard(login_name, st.session_state.session_key):
+                            found = False
+                            updates = {}
+                            login_idx = name_index(login_name, DEFAULT_ENCRYPTION_PASSWORD)
+                            p = repo.get_participant_by_name_index(login_idx)
+                            # Todos los registros tienen índice (ver backfill_name_index.py)
+                            if p and verify_password(login_password, p['password_hash']):
+                                st.session_state.participant_id = p['id']
+                                found = True
+                        
+                            # Hashes legacy o con costos anteriores se regeneran al entrar
+                            if found and needs_rehash(p['password_hash']):
+                                updates['password_hash'] = hash_password(login_password)
+                            if updates:
+                                try:
+                                    repo.update_participant(p['id'], updates)
+                                except Exception:
+                                    pass  # Se reintenta en el siguiente login
                         
                         if found:
                             st.success("¡Bienvenido!")
                             st.rerun()
                         else:
                             st.error("Credenciales incorrectas")
+                    except LoginThrottled as e:
+                        st.warning(str(e))
                     except Exception as e:
                         st.error(f"Error login: {e}")
                 
@@ -946,8 +970,8 @@ def show_dashboard():
     # ---------------------------------------------------------
     else:
         try:
-            user_data = get_participant_by_id(st.session_state.participant_id)
-            settings = get_settings()
+            user_data = repo.get_participant_by_id(st.session_state.participant_id)
+            settings = repo.get_settings()
             
             try:
                 decrypted_name = decrypt(user_data['encrypted_name'], DEFAULT_ENCRYPTION_PASSWORD)
@@ -998,16 +1022,18 @@ def show_dashboard():
                         link_val = st.text_input(f"Link (opcional) {idx+1}", value=row["Link"], key=f"my_table_link_{idx}", placeholder="https://...")
                         edited_links.append(link_val)
                     with cols[2]:
-                        if row["Imagen"]:
-                            st.image(row["Imagen"], width=80)
+                        image_path = cached_image(row["Imagen"], DEFAULT_ENCRYPTION_PASSWORD)
+                        if image_path:
+                            st.image(image_path, width=80)
                         file = st.file_uploader(f"Imagen {idx+1}", type=["png","jpg","jpeg","webp"], key=f"my_table_img_{idx}", label_visibility="collapsed")
                         edited_files.append(file)
 
                 # --- VISUALIZACIÓN DEL AMIGO SECRETO ---
-                if user_data.get('assigned_to_id'):
+                assigned_to_id = resolve_match(repo, user_data)
+                if assigned_to_id:
                     st.markdown("<hr style='margin: 2rem 0; border-top: 2px dashed #dc2626;'>", unsafe_allow_html=True)
                     
-                    match_data = get_participant_by_id(user_data['assigned_to_id'])
+                    match_data = repo.get_participant_by_id(assigned_to_id)
                     reveal_date = datetime(2025, 12, 24, 0, 0, 0)
                     should_reveal = settings.get('names_revealed', False) or st.session_state.simulated_date >= reveal_date
                     
@@ -1041,8 +1067,9 @@ def show_dashboard():
                         with c1:
                             st.write(f"🎁 **{idx+1}.** {gift}")
                         with c2:
-                            if assigned_imgs and idx < len(assigned_imgs) and assigned_imgs[idx]:
-                                st.image(assigned_imgs[idx], use_container_width=True)
+                            image_path = cached_image(assigned_imgs[idx], DEFAULT_ENCRYPTION_PASSWORD) if assigned_imgs and idx < len(assigned_imgs) else None
+                            if image_path:
+                                st.image(image_path, use_container_width=True)
 
                 st.markdown("<br>", unsafe_allow_html=True)
                 
@@ -1058,28 +1085,28 @@ def show_dashboard():
                             if l.strip(): entry += f" | {l.strip()}"
                             final_gift_options.append(entry)
                     
-                    # Subir imágenes
-                    from lib.appwrite_client import upload_gift_image, databases, APPWRITE_DATABASE_ID, APPWRITE_PARTICIPANTS_COLLECTION_ID
+                    # Subir imágenes (las anteriores se borran después de guardar las nuevas URLs)
+                    from lib.appwrite_client import delete_gift_file, upload_gift_image
                     new_gift_images = list(my_gift_images) if my_gift_images else [None] * 7
                     while len(new_gift_images) < 7: new_gift_images.append(None)
+                    replaced_images = []
 
                     for idx, file in enumerate(edited_files):
                         if file is not None:
                             try:
                                 if hasattr(file, 'read') and hasattr(file, 'name'):
-                                    image_url = upload_gift_image(user_data['id'], idx, file, file.name)
+                                    image_url = upload_gift_image(user_data['id'], idx, file, file.name, encryption_password=DEFAULT_ENCRYPTION_PASSWORD)
+                                    replaced_images.append(new_gift_images[idx])
                                     new_gift_images[idx] = image_url
                             except Exception:
                                 pass
                     
                     new_gift_images = new_gift_images[:7]
                     
-                    databases.update_document(
-                        database_id=APPWRITE_DATABASE_ID,
-                        collection_id=APPWRITE_PARTICIPANTS_COLLECTION_ID,
-                        document_id=user_data['id'],
-                        data={"gift_options": final_gift_options, "gift_images": new_gift_images}
-                    )
+                    repo.update_participant(user_data['id'], {"gift_options": final_gift_options, "gift_images": new_gift_images})
+                    for old_url in replaced_images:
+                        invalidate_image(old_url)
+                        delete_gift_file(file_id_from_url(old_url))
                     st.success("✅ Cambios guardados correctamente.")
                     st.rerun()
 
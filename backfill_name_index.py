@@ -0,0 +1,148 @@
+"""
+Script para completar el índice ciego (name_index) de los registros antiguos
+Los participantes creados antes del índice ciego no tienen name_index, así
+que el login y la verificación de nombres repetidos no los encuentran con
+una consulta de igualdad. Este script recorre los participantes por páginas
+(iter_participants del backend elegido con DATA_BACKEND), desencripta el
+nombre de los que no tienen índice y lo escribe en lotes concurrentes
+
+Es idempotente: los registros que ya tienen índice se omiten, así que si el
+proceso se interrumpe basta con volver a ejecutarlo. Si dos registros tienen
+el mismo nombre, el segundo no se indexa y se reporta para revisarlo a mano.
+
+La contraseña se lee de ENCRYPTION_PASSWORD (o se pide por consola).
+Ejecútalo antes de desplegar la versión de la app que ya no busca registros
+sin índice.
+
+USO: python backfill_name_index.py [--page-size 100] [--workers 8] [--dry-run]
+"""
+
+import argparse
+import getpass
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from lib.repository import get_repository
+from lib.encryption import decrypt_many, name_index
+
+
+FIELDS = ['id', 'encrypted_name', 'name_index']
+
+
+def iter_pages(repo, page_size: int):
+    """Páginas (listas) de participantes, leídas en streaming"""
+    participants = repo.iter_participants(page_size=page_size, fields=FIELDS)
+    while True:
+        page = list(islice(participants, page_size))
+        if not page:
+            return
+        yield page
+
+
+def index_page(repo, participants: list, password: str, pending: dict):
+    """
+    Calcula el índice de los participantes de una página que no lo tienen
+
+    Args:
+        repo: Repositorio
+        participants: Página de participantes
+        password: Contraseña de encriptación
+        pending: Índices asignados en esta ejecución {name_index: id}; se
+            actualiza con los de la página
+
+    Returns:
+        (updates, duplicates, failed): updates es una lista de (id, data)
+    """
+    legacy = [participant for participant in participants if not participant.get('name_index')]
+    names = decrypt_many([participant.get('encrypted_name', '') for participant in legacy], password)
+
+    updates, duplicates, failed = [], [], []
+    for participant, name in zip(legacy, names):
+        if name['error']:
+            failed.append({'id': participant['id'], 'error': name['error']})
+            continue
+
+        index = name_index(name['value'], password)
+        if index in pending or repo.check_name_index_exists(index):
+            duplicates.append({'id': participant['id'], 'same_as': pending.get(index)})
+            continue
+
+        pending[index] = participant['id']
+        updates.append((participant['id'], {'name_index': index}))
+
+    return updates, duplicates, failed
+
+
+def write_updates(repo, executor: ThreadPoolExecutor, updates: list) -> list:
+    """Escribe las actualizaciones en paralelo y devuelve los fallos"""
+    def write(update):
+        document_id, data = update
+        try:
+            repo.update_participant(document_id, data)
+            return None
+        except Exception as e:
+            return {'id': document_id, 'error': str(e)}
+
+    return [failure for failure in executor.map(write, updates) if failure]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Completar el índice ciego de los nombres')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=8, help='Escrituras concurrentes')
+    parser.add_argument('--dry-run', action='store_true', help='Calcular sin escribir en la base de datos')
+    args = parser.parse_args()
+
+    print("🔎 Índice ciego de los nombres")
+    print("=" * 60)
+
+    password = os.getenv('ENCRYPTION_PASSWORD') or getpass.getpass('Contraseña de encriptación: ')
+    if not password:
+        print("❌ Falta la contraseña de encriptación")
+        return 1
+
+    repo = get_repository()
+    start = time.perf_counter()
+    processed = indexed = 0
+    pending, duplicates, failed = {}, [], []
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for page_number, participants in enumerate(iter_pages(repo, args.page_size), 1):
+            updates, page_duplicates, page_failed = index_page(repo, participants, password, pending)
+            if not args.dry_run:
+                page_failed += write_updates(repo, executor, updates)
+
+            failed_ids = {failure['id'] for failure in page_failed}
+            indexed += sum(1 for document_id, _ in updates if document_id not in failed_ids)
+            duplicates += page_duplicates
+            failed += page_failed
+
+            processed += len(participants)
+            print(f"   📄 Página {page_number}: {processed:,} procesados, {indexed:,} indexados, "
+                  f"{len(duplicates):,} repetidos, {len(failed):,} con error")
+
+    print()
+    print("=" * 60)
+    print(f"⏱️  {processed:,} participantes en {time.perf_counter() - start:.1f} s")
+    if duplicates:
+        print(f"⚠️  {len(duplicates)} registros con un nombre que ya existe (no se indexaron):")
+        for duplicate in duplicates[:10]:
+            print(f"   - {duplicate['id']}" + (f" (igual a {duplicate['same_as']})" if duplicate['same_as'] else ''))
+    if failed:
+        print(f"❌ {len(failed)} registros con error:")
+        for failure in failed[:10]:
+            print(f"   - {failure['id']}: {failure['error']}")
+        return 1
+
+    if args.dry_run:
+        print("ℹ️  Simulación: no se escribió nada")
+    else:
+        print("✅ ÍNDICE COMPLETADO")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
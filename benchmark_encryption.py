@@ -0,0 +1,200 @@
+"""
+Benchmark de las primitivas de lib/encryption.py y del hash de contraseñas
+Mide latencia y operaciones por segundo de cada operación en un hilo y con
+un pool de hilos, el efecto de ITERATIONS en la derivación de claves, y
+proyecta el costo del login y del dashboard para un número de participantes
+
+Funciona sin conexión y escribe los resultados en JSON.
+
+USO: python benchmark_encryption.py [--participants 500] [--threads 1,2,4,8]
+                                    [--iterations 50000,100000,200000]
+                                    [--output benchmark_encryption.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from lib import encryption
+from lib.encryption import (
+    derive_key,
+    encrypt,
+    encrypt_legacy,
+    decrypt,
+    decrypt_many,
+    name_index,
+    clear_key_cache,
+    hash_password,
+    verify_password,
+)
+
+
+PASSWORD = 'benchmark-password'
+SAMPLE_NAME = 'María Fernanda López'
+
+
+def time_operation(fn, min_time: float = 0.5, max_runs: int = 2000) -> dict:
+    """Ejecuta fn hasta acumular `min_time` segundos; reporta mediana y p95"""
+    samples = []
+    total = 0.0
+    while total < min_time and len(samples) < max_runs:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        samples.append(elapsed)
+        total += elapsed
+    samples.sort()
+    median = samples[len(samples) // 2]
+    return {
+        'median_ms': median * 1000,
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+        'ops_per_s': 1 / median if median > 0 else None,
+        'runs': len(samples),
+    }
+
+
+def throughput(fn, threads: int, operations: int) -> float:
+    """Operaciones por segundo ejecutando fn `operations` veces en `threads` hilos"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda _: fn(), range(operations)))
+    return operations / (time.perf_counter() - start)
+
+
+def build_operations() -> dict:
+    """Operaciones a medir; las 'frías' vacían la caché de claves cada vez"""
+    v2 = encrypt(SAMPLE_NAME, PASSWORD)
+    legacy = encrypt_legacy(SAMPLE_NAME, PASSWORD)
+    password_hash = hash_password('contraseña')
+    salt = os.urandom(encryption.SALT_LENGTH)
+
+    def decrypt_legacy_cold():
+        clear_key_cache()
+        decrypt(legacy, PASSWORD)
+
+    return {
+        'derive_key': lambda: derive_key(PASSWORD, salt),
+        'encrypt': lambda: encrypt(SAMPLE_NAME, PASSWORD),
+        'encrypt_legacy': lambda: encrypt_legacy(SAMPLE_NAME, PASSWORD),
+        'decrypt': lambda: decrypt(v2, PASSWORD),
+        'decrypt_legacy_cached': lambda: decrypt(legacy, PASSWORD),
+        'decrypt_legacy_cold': decrypt_legacy_cold,
+        'name_index': lambda: name_index(SAMPLE_NAME, PASSWORD),
+        'hash_password': lambda: hash_password('contraseña'),
+        'verify_password': lambda: verify_password('contraseña', password_hash),
+    }
+
+
+def bench_iterations(values: list) -> dict:
+    """Latencia de derive_key para distintos valores de ITERATIONS"""
+    original = encryption.ITERATIONS
+    salt = os.urandom(encryption.SALT_LENGTH)
+    results = {}
+    try:
+        for iterations in values:
+            encryption.ITERATIONS = iterations
+            results[str(iterations)] = time_operation(lambda: derive_key(PASSWORD, salt), min_time=0.3)
+    finally:
+        encryption.ITERATIONS = original
+    return results
+
+
+def project_costs(single: dict, participants: int) -> dict:
+    """
+    Costo de CPU (ms) de las rutas principales, sin contar la red
+
+    - login indexado: índice ciego + verificación de contraseña
+    - login legacy (peor caso): desencriptar todos los nombres sin índice
+    - dashboard: nombre propio + nombre asignado en cada rerun
+    - revelación: desencriptar todos los nombres
+    """
+    ms = {name: result['median_ms'] for name, result in single.items()}
+    return {
+        'participants': participants,
+        'login_indexed_ms': ms['name_index'] + ms['verify_password'],
+        'login_legacy_scan_ms': participants * ms['decrypt_legacy_cold'] + ms['verify_password'],
+        'dashboard_rerun_ms': 2 * ms['decrypt'],
+        'dashboard_first_legacy_ms': 2 * ms['decrypt_legacy_cold'],
+        'reveal_all_names_ms': participants * ms['decrypt'],
+        'reveal_all_names_legacy_ms': participants * ms['decrypt_legacy_cold'],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark de encriptación')
+    parser.add_argument('--participants', type=int, default=500)
+    parser.add_argument('--threads', default='1,2,4,8')
+    parser.add_argument('--iterations', default='50000,100000,200000,600000')
+    parser.add_argument('--output', default='benchmark_encryption.json')
+    args = parser.parse_args()
+
+    thread_counts = [int(t) for t in args.threads.split(',')]
+    iteration_values = [int(i) for i in args.iterations.split(',')]
+
+    print("🔐 Benchmark de encriptación")
+    print("=" * 50)
+
+    results = {
+        'created_at': datetime.utcnow().isoformat() + 'Z',
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'iterations': encryption.ITERATIONS,
+        'single_thread': {},
+        'thread_pool': {},
+    }
+
+    operations = build_operations()
+
+    print("\n⏱️  Un hilo")
+    for name, fn in operations.items():
+        timing = time_operation(fn)
+        results['single_thread'][name] = timing
+        print(f"   {name:<24} {timing['median_ms']:>9.3f} ms  {timing['ops_per_s']:>12,.0f} ops/s")
+
+    print("\n🧵 Pool de hilos (ops/s)")
+    for name, fn in operations.items():
+        # Suficientes operaciones para ~0.5 s por medición
+        count = max(8, min(2000, int(0.5 * results['single_thread'][name]['ops_per_s'])))
+        results['thread_pool'][name] = {str(t): throughput(fn, t, count) for t in thread_counts}
+        row = '  '.join(f"{t}h: {ops:>10,.0f}" for t, ops in results['thread_pool'][name].items())
+        print(f"   {name:<24} {row}")
+
+    print("\n🔁 decrypt_many (nombres v2)")
+    names = [encrypt(f'{SAMPLE_NAME} {i}', PASSWORD) for i in range(max(args.participants, 100))]
+    results['decrypt_many'] = {}
+    for mode in ('thread', 'process'):
+        start = time.perf_counter()
+        decrypt_many(names, PASSWORD, mode=mode)
+        rate = len(names) / (time.perf_counter() - start)
+        results['decrypt_many'][mode] = rate
+        print(f"   {mode:<8} {rate:>12,.0f} nombres/s")
+
+    print("\n📈 derive_key según ITERATIONS")
+    results['derive_key_by_iterations'] = bench_iterations(iteration_values)
+    for iterations, timing in results['derive_key_by_iterations'].items():
+        print(f"   {int(iterations):>9,} iteraciones  {timing['median_ms']:>8.2f} ms")
+
+    results['projection'] = project_costs(results['single_thread'], args.participants)
+    projection = results['projection']
+    print(f"\n📊 Proyección para {args.participants:,} participantes (CPU, sin red)")
+    print(f"   Login indexado:            {projection['login_indexed_ms']:>10.1f} ms")
+    print(f"   Login legacy (peor caso):  {projection['login_legacy_scan_ms']:>10.1f} ms")
+    print(f"   Dashboard por rerun:       {projection['dashboard_rerun_ms']:>10.3f} ms")
+    print(f"   Revelar todos los nombres: {projection['reveal_all_names_ms']:>10.1f} ms "
+          f"(legacy: {projection['reveal_all_names_legacy_ms']:,.0f} ms)")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Resultados guardados en {args.output}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
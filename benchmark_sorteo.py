@@ -0,0 +1,219 @@
+"""
+Benchmark y pruebas estadísticas del algoritmo de sorteo (lib/sorteo.py)
+Mide tiempo, throughput y memoria de create_valid_assignment,
+create_compact_assignment, to_dict, perform_sorteo y validate_assignments
+de 10 a 1,000,000 participantes, y verifica con Monte
+Carlo que todos los ciclos válidos sean igualmente probables
+
+Funciona sin conexión (no usa la base de datos) y escribe los resultados en
+JSON. Con --baseline compara contra una corrida anterior y termina con
+código 1 si el throughput cae más de la tolerancia.
+
+USO: python benchmark_sorteo.py [--max-size 1000000] [--output resultados.json]
+                                [--baseline anterior.json] [--tolerance 0.25]
+"""
+
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from lib.sorteo import (
+    create_compact_assignment,
+    create_valid_assignment,
+    perform_sorteo,
+    validate_assignments,
+    validate_compact,
+    sattolo_cycle,
+)
+
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000, 1000000]
+
+
+def make_participants(n: int) -> list:
+    """Genera n participantes sintéticos con ids tipo UUID y dos categorías"""
+    return [
+        {'id': f'{i:08x}-0000-4000-8000-{i:012x}', 'category': 'elite' if i % 2 else 'diversion'}
+        for i in range(n)
+    ]
+
+
+def time_operation(fn, repeat: int) -> dict:
+    """Ejecuta fn `repeat` veces y reporta mínimo y mediana en segundos"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {'min_s': samples[0], 'median_s': samples[len(samples) // 2], 'runs': repeat}
+
+
+def peak_memory(fn) -> int:
+    """Memoria pico (bytes) asignada durante una ejecución de fn"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_size(n: int) -> dict:
+    """Mide todas las operaciones para un tamaño de sorteo"""
+    participants = make_participants(n)
+    elite = [p for p in participants if p['category'] == 'elite']
+    diversion = [p for p in participants if p['category'] == 'diversion']
+    categories = [p['category'] for p in participants]
+    repeat = max(1, min(50, 200000 // max(n, 1)))
+
+    assignments = perform_sorteo(elite, diversion)
+    compact = create_compact_assignment(participants)
+
+    operations = {
+        'create_valid_assignment': lambda: create_valid_assignment(participants),
+        'create_compact_assignment': lambda: create_compact_assignment(participants),
+        'to_dict': compact.to_dict,
+        'perform_sorteo': lambda: perform_sorteo(elite, diversion),
+        'validate_assignments': lambda: validate_assignments(participants, assignments),
+        'validate_compact': lambda: validate_compact(compact, categories),
+    }
+
+    results = {}
+    for name, fn in operations.items():
+        timing = time_operation(fn, repeat)
+        timing['throughput_per_s'] = n / timing['min_s'] if timing['min_s'] > 0 else None
+        timing['peak_memory_bytes'] = peak_memory(fn)
+        results[name] = timing
+        print(f"   {name:<27} {timing['min_s'] * 1000:>10.2f} ms  "
+              f"{(timing['throughput_per_s'] or 0):>14,.0f} part/s  "
+              f"{timing['peak_memory_bytes'] / 1e6:>8.2f} MB")
+
+    return results
+
+
+def uniformity_check(n: int, draws: int) -> dict:
+    """
+    Monte Carlo: los (n-1)! ciclos deben aparecer con la misma frecuencia
+
+    Cada sorteo se codifica como un entero (sucesores en base n) y los
+    conteos, la validez y el estadístico chi-cuadrado se calculan de forma
+    vectorizada sobre la matriz de sorteos.
+    """
+    rng = random.Random(n)
+    successors = np.empty((draws, n), dtype=np.int64)
+    for k in range(draws):
+        successors[k] = sattolo_cycle(n, rng)
+
+    rows = np.arange(draws)[:, None]
+    positions = np.arange(n)
+    no_self = (successors != positions).all(axis=1)
+    no_exchange = (successors[rows, successors] != positions).all(axis=1)
+
+    codes = successors @ (n ** np.arange(n, dtype=np.int64))
+    _, counts = np.unique(codes, return_counts=True)
+
+    cycles = math.factorial(n - 1)
+    expected = draws / cycles
+    observed = np.zeros(cycles)
+    observed[:len(counts)] = counts
+    chi2 = float(((observed - expected) ** 2 / expected).sum())
+    dof = cycles - 1
+
+    # Aproximación de Wilson-Hilferty para la cola de la chi-cuadrado
+    z = ((chi2 / dof) ** (1 / 3) - (1 - 2 / (9 * dof))) / math.sqrt(2 / (9 * dof))
+    p_value = 0.5 * math.erfc(z / math.sqrt(2))
+
+    return {
+        'n': n,
+        'draws': draws,
+        'distinct_cycles': int(len(counts)),
+        'expected_cycles': cycles,
+        'all_valid': bool((no_self & no_exchange).all()),
+        'chi2': chi2,
+        'dof': dof,
+        'p_value': p_value,
+        'uniform': bool(len(counts) == cycles and p_value > 0.001),
+    }
+
+
+def compare_with_baseline(results: dict, baseline_path: str, tolerance: float) -> list:
+    """Lista de regresiones de throughput respecto a una corrida anterior"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for size, operations in results['sizes'].items():
+        for name, current in operations.items():
+            previous = baseline.get('sizes', {}).get(size, {}).get(name)
+            if not previous or not previous.get('throughput_per_s') or not current.get('throughput_per_s'):
+                continue
+            ratio = current['throughput_per_s'] / previous['throughput_per_s']
+            if ratio < 1 - tolerance:
+                regressions.append(f"{name} (n={size}): {ratio:.0%} del throughput anterior")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark del sorteo')
+    parser.add_argument('--max-size', type=int, default=DEFAULT_SIZES[-1])
+    parser.add_argument('--draws', type=int, default=60000, help='Sorteos por prueba de uniformidad')
+    parser.add_argument('--output', default='benchmark_sorteo.json')
+    parser.add_argument('--baseline', help='JSON de una corrida anterior para detectar regresiones')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    print("🎲 Benchmark del sorteo")
+    print("=" * 50)
+
+    results = {
+        'created_at': datetime.utcnow().isoformat() + 'Z',
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'sizes': {},
+        'uniformity': [],
+    }
+
+    for n in [size for size in DEFAULT_SIZES if size <= args.max_size]:
+        print(f"\n📏 n = {n:,}")
+        results['sizes'][str(n)] = bench_size(n)
+
+    print("\n📊 Uniformidad (Monte Carlo)")
+    for n in (4, 5, 6):
+        check = uniformity_check(n, args.draws)
+        results['uniformity'].append(check)
+        status = "✅" if check['uniform'] and check['all_valid'] else "❌"
+        print(f"   {status} n={n}: {check['distinct_cycles']}/{check['expected_cycles']} ciclos, "
+              f"chi2={check['chi2']:.1f} (gl={check['dof']}), p={check['p_value']:.3f}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Resultados guardados en {args.output}")
+
+    failed = [c for c in results['uniformity'] if not (c['uniform'] and c['all_valid'])]
+    if failed:
+        print("❌ La prueba de uniformidad falló")
+        return 1
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print("❌ Regresiones de rendimiento:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            return 1
+        print("✅ Sin regresiones respecto a la línea base")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Calibración del costo del hash de contraseñas (lib/password_hashing.py)
+Busca los parámetros de scrypt o PBKDF2 que dan la latencia objetivo de una
+verificación en este equipo y mide cómo se comporta el login bajo carga
+(ráfaga de verificaciones simultáneas con el límite de concurrencia)
+
+Ejecutar en el mismo tipo de servidor donde corre la app e imprimir las
+variables de entorno a configurar.
+
+USO: python calibrate_password_hash.py [--target-ms 250] [--scheme scrypt]
+                                       [--burst 32]
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.password_hashing import (
+    calibrate,
+    hash_password,
+    verify_password,
+    measure,
+    MAX_CONCURRENT_HASHES,
+    SCHEMES,
+)
+
+
+def burst_latencies(password_hash: str, logins: int) -> list:
+    """Latencias (s) de `logins` verificaciones lanzadas a la vez"""
+    def login(_):
+        start = time.perf_counter()
+        verify_password('contraseña de prueba', password_hash)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=logins) as executor:
+        return sorted(executor.map(login, range(logins)))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Calibración del hash de contraseñas')
+    parser.add_argument('--target-ms', type=float, default=250, help='Latencia objetivo de una verificación')
+    parser.add_argument('--scheme', choices=SCHEMES, default='scrypt')
+    parser.add_argument('--burst', type=int, default=32, help='Logins simultáneos para la prueba de carga')
+    args = parser.parse_args()
+
+    print("🔐 Calibración del hash de contraseñas")
+    print("=" * 50)
+
+    params = calibrate(args.target_ms / 1000, args.scheme)
+    single = measure(args.scheme, params, repeat=5)
+    print(f"   Algoritmo: {args.scheme}, parámetros: {params}")
+    print(f"   Verificación: {single * 1000:.0f} ms (objetivo {args.target_ms:.0f} ms)")
+
+    password_hash = hash_password('contraseña de prueba', args.scheme, params)
+    start = time.perf_counter()
+    latencies = burst_latencies(password_hash, args.burst)
+    elapsed = time.perf_counter() - start
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"\n📊 Ráfaga de {args.burst} logins (máx. {MAX_CONCURRENT_HASHES} hashes a la vez)")
+    print(f"   p50 {p50 * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms, "
+          f"{args.burst / elapsed:.1f} logins/s")
+
+    print("\n⚙️  Variables de entorno recomendadas:")
+    print(f"   PASSWORD_HASH_SCHEME={args.scheme}")
+    if args.scheme == 'scrypt':
+        print(f"   PASSWORD_SCRYPT_N={params['n']}")
+        print(f"   PASSWORD_SCRYPT_R={params['r']}")
+        print(f"   PASSWORD_SCRYPT_P={params['p']}")
+    else:
+        print(f"   PASSWORD_PBKDF2_ITERATIONS={params['iterations']}")
+    print("\n   Los hashes existentes se actualizan solos en el siguiente login.")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
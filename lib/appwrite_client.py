@@ -4,7 +4,9 @@ Migrado desde Firebase/Supabase
 """
 
 import os
-from typing import Optional, List, Dict, Any
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Iterator
 from appwrite.client import Client
 from appwrite.services.databases import Databases
 from appwrite.services.storage import Storage
@@ -24,6 +26,13 @@ APPWRITE_DATABASE_ID = os.getenv('APPWRITE_DATABASE_ID')
 APPWRITE_PARTICIPANTS_COLLECTION_ID = os.getenv('APPWRITE_PARTICIPANTS_COLLECTION_ID')
 APPWRITE_SETTINGS_COLLECTION_ID = os.getenv('APPWRITE_SETTINGS_COLLECTION_ID')
 APPWRITE_STORAGE_BUCKET_ID = os.getenv('APPWRITE_STORAGE_BUCKET_ID')
+APPWRITE_ASSIGNMENTS_COLLECTION_ID = os.getenv('APPWRITE_ASSIGNMENTS_COLLECTION_ID')
+
+# Documentos por página al recorrer colecciones (máximo de AppWrite: 5000)
+PAGE_SIZE = int(os.getenv('APPWRITE_PAGE_SIZE', 100))
+
+# Escrituras simultáneas al guardar asignaciones (commit_assignments)
+COMMIT_WORKERS = int(os.getenv('APPWRITE_COMMIT_WORKERS', 8))
 
 # Verificar que las credenciales existan
 if not APPWRITE_ENDPOINT:
@@ -52,35 +61,100 @@ storage = Storage(client)
 
 # ============== PARTICIPANTS ==============
 
-def get_participants() -> List[Dict[str, Any]]:
+# Campo del participante -> atributo del documento de AppWrite
+_SYSTEM_FIELDS = {'id': '$id', 'created_at': '$createdAt'}
+
+
+def _select_query(fields: List[str]):
+    """Query.select con los atributos de AppWrite para los campos pedidos (siempre incluye $id)"""
+    attributes = ['$id'] + [_SYSTEM_FIELDS.get(field, field) for field in fields if field != 'id']
+    return Query.select(attributes)
+
+
+def _document_to_participant(doc, fields: Optional[List[str]] = None) -> Dict[str, Any]:
     """
-    Obtiene todos los participantes
+    Convierte un documento de AppWrite al formato dict de participante
     
-    Returns:
-        Lista de participantes
+    Con `fields` solo se devuelven esos campos (más 'id'), como en la proyección
     """
-    try:
+    if fields:
+        participant = {'id': doc['$id']}
+        for field in fields:
+            if field != 'id':
+                participant[field] = doc.get(_SYSTEM_FIELDS.get(field, field))
+        return participant
+    
+    return {
+        'id': doc['$id'],
+        'encrypted_name': doc.get('encrypted_name', ''),
+        'name_index': doc.get('name_index'),
+        'category': doc.get('category', ''),
+        'gift_options': doc.get('gift_options', []),
+        'password_hash': doc.get('password_hash', ''),
+        'gift_images': doc.get('gift_images', []),
+        'assigned_to_id': doc.get('assigned_to_id'),
+        'created_at': doc.get('$createdAt')
+    }
+
+
+def iter_participants(page_size: int = PAGE_SIZE, category: Optional[str] = None,
+                      after: Optional[str] = None,
+                      fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre todos los participantes página por página (cursor de AppWrite)
+    
+    Los participantes se entregan conforme llega cada página, así que la
+    memoria no depende del tamaño de la colección.
+    
+    Args:
+        page_size: Documentos por consulta
+        category: Solo participantes de esta categoría (opcional)
+        after: ID del documento después del cual empezar (para reanudar)
+        fields: Campos a traer (Query.select); None trae el documento completo
+        
+    Yields:
+        Participantes en el orden de la colección
+        
+    Raises:
+        Exception: Si falla alguna consulta (AppwriteException)
+    """
+    cursor = after
+    while True:
+        page_queries = [Query.limit(page_size)]
+        if category:
+            page_queries.append(Query.equal('category', category))
+        if cursor:
+            page_queries.append(Query.cursor_after(cursor))
+        if fields:
+            page_queries.append(_select_query(fields))
+        
         response = databases.list_documents(
             database_id=APPWRITE_DATABASE_ID,
-            collection_id=APPWRITE_PARTICIPANTS_COLLECTION_ID
+            collection_id=APPWRITE_PARTICIPANTS_COLLECTION_ID,
+            queries=page_queries
         )
+        documents = response['documents']
         
-        # Convertir documentos de AppWrite a formato dict
-        participants = []
-        for doc in response['documents']:
-            participant = {
-                'id': doc['$id'],
-                'encrypted_name': doc.get('encrypted_name', ''),
-                'category': doc.get('category', ''),
-                'gift_options': doc.get('gift_options', []),
-                'password_hash': doc.get('password_hash', ''),
-                'gift_images': doc.get('gift_images', []),
-                'assigned_to_id': doc.get('assigned_to_id'),
-                'created_at': doc.get('$createdAt')
-            }
-            participants.append(participant)
+        for doc in documents:
+            yield _document_to_participant(doc, fields)
         
-        return participants
+        if len(documents) < page_size:
+            return
+        cursor = documents[-1]['$id']
+
+
+def get_participants(fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Obtiene todos los participantes (todas las páginas)
+    
+    Args:
+        fields: Campos a traer, p. ej. ['id', 'category'] (None = todos)
+        
+    Returns:
+        Lista de participantes
+    """
+    try:
+        return list(iter_participants(fields=fields))
     except Exception as e:
         print(f"Error al obtener participantes: {str(e)}")
         return []
@@ -103,18 +177,7 @@ def get_participant_by_id(participant_id: str) -> Optional[Dict[str, Any]]:
             document_id=participant_id
         )
         
-        participant = {
-            'id': doc['$id'],
-            'encrypted_name': doc.get('encrypted_name', ''),
-            'category': doc.get('category', ''),
-            'gift_options': doc.get('gift_options', []),
-            'password_hash': doc.get('password_hash', ''),
-            'gift_images': doc.get('gift_images', []),
-            'assigned_to_id': doc.get('assigned_to_id'),
-            'created_at': doc.get('$createdAt')
-        }
-        
-        return participant
+        return _document_to_participant(doc)
     except Exception as e:
         print(f"Error al obtener participante {participant_id}: {str(e)}")
         return None
@@ -146,7 +209,52 @@ def check_name_exists(encrypted_name: str) -> bool:
         return False
 
 
-def create_participant(encrypted_name: str, category: str, gift_options: List[str], password_hash: str, gift_images: Optional[List[str]] = None) -> Dict[str, Any]:
+def get_participant_by_name_index(name_index: str) -> Optional[Dict[str, Any]]:
+    """
+    Obtiene un participante por el índice ciego de su nombre (una lectura indexada)
+    
+    Args:
+        name_index: Índice del nombre (lib.encryption.name_index)
+        
+    Returns:
+        Datos del participante o None si no existe
+    """
+    try:
+        response = databases.list_documents(
+            database_id=APPWRITE_DATABASE_ID,
+            collection_id=APPWRITE_PARTICIPANTS_COLLECTION_ID,
+            queries=[
+                Query.equal('name_index', name_index),
+                Query.limit(1)
+            ]
+        )
+        
+        if not response['documents']:
+            return None
+        
+        return _document_to_participant(response['documents'][0])
+    except Exception as e:
+        print(f"Error al buscar participante por índice: {str(e)}")
+        return None
+
+
+def check_name_index_exists(name_index: str) -> bool:
+    """
+    Verifica si ya existe un participante con el mismo nombre (por índice ciego)
+    
+    A diferencia de check_name_exists, funciona aunque el nombre encriptado
+    use un salt/nonce aleatorio.
+    
+    Args:
+        name_index: Índice del nombre (lib.encryption.name_index)
+        
+    Returns:
+        True si existe, False en caso contrario
+    """
+    return get_participant_by_name_index(name_index) is not None
+
+
+def create_participant(encrypted_name: str, category: str, gift_options: List[str], password_hash: str, gift_images: Optional[List[str]] = None, name_index: Optional[str] = None) -> Dict[str, Any]:
     """
     Crea un nuevo participante
     
@@ -156,6 +264,7 @@ def create_participant(encrypted_name: str, category: str, gift_options: List[st
         gift_options: Lista de opciones de regalo
         password_hash: Hash de la contraseña del participante
         gift_images: Lista de URLs de imágenes de regalos (opcional)
+        name_index: Índice ciego del nombre para búsquedas (opcional)
         
     Returns:
         Datos del participante creado
@@ -172,6 +281,8 @@ def create_participant(encrypted_name: str, category: str, gift_options: List[st
             'gift_images': gift_images or [],
             'assigned_to_id': None
         }
+        if name_index:
+            data['name_index'] = name_index
         
         doc = databases.create_document(
             database_id=APPWRITE_DATABASE_ID,
@@ -180,18 +291,7 @@ def create_participant(encrypted_name: str, category: str, gift_options: List[st
             data=data
         )
         
-        participant = {
-            'id': doc['$id'],
-            'encrypted_name': doc.get('encrypted_name', ''),
-            'category': doc.get('category', ''),
-            'gift_options': doc.get('gift_options', []),
-            'password_hash': doc.get('password_hash', ''),
-            'gift_images': doc.get('gift_images', []),
-            'assigned_to_id': doc.get('assigned_to_id'),
-            'created_at': doc.get('$createdAt')
-        }
-        
-        return participant
+        return _document_to_participant(doc)
     except Exception as e:
         raise Exception(f'Error al crear participante: {str(e)}')
 
@@ -205,21 +305,80 @@ def update_participant_assignment(participant_id: str, assigned_to_id: str) -> D
         assigned_to_id: ID del participante asignado
         
     Returns:
-        Datos del participante actualizado
+        id y campo escrito (igual en todos los backends)
     """
     try:
-        doc = databases.update_document(
+        databases.update_document(
             database_id=APPWRITE_DATABASE_ID,
             collection_id=APPWRITE_PARTICIPANTS_COLLECTION_ID,
             document_id=participant_id,
             data={'assigned_to_id': assigned_to_id}
         )
-        
-        return get_participant_by_id(participant_id)
+        return {'id': participant_id, 'assigned_to_id': assigned_to_id}
     except Exception as e:
         raise Exception(f'Error al actualizar asignación para {participant_id}: {str(e)}')
 
 
+def update_participant(participant_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Actualiza campos de un participante
+    
+    Args:
+        participant_id: ID del participante
+        data: Campos a actualizar (p. ej. {'password_hash': ...})
+        
+    Returns:
+        id y campos escritos (igual en todos los backends)
+    """
+    try:
+        databases.update_document(
+            database_id=APPWRITE_DATABASE_ID,
+            collection_id=APPWRITE_PARTICIPANTS_COLLECTION_ID,
+            document_id=participant_id,
+            data=data
+        )
+        return {**data, 'id': participant_id}
+    except Exception as e:
+        raise Exception(f'Error al actualizar participante {participant_id}: {str(e)}')
+
+
+def commit_assignments(assignments: Dict[str, str], max_workers: int = COMMIT_WORKERS) -> Dict[str, str]:
+    """
+    Guarda las asignaciones de un sorteo con escrituras concurrentes
+    
+    AppWrite no tiene escrituras por lotes: cada asignación es un
+    update_document, repartidos en un pool de `max_workers` hilos y sin volver
+    a leer el documento.
+    
+    Args:
+        assignments: Diccionario {participant_id: assigned_to_id}
+        max_workers: Escrituras simultáneas como máximo
+        
+    Returns:
+        Diccionario {participant_id: error} con las asignaciones que fallaron
+        (vacío si todas se guardaron)
+    """
+    def write(item):
+        participant_id, assigned_to_id = item
+        try:
+            databases.update_document(
+                database_id=APPWRITE_DATABASE_ID,
+                collection_id=APPWRITE_PARTICIPANTS_COLLECTION_ID,
+                document_id=participant_id,
+                data={'assigned_to_id': assigned_to_id}
+            )
+            return participant_id, None
+        except Exception as e:
+            return participant_id, str(e)
+    
+    if not assignments:
+        return {}
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(assignments)))) as executor:
+        results = executor.map(write, assignments.items())
+        return {participant_id: error for participant_id, error in results if error}
+
+
 # ============== SETTINGS ==============
 
 def get_settings() -> Dict[str, Any]:
@@ -296,20 +455,116 @@ def update_settings(updates: Dict[str, Any]) -> Dict[str, Any]:
             data=updates
         )
         
-        return get_settings()
+        return dict(settings, **updates)
     except Exception as e:
         raise Exception(f'Error al actualizar configuración: {str(e)}')
 
 
+# ============== ASSIGNMENT SNAPSHOTS ==============
+
+SNAPSHOT_FIELDS = ('version', 'created_at', 'seed', 'count', 'output_hash', 'metadata', 'packed')
+
+
+def _document_to_snapshot(doc) -> Dict[str, Any]:
+    snapshot = {'draw_id': doc['$id']}
+    snapshot.update({field: doc.get(field) for field in SNAPSHOT_FIELDS})
+    return snapshot
+
+
+def save_assignment_snapshot(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Guarda el snapshot de un sorteo como un documento (ver lib/assignment_store.py)
+    
+    Args:
+        snapshot: Snapshot creado con create_snapshot; draw_id es el ID del documento
+        
+    Returns:
+        Snapshot guardado
+    """
+    if not APPWRITE_ASSIGNMENTS_COLLECTION_ID:
+        raise Exception('APPWRITE_ASSIGNMENTS_COLLECTION_ID es requerido para guardar sorteos')
+    
+    try:
+        doc = databases.create_document(
+            database_id=APPWRITE_DATABASE_ID,
+            collection_id=APPWRITE_ASSIGNMENTS_COLLECTION_ID,
+            document_id=snapshot['draw_id'],
+            data={field: snapshot.get(field) for field in SNAPSHOT_FIELDS}
+        )
+        return _document_to_snapshot(doc)
+    except Exception as e:
+        raise Exception(f'Error al guardar el sorteo: {str(e)}')
+
+
+def get_assignment_snapshot(draw_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Obtiene el snapshot de un sorteo con una sola lectura
+    
+    Args:
+        draw_id: ID del sorteo (por defecto el más reciente)
+        
+    Returns:
+        Snapshot o None si no existe
+    """
+    if not APPWRITE_ASSIGNMENTS_COLLECTION_ID:
+        return None
+    
+    try:
+        if draw_id:
+            doc = databases.get_document(
+                database_id=APPWRITE_DATABASE_ID,
+                collection_id=APPWRITE_ASSIGNMENTS_COLLECTION_ID,
+                document_id=draw_id
+            )
+            return _document_to_snapshot(doc)
+        
+        response = databases.list_documents(
+            database_id=APPWRITE_DATABASE_ID,
+            collection_id=APPWRITE_ASSIGNMENTS_COLLECTION_ID,
+            queries=[Query.order_desc('$createdAt'), Query.limit(1)]
+        )
+        documents = response['documents']
+        return _document_to_snapshot(documents[0]) if documents else None
+    except Exception as e:
+        print(f"Error al obtener sorteo {draw_id or 'vigente'}: {str(e)}")
+        return None
+
+
+def get_current_draw_id() -> Optional[str]:
+    """
+    Obtiene el ID del sorteo más reciente sin traer el sorteo empaquetado
+    
+    Returns:
+        draw_id o None si no hay sorteos
+    """
+    if not APPWRITE_ASSIGNMENTS_COLLECTION_ID:
+        return None
+    
+    try:
+        response = databases.list_documents(
+            database_id=APPWRITE_DATABASE_ID,
+            collection_id=APPWRITE_ASSIGNMENTS_COLLECTION_ID,
+            queries=[Query.select(['$id']), Query.order_desc('$createdAt'), Query.limit(1)]
+        )
+        documents = response['documents']
+        return documents[0]['$id'] if documents else None
+    except Exception as e:
+        print(f"Error al obtener el sorteo vigente: {str(e)}")
+        return None
+
+
 # ============== UTILITY FUNCTIONS ==============
 
 def reset_all_assignments() -> None:
     """
     Reinicia todas las asignaciones (útil para testing)
     ADVERTENCIA: Esta función eliminará todas las asignaciones
+    
+    También guarda un snapshot vacío (reset_draw) para que el último sorteo
+    deje de tener prioridad sobre assigned_to_id en resolve_match.
     """
     try:
-        participants = get_participants()
+        participants = get_participants(fields=['id'])
         
         for participant in participants:
             databases.update_document(
@@ -319,43 +574,29 @@ def reset_all_assignments() -> None:
                 data={'assigned_to_id': None}
             )
         
+        if APPWRITE_ASSIGNMENTS_COLLECTION_ID:
+            # Este módulo expone save_assignment_snapshot, así que sirve como repositorio
+            from lib.assignment_store import reset_draw
+            reset_draw(sys.modules[__name__])
+        
         update_settings({'sorteo_completed': False, 'names_revealed': False})
     except Exception as e:
         print(f"Error al resetear asignaciones: {str(e)}")
 
 
-def get_participants_by_category(category: str) -> List[Dict[str, Any]]:
+def get_participants_by_category(category: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     """
     Obtiene participantes filtrados por categoría
     
     Args:
         category: 'elite' o 'diversion'
+        fields: Campos a traer (None = todos)
         
     Returns:
         Lista de participantes de la categoría especificada
     """
     try:
-        response = databases.list_documents(
-            database_id=APPWRITE_DATABASE_ID,
-            collection_id=APPWRITE_PARTICIPANTS_COLLECTION_ID,
-            queries=[Query.equal('category', category)]
-        )
-        
-        participants = []
-        for doc in response['documents']:
-            participant = {
-                'id': doc['$id'],
-                'encrypted_name': doc.get('encrypted_name', ''),
-                'category': doc.get('category', ''),
-                'gift_options': doc.get('gift_options', []),
-                'password_hash': doc.get('password_hash', ''),
-                'gift_images': doc.get('gift_images', []),
-                'assigned_to_id': doc.get('assigned_to_id'),
-                'created_at': doc.get('$createdAt')
-            }
-            participants.append(participant)
-        
-        return participants
+        return list(iter_participants(category=category, fields=fields))
     except Exception as e:
         print(f"Error al obtener participantes por categoría: {str(e)}")
         return []
@@ -380,7 +621,7 @@ def delete_participant(participant_id: str) -> None:
 
 # ============== STORAGE FUNCTIONS ==============
 
-def upload_gift_image(participant_id: str, option_index: int, file_obj, file_name: str) -> str:
+def upload_gift_image(participant_id: str, option_index: int, file_obj, file_name: str, encryption_password: Optional[str] = None) -> str:
     """
     Sube una imagen de regalo a AppWrite Storage
     
@@ -389,6 +630,15 @@ def upload_gift_image(participant_id: str, option_index: int, file_obj, file_nam
         option_index: Índice de la opción de regalo (0-6)
         file_obj: Objeto file-like de st.file_uploader
         file_name: Nombre original del archivo
+        encryption_password: Si se indica, la imagen se encripta por bloques
+            (lib.encryption.encrypt_stream) en un archivo temporal antes de
+            subirla; para mostrarla usa lib.image_cache.cached_image
+        
+    Cada subida crea un archivo con un ID nuevo y no toca la imagen anterior
+    de esa opción: quien llama guarda la URL nueva en gift_images y después
+    borra el archivo anterior con delete_gift_file, así que si la subida
+    falla la imagen anterior sigue intacta. Como el ID cambia, la URL también
+    y las cachés nunca sirven una versión anterior.
         
     Returns:
         URL pública de la imagen subida
@@ -396,19 +646,38 @@ def upload_gift_image(participant_id: str, option_index: int, file_obj, file_nam
     if not APPWRITE_STORAGE_BUCKET_ID:
         raise ValueError("APPWRITE_STORAGE_BUCKET_ID no está configurado")
     
+    tmp_path = None
     try:
         print(f"[DEBUG] upload_gift_image: type={type(file_obj)}, attrs={dir(file_obj) if file_obj else None}")
         # Solo aceptar archivos file-like de Streamlit
         if not (file_obj and hasattr(file_obj, 'read') and hasattr(file_obj, 'name')):
             print(f"[ERROR] Archivo inválido: {type(file_obj)}")
             raise Exception("El archivo no es válido para subir. Usa solo archivos seleccionados en el formulario.")
-        file_obj.name = file_name
-        file_id = f"{participant_id}_option_{option_index}"
-        print(f"[DEBUG] Subiendo archivo: {file_obj.name}, id={file_id}")
+        # Los IDs de AppWrite admiten hasta 36 caracteres
+        file_id = f"{participant_id[:20]}_{option_index}_{uuid.uuid4().hex[:12]}"
+        
+        if encryption_password:
+            import tempfile
+            from appwrite.input_file import InputFile
+            from lib.encryption import encrypt_stream
+            
+            # Encriptar por bloques directo a disco (sin una segunda copia en memoria)
+            with tempfile.NamedTemporaryFile(suffix='.enc', delete=False) as tmp:
+                tmp_path = tmp.name
+                if hasattr(file_obj, 'seek'):
+                    file_obj.seek(0)
+                encrypt_stream(file_obj, tmp, encryption_password)
+            upload = InputFile.from_path(tmp_path)
+            upload.filename = f"{file_name}.enc"
+        else:
+            file_obj.name = file_name
+            upload = file_obj
+        
+        print(f"[DEBUG] Subiendo archivo: {file_name}, id={file_id}")
         result = storage.create_file(
             bucket_id=APPWRITE_STORAGE_BUCKET_ID,
             file_id=file_id,
-            file=file_obj
+            file=upload
         )
         print(f"[DEBUG] Resultado AppWrite: {result}")
         file_url = f"{APPWRITE_ENDPOINT}/storage/buckets/{APPWRITE_STORAGE_BUCKET_ID}/files/{result['$id']}/view?project={APPWRITE_PROJECT_ID}"
@@ -417,6 +686,43 @@ def upload_gift_image(participant_id: str, option_index: int, file_obj, file_nam
     except Exception as e:
         print(f"[ERROR] upload_gift_image: {str(e)}")
         raise Exception(f"Error al subir imagen: {str(e)}")
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def download_gift_image(file_id: str, dst, chunk_size: int = 64 * 1024) -> int:
+    """
+    Descarga una imagen de regalo (encriptada o no) por bloques a un archivo
+    
+    El SDK devuelve el archivo completo en memoria, así que se usa el
+    endpoint de descarga directamente y se copia bloque por bloque.
+    
+    Args:
+        file_id: ID del archivo en el bucket
+        dst: Archivo de salida (file-like binario)
+        chunk_size: Tamaño de bloque en bytes
+        
+    Returns:
+        Bytes escritos
+    """
+    if not APPWRITE_STORAGE_BUCKET_ID:
+        raise ValueError("APPWRITE_STORAGE_BUCKET_ID no está configurado")
+    
+    import urllib.request
+    
+    request = urllib.request.Request(
+        f"{APPWRITE_ENDPOINT}/storage/buckets/{APPWRITE_STORAGE_BUCKET_ID}/files/{file_id}/download",
+        headers={'X-Appwrite-Project': APPWRITE_PROJECT_ID, 'X-Appwrite-Key': APPWRITE_API_KEY}
+    )
+    total = 0
+    with urllib.request.urlopen(request, timeout=30) as response:
+        while True:
+            chunk = response.read(chunk_size)
+            if not chunk:
+                return total
+            dst.write(chunk)
+            total += len(chunk)
 
 
 def get_gift_image_url(participant_id: str, option_index: int) -> Optional[str]:
@@ -450,63 +756,31 @@ def get_gift_image_url(participant_id: str, option_index: int) -> Optional[str]:
 
 def delete_gift_image(participant_id: str, option_index: int) -> None:
     """
-    Elimina una imagen de regalo
+    Elimina una imagen de regalo subida con el ID fijo anterior
+    ({participant_id}_option_{option_index}); las nuevas se borran con
+    delete_gift_file
     
     Args:
         participant_id: ID del participante
         option_index: Índice de la opción de regalo
     """
-    if not APPWRITE_STORAGE_BUCKET_ID:
-        return
-    
-    try:
-        file_id = f"{participant_id}_option_{option_index}"
-        
-        storage.delete_file(
-            bucket_id=APPWRITE_STORAGE_BUCKET_ID,
-            file_id=file_id
-        )
-    except:
-        pass
-
+    delete_gift_file(f"{participant_id}_option_{option_index}")
 
-# ============== PASSWORD FUNCTIONS ==============
 
-def get_participant_by_name_and_password(name: str, password_hash: str, encryption_password: str) -> Optional[Dict[str, Any]]:
+def delete_gift_file(file_id: Optional[str]) -> None:
     """
-    Obtiene un participante por nombre (sin encriptar) y contraseña
+    Elimina un archivo de imagen de regalo (p. ej. el que se reemplazó)
     
     Args:
-        name: Nombre del participante en texto plano
-        password_hash: Hash de la contraseña para comparar
-        encryption_password: Contraseña de encriptación para desencriptar nombres
-        
-    Returns:
-        Datos del participante o None si no existe o la contraseña es incorrecta
+        file_id: ID del archivo en el bucket (ver lib.image_cache.file_id_from_url)
     """
-    from lib.encryption import decrypt
-    
-    # Obtener todos los participantes
-    participants = get_participants()
-    
-    if not participants:
-        return None
+    if not APPWRITE_STORAGE_BUCKET_ID or not file_id:
+        return
     
-    # Buscar el participante desencriptando nombres
-    for participant in participants:
-        try:
-            decrypted_name = decrypt(participant['encrypted_name'], encryption_password)
-            
-            # Verificar si el nombre coincide (ignorando mayúsculas/minúsculas y espacios extra)
-            if decrypted_name.strip().lower() == name.strip().lower():
-                # Verificar que el hash de contraseña coincida
-                if participant.get('password_hash') == password_hash:
-                    return participant
-                else:
-                    # Nombre correcto pero contraseña incorrecta
-                    return None
-        except:
-            # Si hay error al desencriptar, continuar con el siguiente
-            continue
-    
-    return None
+    try:
+        storage.delete_file(
+            bucket_id=APPWRITE_STORAGE_BUCKET_ID,
+            file_id=file_id
+        )
+    except Exception as e:
+        print(f"Error al eliminar imagen {file_id}: {str(e)}")
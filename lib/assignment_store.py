@@ -0,0 +1,222 @@
+"""
+Snapshots de asignaciones: cada sorteo como un solo documento
+En lugar de repartir el resultado en el campo assigned_to_id de N
+participantes, cada sorteo se guarda como un documento en la colección de
+asignaciones con el mapa {participant_id: assigned_to_id} empaquetado, la
+semilla y los metadatos (p. ej. el registro de auditoría). Así:
+
+- Guardar un sorteo es una escritura (commit_draw)
+- Reiniciarlo es una escritura: un snapshot vacío (reset_draw)
+- Auditarlo es una lectura (audit_draw)
+
+El snapshot vigente es el más reciente. Para saber a quién le regala alguien
+(resolve_match) se lee el snapshot vigente del repositorio (la caché de
+lib/cache.py no lo guarda, para que todos los procesos vean el mismo) y el
+mapa desempaquetado se guarda en memoria por draw_id, porque los snapshots
+no cambian una vez escritos. Los participantes
+que no están en el snapshot (asignados a mano, o sorteos anteriores a los
+snapshots) conservan su assigned_to_id.
+"""
+
+import base64
+import json
+import sys
+import threading
+import uuid
+import zlib
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Union
+
+from lib.sorteo import CompactAssignment, NO_ASSIGNMENT, as_dict, hash_assignments
+
+
+SNAPSHOT_VERSION = 1
+MAX_UNPACKED_SNAPSHOTS = 4  # Mapas desempaquetados que se conservan en memoria
+
+_unpacked = OrderedDict()
+_unpacked_lock = threading.Lock()
+
+
+def pack_assignments(assignments: Union[CompactAssignment, Dict[str, str]]) -> str:
+    """
+    Empaqueta {participant_id: assigned_to_id} en una cadena compacta
+
+    Formato: ids separados por salto de línea, un byte nulo y el arreglo de
+    sucesores (int32 little-endian, -1 sin asignación), comprimido con zlib
+    y codificado en base64 para guardarlo como texto. Una CompactAssignment
+    se empaqueta tal cual, sin pasar por el diccionario.
+
+    Args:
+        assignments: Asignaciones del sorteo
+
+    Returns:
+        Cadena base64
+    """
+    if isinstance(assignments, CompactAssignment):
+        ids = assignments.ids
+        successor = array('i', (j if j >= 0 else NO_ASSIGNMENT for j in assignments.successor))
+    else:
+        ids = sorted(set(assignments) | set(assignments.values()))
+        index = {participant_id: i for i, participant_id in enumerate(ids)}
+        successor = array('i', [NO_ASSIGNMENT]) * len(ids)
+        for participant_id, assigned_to_id in assignments.items():
+            successor[index[participant_id]] = index[assigned_to_id]
+
+    if sys.byteorder == 'big':
+        successor.byteswap()
+    raw = '\n'.join(ids).encode('utf-8') + b'\0' + successor.tobytes()
+    return base64.b64encode(zlib.compress(raw, 9)).decode('ascii')
+
+
+def unpack_assignments(packed: str) -> Dict[str, str]:
+    """
+    Desempaqueta una cadena creada con pack_assignments
+
+    Raises:
+        Exception: Si la cadena no tiene el formato esperado
+    """
+    try:
+        raw = zlib.decompress(base64.b64decode(packed))
+        names, _, successor_bytes = raw.partition(b'\0')
+        ids = names.decode('utf-8').split('\n') if names else []
+        successor = array('i')
+        successor.frombytes(successor_bytes)
+    except Exception as e:
+        raise Exception(f'Snapshot de asignaciones inválido: {str(e)}')
+
+    if sys.byteorder == 'big':
+        successor.byteswap()
+    if len(successor) != len(ids):
+        raise Exception('Snapshot de asignaciones inválido: tamaños inconsistentes')
+    return CompactAssignment(ids, successor).to_dict()
+
+
+def create_snapshot(assignments: Union[CompactAssignment, Dict[str, str]], seed: Optional[int] = None,
+                    metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Crea el documento de snapshot de un sorteo
+
+    Args:
+        assignments: Asignaciones {participant_id: assigned_to_id} o CompactAssignment
+        seed: Semilla del sorteo (se guarda como texto: puede exceder int64)
+        metadata: Datos adicionales serializables en JSON (auditoría, categoría, etc.)
+
+    Returns:
+        Dict con draw_id, version, created_at, seed, count, output_hash,
+        metadata (JSON) y packed
+    """
+    mapping = as_dict(assignments)
+    return {
+        'draw_id': uuid.uuid4().hex,
+        'version': SNAPSHOT_VERSION,
+        'created_at': datetime.utcnow().isoformat() + 'Z',
+        'seed': str(seed) if seed is not None else None,
+        'count': len(mapping),
+        'output_hash': hash_assignments(mapping),
+        'metadata': json.dumps(metadata or {}, sort_keys=True),
+        'packed': pack_assignments(assignments),
+    }
+
+
+def snapshot_assignments(snapshot: Optional[Dict[str, Any]]) -> Mapping[str, str]:
+    """
+    Mapa de asignaciones de un snapshot (de solo lectura)
+
+    Los snapshots no cambian, así que el mapa se desempaqueta una sola vez
+    por draw_id y se reutiliza en todas las sesiones.
+
+    Raises:
+        Exception: Si la versión del snapshot no es compatible
+    """
+    if not snapshot:
+        return MappingProxyType({})
+
+    draw_id = snapshot['draw_id']
+    with _unpacked_lock:
+        if draw_id in _unpacked:
+            _unpacked.move_to_end(draw_id)
+            return _unpacked[draw_id]
+
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        raise Exception(f"Versión de snapshot no soportada: {snapshot.get('version')}")
+    assignments = MappingProxyType(unpack_assignments(snapshot['packed']))
+
+    with _unpacked_lock:
+        _unpacked[draw_id] = assignments
+        while len(_unpacked) > MAX_UNPACKED_SNAPSHOTS:
+            _unpacked.popitem(last=False)
+    return assignments
+
+
+def commit_draw(repo, assignments: Union[CompactAssignment, Dict[str, str]], seed: Optional[int] = None,
+                metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Guarda el resultado de un sorteo con una sola escritura
+
+    Args:
+        repo: Repositorio (lib.repository.get_repository())
+        assignments: Asignaciones {participant_id: assigned_to_id} o CompactAssignment
+        seed: Semilla del sorteo
+        metadata: Datos adicionales (p. ej. create_audit_record)
+
+    Returns:
+        El snapshot guardado
+    """
+    return repo.save_assignment_snapshot(create_snapshot(assignments, seed, metadata))
+
+
+def reset_draw(repo, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Reinicia el sorteo con una sola escritura (un snapshot vacío)
+
+    Los snapshots anteriores se conservan para auditoría.
+    """
+    return repo.save_assignment_snapshot(create_snapshot({}, metadata=dict(metadata or {}, reset=True)))
+
+
+def resolve_match(repo, participant: Dict[str, Any]) -> Optional[str]:
+    """
+    ID del participante al que le regala `participant`
+
+    Busca en el snapshot vigente; si el participante no está en él, usa su
+    campo assigned_to_id.
+
+    Args:
+        repo: Repositorio
+        participant: Datos del participante (con id y assigned_to_id)
+
+    Returns:
+        ID del participante asignado o None
+    """
+    assignments = snapshot_assignments(repo.get_assignment_snapshot())
+    return assignments.get(participant['id']) or participant.get('assigned_to_id')
+
+
+def audit_draw(repo, draw_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Lee un sorteo guardado y verifica su integridad (una lectura)
+
+    Args:
+        repo: Repositorio
+        draw_id: Sorteo a auditar (por defecto el vigente)
+
+    Returns:
+        Dict con el snapshot sin 'packed', 'metadata' decodificado,
+        'assignments' y 'hash_ok' (el mapa coincide con output_hash)
+
+    Raises:
+        Exception: Si no existe el sorteo
+    """
+    snapshot = repo.get_assignment_snapshot(draw_id)
+    if not snapshot:
+        raise Exception(f"No existe el sorteo {draw_id or 'vigente'}")
+
+    assignments = dict(snapshot_assignments(snapshot))
+    report = {key: value for key, value in snapshot.items() if key != 'packed'}
+    report['metadata'] = json.loads(snapshot.get('metadata') or '{}')
+    report['assignments'] = assignments
+    report['hash_ok'] = hash_assignments(assignments) == snapshot['output_hash']
+    return report
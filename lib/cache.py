@@ -0,0 +1,248 @@
+"""
+Caché de lectura compartida para el repositorio de datos
+Streamlit vuelve a ejecutar el script en cada interacción de cada sesión, y
+cada rerun lee la configuración (dashboard) y a veces participantes (login).
+CachedRepository se coloca delante de cualquier Repository y sirve esas
+lecturas (y los snapshots de asignaciones pedidos por draw_id) desde memoria:
+
+- Es del proceso, así que la comparten todas las sesiones
+- Cada entrada vence a los CACHE_TTL segundos y hay como máximo CACHE_MAX_ENTRIES (LRU)
+- Las escrituras hechas por este proceso (incluido commit_assignments)
+  invalidan las entradas afectadas
+- Las búsquedas sin resultado (None) no se guardan, así que un participante
+  registrado por otro proceso puede entrar de inmediato
+- cache_metrics() expone aciertos, fallos y tasa de aciertos
+
+Los cambios hechos desde otros procesos se ven como mucho CACHE_TTL segundos
+después, así que lo que decide escrituras o debe ser igual para todos no pasa
+por la caché: las verificaciones de unicidad (check_name_index_exists), los
+recorridos por páginas (iter_participants), la configuración que protege el
+sorteo (get_settings_uncached) y el sorteo vigente (get_current_draw_id).
+
+El snapshot vigente (get_assignment_snapshot sin draw_id) se resuelve en dos
+pasos: el draw_id vigente se guarda solo CURRENT_DRAW_TTL segundos y el
+snapshot completo queda en caché por su draw_id, porque no cambia. Así un
+rerun del dashboard solo vuelve a traer el sorteo empaquetado cuando hay
+uno nuevo.
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from lib.repository import Repository
+
+
+CACHE_TTL = float(os.getenv('REPOSITORY_CACHE_TTL', 30))
+CACHE_MAX_ENTRIES = int(os.getenv('REPOSITORY_CACHE_MAX_ENTRIES', 1024))
+CURRENT_DRAW_TTL = float(os.getenv('REPOSITORY_CURRENT_DRAW_TTL', 5))
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Diccionario con vencimiento por entrada y tamaño máximo (LRU), seguro entre hilos"""
+
+    def __init__(self, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0  # Cambia con cada invalidación
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key) -> Any:
+        """Valor guardado o _MISSING si no existe o ya venció"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self._counters['misses'] += 1
+            return _MISSING
+
+    def set(self, key, value, generation: Optional[int] = None, ttl: Optional[float] = None) -> None:
+        """
+        Guarda un valor; si se pasa `generation` y hubo una invalidación desde
+        entonces, no se guarda (la lectura pudo ser anterior a la escritura).
+        `ttl` reemplaza el vencimiento por defecto para esta entrada
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def invalidate(self, predicate=None) -> None:
+        """Elimina las entradas cuya clave cumple `predicate` (todas si es None)"""
+        with self._lock:
+            keys = [key for key in self._entries if predicate is None or predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            self._generation += 1
+            self._counters['invalidations'] += len(keys)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._counters, entries=len(self._entries))
+        lookups = metrics['hits'] + metrics['misses']
+        metrics['hit_rate'] = metrics['hits'] / lookups if lookups else 0.0
+        return metrics
+
+
+class CachedRepository(Repository):
+    """
+    Repositorio con caché de lectura delante de otro repositorio
+
+    Los valores se copian al entrar y al salir de la caché, así que modificar
+    un participante devuelto no altera lo guardado.
+    """
+
+    def __init__(self, inner: Repository, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES,
+                 current_draw_ttl: float = CURRENT_DRAW_TTL):
+        self.inner = inner
+        self.cache = TTLCache(ttl, max_entries)
+        self.current_draw_ttl = min(current_draw_ttl, ttl)
+
+    def _cached(self, key, load):
+        generation = self.cache.generation
+        value = self.cache.get(key)
+        if value is _MISSING:
+            value = load()
+            # Un "no existe" no se guarda: otro proceso puede crear el registro
+            if value is not None:
+                self.cache.set(key, copy.deepcopy(value), generation)
+            return value
+        return copy.deepcopy(value)
+
+    def _invalidate_participants(self, participant_id: Optional[str] = None) -> None:
+        """Listas y búsquedas por índice siempre; el participante solo si se indica"""
+        self.cache.invalidate(lambda key: key[0] in ('participants', 'name_index')
+                              or (key[0] == 'participant' and key[1] == participant_id))
+
+    # ============== PARTICIPANTS ==============
+
+    def iter_participants(self, *args, **kwargs):
+        return self.inner.iter_participants(*args, **kwargs)
+
+    def get_participants(self, fields=None):
+        key = ('participants', None, tuple(fields or ()))
+        return self._cached(key, lambda: self.inner.get_participants(fields))
+
+    def get_participants_by_category(self, category, fields=None):
+        key = ('participants', category, tuple(fields or ()))
+        return self._cached(key, lambda: self.inner.get_participants_by_category(category, fields))
+
+    def get_participant_by_id(self, participant_id):
+        return self._cached(('participant', participant_id),
+                            lambda: self.inner.get_participant_by_id(participant_id))
+
+    def get_participant_by_name_index(self, name_index):
+        return self._cached(('name_index', name_index),
+                            lambda: self.inner.get_participant_by_name_index(name_index))
+
+    def check_name_index_exists(self, name_index):
+        return self.inner.check_name_index_exists(name_index)
+
+    def create_participant(self, encrypted_name, category, gift_options, password_hash,
+                           gift_images=None, name_index=None):
+        try:
+            return self.inner.create_participant(encrypted_name, category, gift_options, password_hash,
+                                                 gift_images, name_index=name_index)
+        finally:
+            self._invalidate_participants()
+
+    def update_participant(self, participant_id, data):
+        try:
+            return self.inner.update_participant(participant_id, data)
+        finally:
+            self._invalidate_participants(participant_id)
+
+    def update_participant_assignment(self, participant_id, assigned_to_id):
+        try:
+            return self.inner.update_participant_assignment(participant_id, assigned_to_id)
+        finally:
+            self._invalidate_participants(participant_id)
+
+    def commit_assignments(self, assignments):
+        try:
+            return self.inner.commit_assignments(assignments)
+        finally:
+            self.cache.invalidate(lambda key: key[0] in ('participants', 'name_index')
+                                  or (key[0] == 'participant' and key[1] in assignments))
+
+    def delete_participant(self, participant_id):
+        try:
+            return self.inner.delete_participant(participant_id)
+        finally:
+            self._invalidate_participants(participant_id)
+
+    def reset_all_assignments(self):
+        # El repositorio interno guarda el snapshot vacío (reset_draw)
+        try:
+            return self.inner.reset_all_assignments()
+        finally:
+            self.cache.invalidate()
+
+    # ============== SETTINGS ==============
+
+    def get_settings(self):
+        return self._cached(('settings',), self.inner.get_settings)
+
+    def get_settings_uncached(self):
+        return self.inner.get_settings_uncached()
+
+    def update_settings(self, updates):
+        try:
+            return self.inner.update_settings(updates)
+        finally:
+            self.cache.invalidate(lambda key: key[0] == 'settings')
+
+    # ============== ASSIGNMENT SNAPSHOTS ==============
+
+    def save_assignment_snapshot(self, snapshot):
+        try:
+            return self.inner.save_assignment_snapshot(snapshot)
+        finally:
+            self.cache.invalidate(lambda key: key[0] == 'current_draw')
+
+    def get_assignment_snapshot(self, draw_id=None):
+        if draw_id is None:
+            # Otro proceso pudo guardar uno más reciente: el draw_id vigente vence pronto
+            generation = self.cache.generation
+            draw_id = self.cache.get(('current_draw',))
+            if draw_id is _MISSING:
+                draw_id = self.inner.get_current_draw_id()
+                self.cache.set(('current_draw',), draw_id, generation, ttl=self.current_draw_ttl)
+            if draw_id is None:
+                return None
+        return self._cached(('snapshot', draw_id), lambda: self.inner.get_assignment_snapshot(draw_id))
+
+    def get_current_draw_id(self):
+        return self.inner.get_current_draw_id()
+
+    # ============== METRICS ==============
+
+    def cache_metrics(self) -> Dict[str, Any]:
+        """
+        Contadores de la caché
+
+        Returns:
+            Diccionario con hits, misses, hit_rate, evictions, invalidations
+            y entries (entradas vigentes)
+        """
+        return self.cache.metrics()
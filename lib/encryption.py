@@ -7,9 +7,15 @@ from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.exceptions import InvalidTag
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from typing import Dict, List, Optional, Sequence
 import os
 import base64
 import hashlib
+import hmac
 
 
 # Constantes
@@ -18,6 +24,23 @@ KEY_LENGTH = 32  # 256 bits
 IV_LENGTH = 12  # 96 bits
 SALT_LENGTH = 16  # 128 bits
 ITERATIONS = 100000
+KEY_CACHE_SIZE = 256  # Claves derivadas (password, salt) en memoria
+TAG_LENGTH = 16  # 128 bits
+
+# Formatos del texto encriptado
+FORMAT_LEGACY = 1  # salt + iv + ciphertext (una derivación por registro)
+FORMAT_V2 = 0x02  # versión + nonce + ciphertext (clave maestra por proceso)
+MASTER_SALT = b'gift-exchange:v2'  # Salt fijo de la aplicación para la clave maestra
+INDEX_SALT = b'gift-exchange:name-index'  # Salt de la clave del índice ciego
+STREAM_SALT = b'gift-exchange:stream'  # Salt de la clave de archivos (imágenes)
+V2_MIN_LENGTH = 1 + IV_LENGTH + TAG_LENGTH
+LEGACY_MIN_LENGTH = SALT_LENGTH + IV_LENGTH + TAG_LENGTH
+
+# Encriptación por bloques de archivos: magic + tamaño de bloque + prefijo de nonce
+STREAM_MAGIC = b'GXS\x01'
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_PREFIX_LENGTH = 7  # nonce = prefijo (7) + contador (4) + último (1)
+STREAM_HEADER_LENGTH = len(STREAM_MAGIC) + 4 + STREAM_PREFIX_LENGTH
 
 
 def derive_key(password: str, salt: bytes) -> bytes:
@@ -41,10 +64,67 @@ def derive_key(password: str, salt: bytes) -> bytes:
     return kdf.derive(password.encode('utf-8'))
 
 
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def _cipher_for(password: str, salt: bytes) -> AESGCM:
+    """
+    Cifrador AES-GCM para (password, salt), con la clave derivada en caché
+
+    Desencriptar de nuevo el mismo registro (p. ej. en cada rerun de
+    Streamlit) reutiliza la clave sin volver a correr PBKDF2. La caché es
+    LRU, acotada a KEY_CACHE_SIZE entradas y segura entre hilos.
+    """
+    return AESGCM(derive_key(password, salt))
+
+
+def key_cache_info() -> dict:
+    """
+    Estadísticas de la caché de claves derivadas
+
+    Returns:
+        Diccionario con hits, misses, size y max_size
+    """
+    info = _cipher_for.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
+
+
+def clear_key_cache() -> None:
+    """Vacía la caché de claves derivadas (p. ej. tras rotar la contraseña)"""
+    _cipher_for.cache_clear()
+    _index_key.cache_clear()
+
+
 def encrypt(text: str, password: str) -> str:
     """
     Encripta un texto usando AES-256-GCM con una contraseña
     
+    Usa el formato v2: la clave se deriva una sola vez por proceso (salt fijo
+    de la aplicación) y cada registro lleva su propio nonce aleatorio.
+    
+    Args:
+        text: Texto a encriptar
+        password: Contraseña para derivar la clave
+        
+    Returns:
+        String en base64 con formato: versión (0x02) + nonce + ciphertext
+    """
+    # Generar nonce aleatorio
+    iv = os.urandom(IV_LENGTH)
+    
+    # Encriptar con la clave maestra (derivada una vez y en caché)
+    aesgcm = _cipher_for(password, MASTER_SALT)
+    ciphertext = aesgcm.encrypt(iv, text.encode('utf-8'), None)
+    
+    # Combinar versión + nonce + ciphertext y convertir a base64
+    return base64.b64encode(bytes([FORMAT_V2]) + iv + ciphertext).decode('utf-8')
+
+
+def encrypt_legacy(text: str, password: str) -> str:
+    """
+    Encripta con el formato original (salt + iv + ciphertext)
+    
+    Cada registro tiene su propio salt, así que cuesta una derivación PBKDF2
+    por registro. Solo se conserva por compatibilidad.
+    
     Args:
         text: Texto a encriptar
         password: Contraseña para derivar la clave
@@ -70,10 +150,59 @@ def encrypt(text: str, password: str) -> str:
     return base64.b64encode(result).decode('utf-8')
 
 
+def ciphertext_version(encrypted_text: str) -> int:
+    """
+    Detecta el formato de un texto encriptado sin derivar claves
+    
+    Un registro legacy cuyo salt empieza con 0x02 se reporta como v2; decrypt
+    resuelve ese caso probando el formato legacy si falla el v2.
+    
+    Args:
+        encrypted_text: Texto encriptado en base64
+        
+    Returns:
+        FORMAT_V2 o FORMAT_LEGACY
+        
+    Raises:
+        Exception: Si el texto no es base64 válido o es demasiado corto
+    """
+    return _parse(encrypted_text)[0]
+
+
+def _parse(encrypted_text: str):
+    """Decodifica y valida la longitud antes de cualquier trabajo costoso"""
+    if not isinstance(encrypted_text, str) or not encrypted_text:
+        raise Exception('Datos corruptos: texto encriptado vacío')
+    try:
+        data = base64.b64decode(encrypted_text, validate=True)
+    except ValueError:
+        raise Exception('Datos corruptos: el texto encriptado no es base64 válido')
+    
+    if len(data) >= V2_MIN_LENGTH and data[0] == FORMAT_V2:
+        return FORMAT_V2, data
+    if len(data) >= LEGACY_MIN_LENGTH:
+        return FORMAT_LEGACY, data
+    raise Exception('Datos corruptos: texto encriptado demasiado corto')
+
+
+def _decrypt_legacy(data: bytes, password: str) -> bytes:
+    """Desencripta el formato salt + iv + ciphertext"""
+    # Extraer salt, iv y ciphertext
+    salt = data[:SALT_LENGTH]
+    iv = data[SALT_LENGTH:SALT_LENGTH + IV_LENGTH]
+    ciphertext = data[SALT_LENGTH + IV_LENGTH:]
+    
+    # Clave derivada desde contraseña (en caché por registro)
+    return _cipher_for(password, salt).decrypt(iv, ciphertext, None)
+
+
 def decrypt(encrypted_text: str, password: str) -> str:
     """
     Desencripta un texto usando AES-256-GCM con una contraseña
     
+    Lee tanto el formato v2 como el legacy (salt + iv + ciphertext). Las
+    entradas mal formadas se rechazan antes de derivar cualquier clave.
+    
     Args:
         encrypted_text: Texto encriptado en base64
         password: Contraseña para derivar la clave
@@ -84,21 +213,21 @@ def decrypt(encrypted_text: str, password: str) -> str:
     Raises:
         Exception: Si la contraseña es incorrecta o los datos están corruptos
     """
+    version, data = _parse(encrypted_text)
+    
     try:
-        # Decodificar desde base64
-        data = base64.b64decode(encrypted_text)
-        
-        # Extraer salt, iv y ciphertext
-        salt = data[:SALT_LENGTH]
-        iv = data[SALT_LENGTH:SALT_LENGTH + IV_LENGTH]
-        ciphertext = data[SALT_LENGTH + IV_LENGTH:]
-        
-        # Derivar clave desde contraseña
-        key = derive_key(password, salt)
-        
-        # Desencriptar usando AES-GCM
-        aesgcm = AESGCM(key)
-        plaintext = aesgcm.decrypt(iv, ciphertext, None)
+        if version == FORMAT_V2:
+            try:
+                plaintext = _cipher_for(password, MASTER_SALT).decrypt(
+                    data[1:1 + IV_LENGTH], data[1 + IV_LENGTH:], None
+                )
+            except InvalidTag:
+                # Puede ser un registro legacy cuyo salt empieza con 0x02
+                if len(data) < LEGACY_MIN_LENGTH:
+                    raise
+                plaintext = _decrypt_legacy(data, password)
+        else:
+            plaintext = _decrypt_legacy(data, password)
         
         # Convertir a string
         return plaintext.decode('utf-8')
@@ -106,22 +235,243 @@ def decrypt(encrypted_text: str, password: str) -> str:
         raise Exception(f'Contraseña incorrecta o datos corruptos: {str(e)}')
 
 
+def _encrypt_item(text: str, password: str) -> Dict[str, Optional[str]]:
+    try:
+        return {'value': encrypt(text, password), 'error': None}
+    except Exception as e:
+        return {'value': None, 'error': str(e)}
+
+
+def _decrypt_item(encrypted_text: str, password: str) -> Dict[str, Optional[str]]:
+    try:
+        return {'value': decrypt(encrypted_text, password), 'error': None}
+    except Exception as e:
+        return {'value': None, 'error': str(e)}
+
+
+def _map_items(fn, items: Sequence[str], password: str,
+               max_workers: Optional[int], mode: str) -> List[Dict[str, Optional[str]]]:
+    """Aplica fn a cada elemento en un pool, conservando el orden"""
+    if mode not in ('thread', 'process'):
+        raise ValueError(f"mode debe ser 'thread' o 'process', se recibió {mode!r}")
+    
+    items = list(items)
+    workers = min(max_workers or os.cpu_count() or 1, len(items))
+    if workers <= 1:
+        return [fn(item, password) for item in items]
+    
+    executor_class = ProcessPoolExecutor if mode == 'process' else ThreadPoolExecutor
+    # Bloques grandes: cada proceso deriva la clave maestra una sola vez
+    chunksize = max(1, len(items) // (workers * 4))
+    with executor_class(max_workers=workers) as executor:
+        return list(executor.map(fn, items, repeat(password), chunksize=chunksize))
+
+
+def encrypt_many(texts: Sequence[str], password: str, max_workers: Optional[int] = None,
+                 mode: str = 'thread') -> List[Dict[str, Optional[str]]]:
+    """
+    Encripta muchos textos en paralelo
+    
+    Args:
+        texts: Textos a encriptar
+        password: Contraseña para derivar la clave
+        max_workers: Hilos/procesos a usar (por defecto, uno por núcleo)
+        mode: 'thread' o 'process' (procesos para usar todos los núcleos
+            cuando domina el costo de CPU en Python)
+        
+    Returns:
+        Lista en el mismo orden que `texts` con {'value', 'error'} por
+        elemento; un error no detiene el resto del lote
+    """
+    return _map_items(_encrypt_item, texts, password, max_workers, mode)
+
+
+def decrypt_many(encrypted_texts: Sequence[str], password: str, max_workers: Optional[int] = None,
+                 mode: str = 'thread') -> List[Dict[str, Optional[str]]]:
+    """
+    Desencripta muchos textos en paralelo (formato v2 o legacy)
+    
+    Útil para exportar todos los nombres o rotar la clave: los registros
+    legacy cuestan una derivación PBKDF2 cada uno y se reparten entre los
+    núcleos.
+    
+    Args:
+        encrypted_texts: Textos encriptados en base64
+        password: Contraseña para derivar la clave
+        max_workers: Hilos/procesos a usar (por defecto, uno por núcleo)
+        mode: 'thread' o 'process'
+        
+    Returns:
+        Lista en el mismo orden que `encrypted_texts` con {'value', 'error'}
+        por elemento; un error no detiene el resto del lote
+    """
+    return _map_items(_decrypt_item, encrypted_texts, password, max_workers, mode)
+
+
+def _read_full(src, size: int) -> bytes:
+    """Lee hasta `size` bytes aunque el archivo entregue lecturas parciales"""
+    parts = []
+    remaining = size
+    while remaining:
+        data = src.read(remaining)
+        if not data:
+            break
+        parts.append(data)
+        remaining -= len(data)
+    return b''.join(parts)
+
+
+def _stream_nonce(prefix: bytes, counter: int, last: bool) -> bytes:
+    if counter >= 2 ** 32:
+        raise Exception('Archivo demasiado grande para encriptar por bloques')
+    return prefix + counter.to_bytes(4, 'big') + (b'\x01' if last else b'\x00')
+
+
+def encrypt_stream(src, dst, password: str, chunk_size: int = STREAM_CHUNK_SIZE) -> int:
+    """
+    Encripta un archivo por bloques con AES-256-GCM (sin cargarlo completo)
+    
+    Cada bloque se autentica por separado; el nonce incluye un contador y una
+    marca de último bloque, así que reordenar, quitar o truncar bloques se
+    detecta al desencriptar. Solo hay dos bloques en memoria a la vez.
+    
+    Args:
+        src: Archivo de entrada (file-like binario, se lee con read())
+        dst: Archivo de salida (file-like binario, se escribe con write())
+        password: Contraseña para derivar la clave (en caché por proceso)
+        chunk_size: Tamaño de bloque en bytes
+        
+    Returns:
+        Bytes de texto plano procesados
+    """
+    aesgcm = _cipher_for(password, STREAM_SALT)
+    prefix = os.urandom(STREAM_PREFIX_LENGTH)
+    header = STREAM_MAGIC + chunk_size.to_bytes(4, 'big') + prefix
+    dst.write(header)
+    
+    total = 0
+    counter = 0
+    chunk = _read_full(src, chunk_size)
+    while True:
+        next_chunk = _read_full(src, chunk_size) if len(chunk) == chunk_size else b''
+        last = not next_chunk
+        dst.write(aesgcm.encrypt(_stream_nonce(prefix, counter, last), chunk, header))
+        total += len(chunk)
+        if last:
+            return total
+        chunk = next_chunk
+        counter += 1
+
+
+def is_encrypted_stream(head: bytes) -> bool:
+    """Indica si unos bytes iniciales corresponden a un archivo de encrypt_stream"""
+    return head[:len(STREAM_MAGIC)] == STREAM_MAGIC
+
+
+def decrypt_stream(src, dst, password: str) -> int:
+    """
+    Desencripta un archivo generado por encrypt_stream, bloque por bloque
+    
+    Si falla a la mitad, `dst` puede haber recibido bloques ya verificados;
+    escribe en un archivo temporal y descártalo ante un error.
+    
+    Args:
+        src: Archivo encriptado (file-like binario)
+        dst: Archivo de salida (file-like binario)
+        password: Contraseña para derivar la clave
+        
+    Returns:
+        Bytes de texto plano escritos
+        
+    Raises:
+        Exception: Si el formato no es válido, la contraseña es incorrecta o
+            el archivo fue modificado o truncado
+    """
+    header = _read_full(src, STREAM_HEADER_LENGTH)
+    if len(header) < STREAM_HEADER_LENGTH or not is_encrypted_stream(header):
+        raise Exception('Datos corruptos: no es un archivo encriptado por bloques')
+    chunk_size = int.from_bytes(header[len(STREAM_MAGIC):len(STREAM_MAGIC) + 4], 'big')
+    prefix = header[len(STREAM_MAGIC) + 4:]
+    sealed_size = chunk_size + TAG_LENGTH
+    
+    aesgcm = _cipher_for(password, STREAM_SALT)
+    total = 0
+    counter = 0
+    block = _read_full(src, sealed_size)
+    while True:
+        next_block = _read_full(src, sealed_size) if len(block) == sealed_size else b''
+        last = not next_block
+        try:
+            plaintext = aesgcm.decrypt(_stream_nonce(prefix, counter, last), block, header)
+        except InvalidTag:
+            raise Exception('Contraseña incorrecta o archivo corrupto/truncado')
+        dst.write(plaintext)
+        total += len(plaintext)
+        if last:
+            return total
+        block = next_block
+        counter += 1
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normaliza un nombre para compararlo: sin espacios extra y en minúsculas
+    
+    Args:
+        name: Nombre en texto plano
+        
+    Returns:
+        Nombre normalizado
+    """
+    return ' '.join(name.split()).lower()
+
+
+def name_index(name: str, password: str) -> str:
+    """
+    Índice ciego del nombre: HMAC-SHA256 del nombre normalizado
+    
+    Es determinístico (el mismo nombre siempre da el mismo índice), así que
+    permite buscar participantes por nombre con una consulta de igualdad sin
+    guardar el nombre en claro. La clave del HMAC se deriva de la contraseña
+    de encriptación con un salt propio y se reutiliza desde la caché.
+    
+    Args:
+        name: Nombre en texto plano
+        password: Contraseña de encriptación de la aplicación
+        
+    Returns:
+        Índice en formato hexadecimal (64 caracteres)
+    """
+    key = _index_key(password)
+    return hmac.new(key, normalize_name(name).encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+@lru_cache(maxsize=8)
+def _index_key(password: str) -> bytes:
+    return derive_key(password, INDEX_SALT)
+
+
 def hash_password(password: str) -> str:
     """
-    Crea un hash de la contraseña usando SHA-256
+    Crea un hash de la contraseña con salt (scrypt o PBKDF2)
+    
+    Delegado a lib.password_hashing; el formato incluye algoritmo, costos y salt.
     
     Args:
         password: Contraseña en texto plano
         
     Returns:
-        Hash en formato hexadecimal
+        Hash en formato autodescriptivo
     """
-    return hashlib.sha256(password.encode('utf-8')).hexdigest()
+    from lib.password_hashing import hash_password as _hash_password
+    return _hash_password(password)
 
 
 def verify_password(password: str, password_hash: str) -> bool:
     """
-    Verifica si una contraseña coincide con su hash
+    Verifica si una contraseña coincide con su hash (en tiempo constante)
+    
+    Acepta los hashes nuevos y los SHA-256 legacy.
     
     Args:
         password: Contraseña en texto plano
@@ -130,4 +480,5 @@ def verify_password(password: str, password_hash: str) -> bool:
     Returns:
         True si coinciden, False en caso contrario
     """
-    return hash_password(password) == password_hash
+    from lib.password_hashing import verify_password as _verify_password
+    return _verify_password(password, password_hash)
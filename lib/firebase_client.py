@@ -4,8 +4,9 @@ Migrado desde Supabase
 """
 
 import os
+import sys
 import json
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator
 import firebase_admin
 from firebase_admin import credentials, firestore, storage
 from dotenv import load_dotenv
@@ -65,26 +66,63 @@ if not firebase_admin._apps:
 db = firestore.client()
 bucket = storage.bucket()
 
+# Máximo de operaciones por escritura por lotes de Firestore
+BATCH_LIMIT = 500
+
+# Documentos por página al recorrer colecciones
+PAGE_SIZE = int(os.getenv('FIREBASE_PAGE_SIZE', 500))
+
 
 # ============== PARTICIPANTS ==============
 
-def get_participants() -> List[Dict[str, Any]]:
+def iter_participants(page_size: int = PAGE_SIZE, category: Optional[str] = None,
+                      after: Optional[str] = None,
+                      fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre todos los participantes página por página (cursor por ID de documento)
+    
+    Args:
+        page_size: Documentos por consulta
+        category: Solo participantes de esta categoría (opcional)
+        after: ID del documento después del cual empezar (para reanudar)
+        fields: Campos a traer (proyección select()); None trae el documento completo
+        
+    Yields:
+        Participantes ordenados por ID de documento
+    """
+    query = db.collection('participants')
+    if category:
+        query = query.where('category', '==', category)
+    if fields:
+        query = query.select([field for field in fields if field != 'id'])
+    query = query.order_by('__name__').limit(page_size)
+    
+    last = db.collection('participants').document(after).get() if after else None
+    while True:
+        page = query.start_after(last) if last is not None else query
+        docs = list(page.stream())
+        
+        for doc in docs:
+            data = doc.to_dict()
+            data['id'] = doc.id
+            yield data
+        
+        if len(docs) < page_size:
+            return
+        last = docs[-1]
+
+
+def get_participants(fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     """
     Obtiene todos los participantes
     
+    Args:
+        fields: Campos a traer, p. ej. ['id', 'category'] (None = todos)
+        
     Returns:
         Lista de participantes
     """
-    participants_ref = db.collection('participants')
-    docs = participants_ref.stream()
-    
-    participants = []
-    for doc in docs:
-        data = doc.to_dict()
-        data['id'] = doc.id
-        participants.append(data)
-    
-    return participants
+    return list(iter_participants(fields=fields))
 
 
 def get_participant_by_id(participant_id: str) -> Optional[Dict[str, Any]]:
@@ -125,7 +163,45 @@ def check_name_exists(encrypted_name: str) -> bool:
     return len(docs) > 0
 
 
-def create_participant(encrypted_name: str, category: str, gift_options: List[str], password_hash: str, gift_images: Optional[List[str]] = None) -> Dict[str, Any]:
+def get_participant_by_name_index(name_index: str) -> Optional[Dict[str, Any]]:
+    """
+    Obtiene un participante por el índice ciego de su nombre (una lectura indexada)
+    
+    Args:
+        name_index: Índice del nombre (lib.encryption.name_index)
+        
+    Returns:
+        Datos del participante o None si no existe
+    """
+    participants_ref = db.collection('participants')
+    query = participants_ref.where('name_index', '==', name_index).limit(1)
+    docs = list(query.stream())
+    
+    if not docs:
+        return None
+    
+    data = docs[0].to_dict()
+    data['id'] = docs[0].id
+    return data
+
+
+def check_name_index_exists(name_index: str) -> bool:
+    """
+    Verifica si ya existe un participante con el mismo nombre (por índice ciego)
+    
+    A diferencia de check_name_exists, funciona aunque el nombre encriptado
+    use un salt/nonce aleatorio.
+    
+    Args:
+        name_index: Índice del nombre (lib.encryption.name_index)
+        
+    Returns:
+        True si existe, False en caso contrario
+    """
+    return get_participant_by_name_index(name_index) is not None
+
+
+def create_participant(encrypted_name: str, category: str, gift_options: List[str], password_hash: str, gift_images: Optional[List[str]] = None, name_index: Optional[str] = None) -> Dict[str, Any]:
     """
     Crea un nuevo participante
     
@@ -135,6 +211,7 @@ def create_participant(encrypted_name: str, category: str, gift_options: List[st
         gift_options: Lista de opciones de regalo
         password_hash: Hash de la contraseña del participante
         gift_images: Lista de URLs de imágenes de regalos (opcional)
+        name_index: Índice ciego del nombre para búsquedas (opcional)
         
     Returns:
         Datos del participante creado
@@ -156,6 +233,8 @@ def create_participant(encrypted_name: str, category: str, gift_options: List[st
         'assigned_to_id': None,
         'created_at': datetime.utcnow()
     }
+    if name_index:
+        data['name_index'] = name_index
     
     try:
         db.collection('participants').document(participant_id).set(data)
@@ -174,17 +253,68 @@ def update_participant_assignment(participant_id: str, assigned_to_id: str) -> D
         assigned_to_id: UUID del participante asignado
         
     Returns:
-        Datos del participante actualizado
+        id y campo escrito (igual en todos los backends; no se relee el documento)
     """
     doc_ref = db.collection('participants').document(participant_id)
     
     try:
         doc_ref.update({'assigned_to_id': assigned_to_id})
-        return get_participant_by_id(participant_id)
+        return {'id': participant_id, 'assigned_to_id': assigned_to_id}
     except Exception as e:
         raise Exception(f'Error al actualizar asignación para {participant_id}: {str(e)}')
 
 
+def update_participant(participant_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Actualiza campos de un participante
+    
+    Args:
+        participant_id: ID del participante
+        data: Campos a actualizar (p. ej. {'password_hash': ...})
+        
+    Returns:
+        id y campos escritos (igual en todos los backends; no se relee el documento)
+    """
+    doc_ref = db.collection('participants').document(participant_id)
+    
+    try:
+        doc_ref.update(data)
+        return {**data, 'id': participant_id}
+    except Exception as e:
+        raise Exception(f'Error al actualizar participante {participant_id}: {str(e)}')
+
+
+def commit_assignments(assignments: Dict[str, str]) -> Dict[str, str]:
+    """
+    Guarda las asignaciones de un sorteo con escrituras por lotes
+    
+    Cada lote (hasta BATCH_LIMIT documentos) es atómico: si falla, todas sus
+    asignaciones se reportan como fallidas y los demás lotes continúan.
+    
+    Args:
+        assignments: Diccionario {participant_id: assigned_to_id}
+        
+    Returns:
+        Diccionario {participant_id: error} con las asignaciones que fallaron
+        (vacío si todas se guardaron)
+    """
+    participants_ref = db.collection('participants')
+    items = list(assignments.items())
+    failures = {}
+    
+    for start in range(0, len(items), BATCH_LIMIT):
+        chunk = items[start:start + BATCH_LIMIT]
+        batch = db.batch()
+        for participant_id, assigned_to_id in chunk:
+            batch.update(participants_ref.document(participant_id), {'assigned_to_id': assigned_to_id})
+        try:
+            batch.commit()
+        except Exception as e:
+            failures.update({participant_id: str(e) for participant_id, _ in chunk})
+    
+    return failures
+
+
 # ============== SETTINGS ==============
 
 def get_settings() -> Dict[str, Any]:
@@ -236,15 +366,83 @@ def update_settings(updates: Dict[str, Any]) -> Dict[str, Any]:
         raise Exception(f'Error al actualizar configuración: {str(e)}')
 
 
+# ============== ASSIGNMENT SNAPSHOTS ==============
+
+def save_assignment_snapshot(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Guarda el snapshot de un sorteo como un documento (ver lib/assignment_store.py)
+    
+    Un documento de Firestore admite hasta 1 MiB, unos 20,000 participantes
+    con el formato empaquetado.
+    
+    Args:
+        snapshot: Snapshot creado con create_snapshot; draw_id es el ID del documento
+        
+    Returns:
+        Snapshot guardado
+    """
+    data = {field: value for field, value in snapshot.items() if field != 'draw_id'}
+    
+    try:
+        db.collection('assignments').document(snapshot['draw_id']).set(data)
+        return dict(snapshot)
+    except Exception as e:
+        raise Exception(f'Error al guardar el sorteo: {str(e)}')
+
+
+def get_assignment_snapshot(draw_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Obtiene el snapshot de un sorteo con una sola lectura
+    
+    Args:
+        draw_id: ID del sorteo (por defecto el más reciente)
+        
+    Returns:
+        Snapshot o None si no existe
+    """
+    assignments_ref = db.collection('assignments')
+    
+    if draw_id:
+        docs = [assignments_ref.document(draw_id).get()]
+    else:
+        query = assignments_ref.order_by('created_at', direction=firestore.Query.DESCENDING).limit(1)
+        docs = list(query.stream())
+    
+    if not docs or not docs[0].exists:
+        return None
+    
+    snapshot = docs[0].to_dict()
+    snapshot['draw_id'] = docs[0].id
+    return snapshot
+
+
+def get_current_draw_id() -> Optional[str]:
+    """
+    Obtiene el ID del sorteo más reciente sin traer el sorteo empaquetado
+    
+    Returns:
+        draw_id o None si no hay sorteos
+    """
+    query = (db.collection('assignments')
+             .order_by('created_at', direction=firestore.Query.DESCENDING)
+             .select([])  # Solo la referencia
+             .limit(1))
+    docs = list(query.stream())
+    return docs[0].id if docs else None
+
+
 # ============== UTILITY FUNCTIONS ==============
 
 def reset_all_assignments() -> None:
     """
     Reinicia todas las asignaciones (útil para testing)
     ADVERTENCIA: Esta función eliminará todas las asignaciones
+    
+    También guarda un snapshot vacío (reset_draw) para que el último sorteo
+    deje de tener prioridad sobre assigned_to_id en resolve_match.
     """
     participants_ref = db.collection('participants')
-    docs = participants_ref.stream()
+    docs = participants_ref.select([]).stream()  # Solo las referencias
     
     batch = db.batch()
     for doc in docs:
@@ -252,30 +450,25 @@ def reset_all_assignments() -> None:
     
     batch.commit()
     
+    # Este módulo expone save_assignment_snapshot, así que sirve como repositorio
+    from lib.assignment_store import reset_draw
+    reset_draw(sys.modules[__name__])
+    
     update_settings({'sorteo_completed': False, 'names_revealed': False})
 
 
-def get_participants_by_category(category: str) -> List[Dict[str, Any]]:
+def get_participants_by_category(category: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     """
     Obtiene participantes filtrados por categoría
     
     Args:
         category: 'elite' o 'diversion'
+        fields: Campos a traer (None = todos)
         
     Returns:
         Lista de participantes de la categoría especificada
     """
-    participants_ref = db.collection('participants')
-    query = participants_ref.where('category', '==', category)
-    docs = query.stream()
-    
-    participants = []
-    for doc in docs:
-        data = doc.to_dict()
-        data['id'] = doc.id
-        participants.append(data)
-    
-    return participants
+    return list(iter_participants(category=category, fields=fields))
 
 
 def delete_participant(participant_id: str) -> None:
@@ -365,45 +558,3 @@ def delete_gift_image(participant_id: str, option_index: int) -> None:
                 break
     except:
         pass
-
-
-# ============== PASSWORD FUNCTIONS ==============
-
-def get_participant_by_name_and_password(name: str, password_hash: str, encryption_password: str) -> Optional[Dict[str, Any]]:
-    """
-    Obtiene un participante por nombre (sin encriptar) y contraseña
-    
-    Args:
-        name: Nombre del participante en texto plano
-        password_hash: Hash de la contraseña para comparar
-        encryption_password: Contraseña de encriptación para desencriptar nombres
-        
-    Returns:
-        Datos del participante o None si no existe o la contraseña es incorrecta
-    """
-    from lib.encryption import decrypt
-    
-    # Obtener todos los participantes
-    participants = get_participants()
-    
-    if not participants:
-        return None
-    
-    # Buscar el participante desencriptando nombres
-    for participant in participants:
-        try:
-            decrypted_name = decrypt(participant['encrypted_name'], encryption_password)
-            
-            # Verificar si el nombre coincide (ignorando mayúsculas/minúsculas y espacios extra)
-            if decrypted_name.strip().lower() == name.strip().lower():
-                # Verificar que el hash de contraseña coincida
-                if participant.get('password_hash') == password_hash:
-                    return participant
-                else:
-                    # Nombre correcto pero contraseña incorrecta
-                    return None
-        except:
-            # Si hay error al desencriptar, continuar con el siguiente
-            continue
-    
-    return None
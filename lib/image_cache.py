@@ -0,0 +1,115 @@
+"""
+Caché local de imágenes de regalos desencriptadas
+Las imágenes encriptadas por bloques (lib.encryption.encrypt_stream) no se
+pueden mostrar con su URL pública; aquí se descargan una vez por bloques a un
+archivo temporal, se desencriptan en streaming y se guardan en disco para que
+Streamlit las sirva desde la ruta local en cada rerun
+
+La caché se indexa por URL. Al reemplazar una imagen se sube un archivo con
+un ID nuevo (ver upload_gift_image), así que la URL cambia y ningún proceso
+sirve una versión anterior.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+from typing import Optional
+
+
+CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'gift_images_cache'))
+CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+_FILE_ID_PATTERN = re.compile(r'/files/([^/]+)/')
+
+
+def _cache_path(url: str) -> str:
+    return os.path.join(CACHE_DIR, hashlib.sha256(url.encode('utf-8')).hexdigest()[:32])
+
+
+def file_id_from_url(url: str) -> Optional[str]:
+    """Extrae el ID de archivo de una URL de AppWrite Storage"""
+    match = _FILE_ID_PATTERN.search(url or '')
+    return match.group(1) if match else None
+
+
+def cached_image(url: Optional[str], password: str) -> Optional[str]:
+    """
+    Ruta local de la imagen desencriptada
+
+    Las imágenes subidas sin encriptar se guardan tal cual, así que la
+    función sirve para ambos casos.
+
+    Args:
+        url: URL de la imagen guardada en gift_images
+        password: Contraseña de encriptación de la aplicación
+
+    Returns:
+        Ruta del archivo en la caché, la URL original si no es de AppWrite, o
+        None si no hay imagen o no se pudo descargar o desencriptar (nunca se
+        devuelve la URL de un archivo que puede estar encriptado)
+    """
+    if not url:
+        return None
+
+    path = _cache_path(url)
+    if os.path.exists(path):
+        os.utime(path)  # Marca de uso reciente para la limpieza
+        return path
+
+    file_id = file_id_from_url(url)
+    if not file_id:
+        return url
+
+    from lib.appwrite_client import download_gift_image
+    from lib.encryption import decrypt_stream, is_encrypted_stream
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    download_fd, download_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    os.close(fd)
+    try:
+        with os.fdopen(download_fd, 'w+b') as downloaded:
+            download_gift_image(file_id, downloaded)
+            downloaded.seek(0)
+            encrypted = is_encrypted_stream(downloaded.read(16))
+            downloaded.seek(0)
+            if encrypted:
+                with open(tmp_path, 'wb') as tmp:
+                    decrypt_stream(downloaded, tmp, password)
+        os.replace(tmp_path if encrypted else download_path, path)
+    except Exception as e:
+        print(f"Error al preparar imagen {file_id}: {str(e)}")
+        return None
+    finally:
+        for leftover in (download_path, tmp_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    _prune()
+    return path
+
+
+def invalidate(url: Optional[str]) -> None:
+    """Elimina una imagen de la caché (p. ej. al reemplazarla)"""
+    if url and os.path.exists(_cache_path(url)):
+        os.remove(_cache_path(url))
+
+
+def _prune() -> None:
+    """Borra las imágenes usadas hace más tiempo si la caché excede CACHE_MAX_BYTES"""
+    entries = []
+    for entry in os.scandir(CACHE_DIR):
+        if entry.is_file() and not entry.name.endswith('.tmp'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
@@ -0,0 +1,212 @@
+"""
+Hash de contraseñas de participantes
+Cada hash lleva su algoritmo, parámetros y salt, así que se pueden cambiar
+los costos sin invalidar los hashes existentes:
+
+    scrypt$<n>$<r>$<p>$<salt>$<hash>
+    pbkdf2_sha256$<iteraciones>$<salt>$<hash>
+
+Los hashes SHA-256 sin salt de versiones anteriores (64 caracteres hex) se
+siguen verificando; needs_rehash() indica cuándo conviene reemplazarlos tras
+un login exitoso.
+
+Los costos por defecto se pueden ajustar con variables de entorno (ver
+calibrate_password_hash.py). Las verificaciones simultáneas se limitan a una
+por núcleo para que el costo de CPU del login sea predecible bajo carga.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+
+# Algoritmo y costos por defecto (ajustables por entorno)
+DEFAULT_SCHEME = os.getenv('PASSWORD_HASH_SCHEME', 'scrypt')
+SCRYPT_N = int(os.getenv('PASSWORD_SCRYPT_N', 2 ** 14))
+SCRYPT_R = int(os.getenv('PASSWORD_SCRYPT_R', 8))
+SCRYPT_P = int(os.getenv('PASSWORD_SCRYPT_P', 1))
+PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', 600000))
+
+SALT_LENGTH = 16
+HASH_LENGTH = 32
+SCHEMES = ('scrypt', 'pbkdf2_sha256')
+
+# Máximo de hashes calculándose a la vez; el resto espera su turno
+MAX_CONCURRENT_HASHES = int(os.getenv('PASSWORD_HASH_CONCURRENCY', os.cpu_count() or 1))
+_hash_slots = threading.BoundedSemaphore(MAX_CONCURRENT_HASHES)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + '=' * (-len(data) % 4))
+
+
+def _derive(scheme: str, password: str, salt: bytes, params: Dict[str, int]) -> bytes:
+    """Calcula el hash crudo (limitado a MAX_CONCURRENT_HASHES a la vez)"""
+    secret = password.encode('utf-8')
+    with _hash_slots:
+        if scheme == 'scrypt':
+            n, r, p = params['n'], params['r'], params['p']
+            return hashlib.scrypt(secret, salt=salt, n=n, r=r, p=p,
+                                  maxmem=256 * n * r + 1024 * 1024, dklen=HASH_LENGTH)
+        if scheme == 'pbkdf2_sha256':
+            return hashlib.pbkdf2_hmac('sha256', secret, salt, params['iterations'], dklen=HASH_LENGTH)
+    raise ValueError(f'Algoritmo de hash desconocido: {scheme}')
+
+
+def default_params(scheme: str) -> Dict[str, int]:
+    """Parámetros de costo configurados para un algoritmo"""
+    if scheme == 'scrypt':
+        return {'n': SCRYPT_N, 'r': SCRYPT_R, 'p': SCRYPT_P}
+    if scheme == 'pbkdf2_sha256':
+        return {'iterations': PBKDF2_ITERATIONS}
+    raise ValueError(f'Algoritmo de hash desconocido: {scheme}')
+
+
+def parse_hash(password_hash: str) -> Optional[dict]:
+    """
+    Interpreta un hash almacenado
+
+    Args:
+        password_hash: Hash en formato autodescriptivo o SHA-256 legacy
+
+    Returns:
+        Diccionario con scheme, params, salt y digest, o None si el formato
+        no se reconoce
+    """
+    if not password_hash:
+        return None
+
+    parts = password_hash.split('$')
+    try:
+        if parts[0] == 'scrypt' and len(parts) == 6:
+            params = {'n': int(parts[1]), 'r': int(parts[2]), 'p': int(parts[3])}
+            return {'scheme': 'scrypt', 'params': params,
+                    'salt': _b64decode(parts[4]), 'digest': _b64decode(parts[5])}
+        if parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+            return {'scheme': 'pbkdf2_sha256', 'params': {'iterations': int(parts[1])},
+                    'salt': _b64decode(parts[2]), 'digest': _b64decode(parts[3])}
+        if len(password_hash) == 64:
+            return {'scheme': 'sha256', 'params': {}, 'salt': b'', 'digest': bytes.fromhex(password_hash)}
+    except ValueError:
+        return None
+    return None
+
+
+def hash_password(password: str, scheme: Optional[str] = None,
+                  params: Optional[Dict[str, int]] = None) -> str:
+    """
+    Crea el hash de una contraseña con salt aleatorio
+
+    Args:
+        password: Contraseña en texto plano
+        scheme: 'scrypt' o 'pbkdf2_sha256' (por defecto DEFAULT_SCHEME)
+        params: Parámetros de costo (por defecto los configurados)
+
+    Returns:
+        Hash en formato autodescriptivo
+    """
+    scheme = scheme or DEFAULT_SCHEME
+    params = params or default_params(scheme)
+    salt = os.urandom(SALT_LENGTH)
+    digest = _derive(scheme, password, salt, params)
+
+    if scheme == 'scrypt':
+        return f"scrypt${params['n']}${params['r']}${params['p']}${_b64encode(salt)}${_b64encode(digest)}"
+    return f"pbkdf2_sha256${params['iterations']}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    """
+    Verifica una contraseña contra su hash en tiempo constante
+
+    Args:
+        password: Contraseña en texto plano
+        password_hash: Hash almacenado (cualquier formato soportado)
+
+    Returns:
+        True si coinciden, False en caso contrario (o si el hash no es válido)
+    """
+    parsed = parse_hash(password_hash)
+    if parsed is None:
+        return False
+
+    if parsed['scheme'] == 'sha256':
+        candidate = hashlib.sha256(password.encode('utf-8')).digest()
+    else:
+        candidate = _derive(parsed['scheme'], password, parsed['salt'], parsed['params'])
+
+    return hmac.compare_digest(candidate, parsed['digest'])
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """
+    Indica si el hash debe regenerarse con el algoritmo y costos actuales
+
+    Args:
+        password_hash: Hash almacenado
+
+    Returns:
+        True para hashes legacy, de otro algoritmo o con otros parámetros
+    """
+    parsed = parse_hash(password_hash)
+    if parsed is None or parsed['scheme'] != DEFAULT_SCHEME:
+        return True
+    return parsed['params'] != default_params(DEFAULT_SCHEME)
+
+
+def measure(scheme: str, params: Dict[str, int], repeat: int = 3) -> float:
+    """Mediana en segundos de una verificación con los parámetros dados"""
+    salt = os.urandom(SALT_LENGTH)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _derive(scheme, 'calibración', salt, params)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def calibrate(target_seconds: float, scheme: str = 'scrypt') -> Dict[str, int]:
+    """
+    Busca el costo más alto cuya verificación no exceda `target_seconds`
+
+    scrypt duplica n (potencia de 2, r=8, p=1); PBKDF2 ajusta las
+    iteraciones de forma proporcional al tiempo medido.
+
+    Args:
+        target_seconds: Latencia objetivo de una verificación en este equipo
+        scheme: 'scrypt' o 'pbkdf2_sha256'
+
+    Returns:
+        Parámetros de costo para hash_password / variables de entorno
+    """
+    if scheme == 'scrypt':
+        best = {'n': 2 ** 10, 'r': 8, 'p': 1}
+        n = 2 ** 11
+        while n <= 2 ** 20:
+            params = {'n': n, 'r': 8, 'p': 1}
+            if measure(scheme, params) > target_seconds:
+                break
+            best = params
+            n *= 2
+        return best
+
+    if scheme == 'pbkdf2_sha256':
+        probe = 100000
+        elapsed = measure(scheme, {'iterations': probe})
+        iterations = int(probe * target_seconds / elapsed)
+        # Redondear a miles y verificar (el tiempo no es perfectamente lineal)
+        iterations = max(1000, iterations // 1000 * 1000)
+        while iterations > 1000 and measure(scheme, {'iterations': iterations}) > target_seconds:
+            iterations = max(1000, int(iterations * 0.9) // 1000 * 1000)
+        return {'iterations': iterations}
+
+    raise ValueError(f'Algoritmo de hash desconocido: {scheme}')
@@ -0,0 +1,155 @@
+"""
+Control de admisión para los intentos de login
+Cada intento de login cuesta derivaciones de clave (índice ciego, hash de la
+contraseña y, para registros legacy, desencriptar nombres). Antes de hacer ese
+trabajo se verifica, sin bloquear:
+
+1. Una cubeta de tokens por sesión de Streamlit
+2. Una cubeta de tokens por nombre (frena ataques a una cuenta desde varias sesiones)
+3. Un semáforo global que limita los logins calculándose a la vez
+
+Si algo está agotado el intento se rechaza de inmediato (LoginThrottled) en
+lugar de encolar más trabajo de CPU. El estado es del proceso, así que se
+comparte entre todas las sesiones, y los contadores se exponen con
+login_metrics().
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+# Límites por defecto (ajustables por entorno)
+SESSION_BURST = int(os.getenv('LOGIN_SESSION_BURST', 5))
+SESSION_PER_MINUTE = float(os.getenv('LOGIN_SESSION_PER_MINUTE', 10))
+NAME_BURST = int(os.getenv('LOGIN_NAME_BURST', 5))
+NAME_PER_MINUTE = float(os.getenv('LOGIN_NAME_PER_MINUTE', 5))
+MAX_CONCURRENT_LOGINS = int(os.getenv('LOGIN_MAX_CONCURRENT', os.cpu_count() or 1))
+MAX_TRACKED_KEYS = 10000  # Cubetas en memoria por tipo (se descartan las más antiguas)
+
+
+class LoginThrottled(Exception):
+    """El intento de login excede los límites y se rechazó sin procesarlo"""
+
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class TokenBucket:
+    """
+    Cubeta de tokens: hasta `capacity` intentos seguidos y luego
+    `refill_per_second` intentos por segundo. Segura entre hilos.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+            self.updated = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+
+class KeyedLimiter:
+    """Una cubeta por clave, con un máximo de claves en memoria (LRU)"""
+
+    def __init__(self, capacity: float, per_minute: float, max_keys: int = MAX_TRACKED_KEYS):
+        self.capacity = capacity
+        self.refill_per_second = per_minute / 60
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key: str) -> bool:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.capacity, self.refill_per_second)
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+        return bucket.try_acquire()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# Estado compartido por todas las sesiones del proceso
+_session_limiter = KeyedLimiter(SESSION_BURST, SESSION_PER_MINUTE)
+_name_limiter = KeyedLimiter(NAME_BURST, NAME_PER_MINUTE)
+_login_slots = threading.BoundedSemaphore(MAX_CONCURRENT_LOGINS)
+_counters = {'admitted': 0, 'rejected_session': 0, 'rejected_name': 0, 'rejected_busy': 0}
+_counters_lock = threading.Lock()
+
+
+def _count(key: str) -> None:
+    with _counters_lock:
+        _counters[key] += 1
+
+
+@contextmanager
+def login_guard(name: str, session_id: Optional[str] = None):
+    """
+    Admite o rechaza un intento de login antes de hacer trabajo costoso
+
+    Uso:
+        with login_guard(login_name, session_id):
+            ... verificar credenciales ...
+
+    Args:
+        name: Nombre ingresado (se normaliza para la cubeta por nombre)
+        session_id: Identificador de la sesión de Streamlit
+
+    Raises:
+        LoginThrottled: Si la sesión o el nombre agotaron sus intentos, o si
+            ya hay MAX_CONCURRENT_LOGINS logins en curso
+    """
+    from lib.encryption import normalize_name
+
+    if session_id and not _session_limiter.try_acquire(session_id):
+        _count('rejected_session')
+        raise LoginThrottled('Demasiados intentos desde esta sesión. Espera un momento.', 'session')
+
+    if not _name_limiter.try_acquire(normalize_name(name or '')):
+        _count('rejected_name')
+        raise LoginThrottled('Demasiados intentos para este nombre. Espera un momento.', 'name')
+
+    if not _login_slots.acquire(blocking=False):
+        _count('rejected_busy')
+        raise LoginThrottled('El servidor está ocupado. Intenta de nuevo en unos segundos.', 'busy')
+
+    _count('admitted')
+    try:
+        yield
+    finally:
+        _login_slots.release()
+
+
+def login_metrics() -> Dict[str, int]:
+    """
+    Contadores del control de admisión
+
+    Returns:
+        Diccionario con admitted, rejected_session, rejected_name,
+        rejected_busy y el número de sesiones/nombres en seguimiento
+    """
+    with _counters_lock:
+        metrics = dict(_counters)
+    metrics['tracked_sessions'] = len(_session_limiter)
+    metrics['tracked_names'] = len(_name_limiter)
+    return metrics
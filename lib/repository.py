@@ -0,0 +1,551 @@
+"""
+Repositorio de datos independiente del backend
+Define la interfaz común de participantes y configuración que implementan los
+clientes de AppWrite, Firebase y Supabase, más dos backends locales:
+
+- InMemoryRepository: diccionarios en memoria (pruebas de carga, benchmarks)
+- SQLiteRepository: archivo SQLite (desarrollo local sin servicios externos)
+
+El backend se elige con la variable de entorno DATA_BACKEND
+(appwrite, firebase, supabase, memory o sqlite) mediante get_repository().
+El almacenamiento de imágenes sigue en los clientes (upload_gift_image).
+"""
+
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Iterator
+
+
+DEFAULT_SETTINGS = {
+    'encryption_password_hash': 'default',
+    'names_revealed': False,
+    'sorteo_completed': False
+}
+
+def project(participant: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """Deja solo los campos pedidos (más 'id'); sin `fields` devuelve el participante completo"""
+    if not fields:
+        return participant
+    return {'id': participant['id'], **{field: participant.get(field) for field in fields if field != 'id'}}
+
+
+CLIENT_MODULES = {
+    'appwrite': 'lib.appwrite_client',
+    'firebase': 'lib.firebase_client',
+    'supabase': 'lib.supabase_client',
+}
+
+
+class Repository(ABC):
+    """
+    Interfaz de acceso a participantes y configuración
+
+    Los métodos y sus argumentos son los mismos que las funciones de
+    lib/appwrite_client.py; los participantes se devuelven como diccionarios.
+    Las lecturas de listas aceptan `fields` para traer solo algunos campos
+    (proyección en el servidor), p. ej. ['id', 'category'] para el sorteo.
+
+    Cada backend implementa los métodos abstractos; el resto tiene una
+    implementación genérica que los backends pueden reemplazar.
+    """
+
+    # ============== PARTICIPANTS ==============
+
+    @abstractmethod
+    def iter_participants(self, page_size: int = 100, category: Optional[str] = None,
+                          after: Optional[str] = None,
+                          fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Participantes por páginas, en orden estable por id; `after` reanuda tras ese id"""
+
+    def get_participants(self, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        return list(self.iter_participants(fields=fields))
+
+    @abstractmethod
+    def get_participant_by_id(self, participant_id: str) -> Optional[Dict[str, Any]]:
+        """Participante por id (None si no existe)"""
+
+    @abstractmethod
+    def get_participant_by_name_index(self, name_index: str) -> Optional[Dict[str, Any]]:
+        """Participante por índice ciego del nombre (None si no existe)"""
+
+    def check_name_index_exists(self, name_index: str) -> bool:
+        return self.get_participant_by_name_index(name_index) is not None
+
+    def get_participants_by_category(self, category: str,
+                                     fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        return list(self.iter_participants(category=category, fields=fields))
+
+    @abstractmethod
+    def create_participant(self, encrypted_name: str, category: str, gift_options: List[str],
+                           password_hash: str, gift_images: Optional[List[str]] = None,
+                           name_index: Optional[str] = None) -> Dict[str, Any]:
+        """Crea un participante y lo devuelve con su id"""
+
+    @abstractmethod
+    def update_participant(self, participant_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Actualiza campos de un participante sin releerlo
+
+        Devuelve {'id': participant_id, **data} (solo los campos escritos) en
+        todos los backends; quien necesite el participante completo lo lee
+        con get_participant_by_id
+        """
+
+    def update_participant_assignment(self, participant_id: str, assigned_to_id: str) -> Dict[str, Any]:
+        return self.update_participant(participant_id, {'assigned_to_id': assigned_to_id})
+
+    def commit_assignments(self, assignments: Dict[str, str]) -> Dict[str, str]:
+        """Guarda {participant_id: assigned_to_id} sin releer; devuelve {participant_id: error} de los fallos"""
+        failures = {}
+        for participant_id, assigned_to_id in assignments.items():
+            try:
+                self.update_participant(participant_id, {'assigned_to_id': assigned_to_id})
+            except Exception as e:
+                failures[participant_id] = str(e)
+        return failures
+
+    @abstractmethod
+    def delete_participant(self, participant_id: str) -> None:
+        """Elimina un participante"""
+
+    def reset_all_assignments(self) -> None:
+        """Borra assigned_to_id, guarda un snapshot vacío (reset_draw) y reinicia la configuración"""
+        from lib.assignment_store import reset_draw
+
+        for participant in self.get_participants(fields=['id']):
+            self.update_participant(participant['id'], {'assigned_to_id': None})
+        reset_draw(self)
+        self.update_settings({'sorteo_completed': False, 'names_revealed': False})
+
+    # ============== SETTINGS ==============
+
+    @abstractmethod
+    def get_settings(self) -> Dict[str, Any]:
+        """Configuración global (DEFAULT_SETTINGS si no existe)"""
+
+    @abstractmethod
+    def update_settings(self, updates: Dict[str, Any]) -> Dict[str, Any]:
+        """Actualiza la configuración global y la devuelve"""
+
+    def get_settings_uncached(self) -> Dict[str, Any]:
+        """Configuración leída del backend aunque haya caché (p. ej. sorteo_completed antes de sortear)"""
+        return self.get_settings()
+
+    # ============== ASSIGNMENT SNAPSHOTS ==============
+
+    @abstractmethod
+    def save_assignment_snapshot(self, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        """Guarda un sorteo completo (ver lib/assignment_store.py) en una escritura"""
+
+    @abstractmethod
+    def get_assignment_snapshot(self, draw_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Snapshot de un sorteo; sin draw_id, el más reciente (None si no hay)"""
+
+    def get_current_draw_id(self) -> Optional[str]:
+        """draw_id del snapshot más reciente sin leer el sorteo empaquetado (None si no hay)"""
+        snapshot = self.get_assignment_snapshot()
+        return snapshot['draw_id'] if snapshot else None
+
+
+class ClientRepository(Repository):
+    """
+    Adaptador sobre uno de los módulos cliente (AppWrite, Firebase o Supabase)
+
+    El módulo se importa al crear el repositorio, así que solo se necesitan
+    las credenciales del backend elegido.
+    """
+
+    def __init__(self, backend: str):
+        import importlib
+
+        if backend not in CLIENT_MODULES:
+            raise ValueError(f'Backend desconocido: {backend}')
+        self.backend = backend
+        self.client = importlib.import_module(CLIENT_MODULES[backend])
+
+    def iter_participants(self, page_size=None, category=None, after=None, fields=None):
+        return self.client.iter_participants(page_size or self.client.PAGE_SIZE, category, after, fields)
+
+    def get_participants(self, fields=None):
+        return self.client.get_participants(fields)
+
+    def get_participant_by_id(self, participant_id):
+        return self.client.get_participant_by_id(participant_id)
+
+    def get_participant_by_name_index(self, name_index):
+        return self.client.get_participant_by_name_index(name_index)
+
+    def check_name_index_exists(self, name_index):
+        return self.client.check_name_index_exists(name_index)
+
+    def get_participants_by_category(self, category, fields=None):
+        return self.client.get_participants_by_category(category, fields)
+
+    def create_participant(self, encrypted_name, category, gift_options, password_hash,
+                           gift_images=None, name_index=None):
+        return self.client.create_participant(encrypted_name, category, gift_options, password_hash,
+                                              gift_images, name_index=name_index)
+
+    def update_participant(self, participant_id, data):
+        return self.client.update_participant(participant_id, data)
+
+    def update_participant_assignment(self, participant_id, assigned_to_id):
+        return self.client.update_participant_assignment(participant_id, assigned_to_id)
+
+    def commit_assignments(self, assignments):
+        return self.client.commit_assignments(assignments)
+
+    def delete_participant(self, participant_id):
+        return self.client.delete_participant(participant_id)
+
+    def reset_all_assignments(self):
+        # El cliente también guarda el snapshot vacío (reset_draw)
+        return self.client.reset_all_assignments()
+
+    def get_settings(self):
+        return self.client.get_settings()
+
+    def update_settings(self, updates):
+        return self.client.update_settings(updates)
+
+    def save_assignment_snapshot(self, snapshot):
+        return self.client.save_assignment_snapshot(snapshot)
+
+    def get_assignment_snapshot(self, draw_id=None):
+        return self.client.get_assignment_snapshot(draw_id)
+
+    def get_current_draw_id(self):
+        return self.client.get_current_draw_id()
+
+
+class InMemoryRepository(Repository):
+    """Backend en memoria del proceso, seguro entre hilos"""
+
+    def __init__(self):
+        self._participants = {}
+        self._settings = dict(DEFAULT_SETTINGS, id='global')
+        self._snapshots = {}  # En orden de escritura
+        self._lock = threading.Lock()
+
+    def iter_participants(self, page_size=100, category=None, after=None, fields=None):
+        with self._lock:
+            ids = sorted(participant_id for participant_id in self._participants
+                         if after is None or participant_id > after)
+        # Una lectura bajo el candado por página, como una consulta paginada
+        for start in range(0, len(ids), page_size):
+            with self._lock:
+                page = [dict(self._participants[participant_id]) for participant_id in ids[start:start + page_size]
+                        if participant_id in self._participants]
+            for participant in page:
+                if category is None or participant['category'] == category:
+                    yield project(participant, fields)
+
+    def get_participants(self, fields=None):
+        with self._lock:
+            return [project(dict(p), fields) for p in self._participants.values()]
+
+    def get_participant_by_id(self, participant_id):
+        with self._lock:
+            participant = self._participants.get(participant_id)
+            return dict(participant) if participant else None
+
+    def get_participant_by_name_index(self, name_index):
+        with self._lock:
+            for participant in self._participants.values():
+                if participant.get('name_index') == name_index:
+                    return dict(participant)
+        return None
+
+    def create_participant(self, encrypted_name, category, gift_options, password_hash,
+                           gift_images=None, name_index=None):
+        participant = {
+            'id': str(uuid.uuid4()),
+            'encrypted_name': encrypted_name,
+            'name_index': name_index,
+            'category': category,
+            'gift_options': list(gift_options),
+            'password_hash': password_hash,
+            'gift_images': list(gift_images or []),
+            'assigned_to_id': None,
+            'created_at': datetime.utcnow().isoformat()
+        }
+        with self._lock:
+            if name_index and any(p.get('name_index') == name_index for p in self._participants.values()):
+                raise Exception('Error al crear participante: el nombre ya está registrado')
+            self._participants[participant['id']] = participant
+        return dict(participant)
+
+    def update_participant(self, participant_id, data):
+        with self._lock:
+            if participant_id not in self._participants:
+                raise Exception(f'Error al actualizar participante {participant_id}: no existe')
+            self._participants[participant_id].update(data)
+        return {**data, 'id': participant_id}
+
+    def commit_assignments(self, assignments):
+        failures = {}
+        with self._lock:
+            for participant_id, assigned_to_id in assignments.items():
+                if participant_id in self._participants:
+                    self._participants[participant_id]['assigned_to_id'] = assigned_to_id
+                else:
+                    failures[participant_id] = 'El participante no existe'
+        return failures
+
+    def delete_participant(self, participant_id):
+        with self._lock:
+            self._participants.pop(participant_id, None)
+
+    def get_settings(self):
+        with self._lock:
+            return dict(self._settings)
+
+    def update_settings(self, updates):
+        with self._lock:
+            self._settings.update(updates)
+            return dict(self._settings)
+
+    def save_assignment_snapshot(self, snapshot):
+        with self._lock:
+            self._snapshots[snapshot['draw_id']] = dict(snapshot)
+        return dict(snapshot)
+
+    def get_assignment_snapshot(self, draw_id=None):
+        with self._lock:
+            if draw_id is None:
+                snapshot = next(reversed(self._snapshots.values()), None)
+            else:
+                snapshot = self._snapshots.get(draw_id)
+            return dict(snapshot) if snapshot else None
+
+    def get_current_draw_id(self):
+        with self._lock:
+            return next(reversed(self._snapshots), None)
+
+
+class SQLiteRepository(Repository):
+    """
+    Backend en un archivo SQLite (o ':memory:')
+
+    Una sola conexión compartida entre hilos, protegida con un candado.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS participants (
+            id TEXT PRIMARY KEY,
+            encrypted_name TEXT NOT NULL,
+            name_index TEXT UNIQUE,
+            category TEXT NOT NULL CHECK (category IN ('elite', 'diversion')),
+            gift_options TEXT NOT NULL DEFAULT '[]',
+            password_hash TEXT,
+            gift_images TEXT NOT NULL DEFAULT '[]',
+            assigned_to_id TEXT,
+            created_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_participants_category ON participants(category);
+        CREATE TABLE IF NOT EXISTS settings (
+            id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS assignment_snapshots (
+            draw_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            seed TEXT,
+            count INTEGER NOT NULL,
+            output_hash TEXT NOT NULL,
+            metadata TEXT NOT NULL DEFAULT '{}',
+            packed TEXT NOT NULL
+        );
+    """
+    SNAPSHOT_COLUMNS = ('draw_id', 'version', 'created_at', 'seed', 'count', 'output_hash',
+                        'metadata', 'packed')
+    JSON_FIELDS = ('gift_options', 'gift_images')
+    COLUMNS = ('id', 'encrypted_name', 'name_index', 'category', 'gift_options',
+               'password_hash', 'gift_images', 'assigned_to_id', 'created_at')
+
+    def __init__(self, path: str = ':memory:'):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(self.SCHEMA)
+
+    def _row_to_dict(self, row) -> Dict[str, Any]:
+        participant = dict(row)
+        for field in self.JSON_FIELDS:
+            if field in participant:
+                participant[field] = json.loads(participant[field] or '[]')
+        return participant
+
+    def _columns(self, fields: Optional[List[str]]) -> str:
+        """Lista de columnas del SELECT para `fields` (siempre incluye id)"""
+        if not fields:
+            return '*'
+        unknown = set(fields) - set(self.COLUMNS)
+        if unknown:
+            raise Exception(f'Error al obtener participantes: campos desconocidos {sorted(unknown)}')
+        return ', '.join(['id'] + [field for field in fields if field != 'id'])
+
+    def _query(self, sql: str, params=()) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def iter_participants(self, page_size=100, category=None, after=None, fields=None):
+        columns = self._columns(fields)
+        cursor = after or ''
+        while True:
+            if category:
+                rows = self._query(f'SELECT {columns} FROM participants WHERE id > ? AND category = ? '
+                                   'ORDER BY id LIMIT ?', (cursor, category, page_size))
+            else:
+                rows = self._query(f'SELECT {columns} FROM participants WHERE id > ? ORDER BY id LIMIT ?',
+                                   (cursor, page_size))
+            yield from rows
+            if len(rows) < page_size:
+                return
+            cursor = rows[-1]['id']
+
+    def get_participants(self, fields=None):
+        return self._query(f'SELECT {self._columns(fields)} FROM participants ORDER BY created_at, id')
+
+    def get_participant_by_id(self, participant_id):
+        rows = self._query('SELECT * FROM participants WHERE id = ?', (participant_id,))
+        return rows[0] if rows else None
+
+    def get_participant_by_name_index(self, name_index):
+        rows = self._query('SELECT * FROM participants WHERE name_index = ? LIMIT 1', (name_index,))
+        return rows[0] if rows else None
+
+    def get_participants_by_category(self, category, fields=None):
+        return self._query(f'SELECT {self._columns(fields)} FROM participants WHERE category = ? '
+                           'ORDER BY created_at, id', (category,))
+
+    def create_participant(self, encrypted_name, category, gift_options, password_hash,
+                           gift_images=None, name_index=None):
+        participant_id = str(uuid.uuid4())
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    'INSERT INTO participants (id, encrypted_name, name_index, category, gift_options, '
+                    'password_hash, gift_images, assigned_to_id, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, NULL, ?)',
+                    (participant_id, encrypted_name, name_index, category, json.dumps(list(gift_options)),
+                     password_hash, json.dumps(list(gift_images or [])), datetime.utcnow().isoformat())
+                )
+        except sqlite3.Error as e:
+            raise Exception(f'Error al crear participante: {str(e)}')
+        return self.get_participant_by_id(participant_id)
+
+    def update_participant(self, participant_id, data):
+        unknown = set(data) - set(self.COLUMNS[1:])
+        if unknown:
+            raise Exception(f'Error al actualizar participante {participant_id}: campos desconocidos {sorted(unknown)}')
+        if data:
+            values = [json.dumps(v) if k in self.JSON_FIELDS else v for k, v in data.items()]
+            assignments = ', '.join(f'{k} = ?' for k in data)
+            with self._lock, self._conn:
+                cursor = self._conn.execute(f'UPDATE participants SET {assignments} WHERE id = ?',
+                                            (*values, participant_id))
+            if cursor.rowcount == 0:
+                raise Exception(f'Error al actualizar participante {participant_id}: no existe')
+        return {**data, 'id': participant_id}
+
+    def delete_participant(self, participant_id):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM participants WHERE id = ?', (participant_id,))
+
+    def commit_assignments(self, assignments):
+        with self._lock, self._conn:
+            existing = {row['id'] for row in self._conn.execute('SELECT id FROM participants')}
+            self._conn.executemany('UPDATE participants SET assigned_to_id = ? WHERE id = ?',
+                                   [(assigned_to_id, participant_id)
+                                    for participant_id, assigned_to_id in assignments.items()
+                                    if participant_id in existing])
+        return {participant_id: 'El participante no existe'
+                for participant_id in assignments if participant_id not in existing}
+
+    def reset_all_assignments(self):
+        from lib.assignment_store import reset_draw
+
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE participants SET assigned_to_id = NULL')
+        reset_draw(self)
+        self.update_settings({'sorteo_completed': False, 'names_revealed': False})
+
+    def get_settings(self):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM settings WHERE id = 'global'").fetchone()
+        settings = dict(DEFAULT_SETTINGS, **(json.loads(row['data']) if row else {}))
+        settings['id'] = 'global'
+        return settings
+
+    def update_settings(self, updates):
+        settings = self.get_settings()
+        settings.update(updates)
+        settings.pop('id', None)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO settings (id, data) VALUES ('global', ?)",
+                               (json.dumps(settings),))
+        return self.get_settings()
+
+    def save_assignment_snapshot(self, snapshot):
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    f"INSERT INTO assignment_snapshots ({', '.join(self.SNAPSHOT_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' for _ in self.SNAPSHOT_COLUMNS)})",
+                    tuple(snapshot.get(column) for column in self.SNAPSHOT_COLUMNS)
+                )
+        except sqlite3.Error as e:
+            raise Exception(f'Error al guardar el sorteo: {str(e)}')
+        return dict(snapshot)
+
+    def get_assignment_snapshot(self, draw_id=None):
+        if draw_id is None:
+            rows = self._query('SELECT * FROM assignment_snapshots ORDER BY created_at DESC, rowid DESC LIMIT 1')
+        else:
+            rows = self._query('SELECT * FROM assignment_snapshots WHERE draw_id = ?', (draw_id,))
+        return rows[0] if rows else None
+
+    def get_current_draw_id(self):
+        rows = self._query('SELECT draw_id FROM assignment_snapshots ORDER BY created_at DESC, rowid DESC LIMIT 1')
+        return rows[0]['draw_id'] if rows else None
+
+
+_repositories = {}
+_repositories_lock = threading.Lock()
+
+
+def get_repository(backend: Optional[str] = None) -> Repository:
+    """
+    Repositorio del proceso para un backend (se crea una sola vez)
+
+    Args:
+        backend: appwrite, firebase, supabase, memory o sqlite
+            (por defecto DATA_BACKEND, o appwrite)
+
+    Returns:
+        Instancia compartida del repositorio, con la caché de lectura de
+        lib/cache.py delante si REPOSITORY_CACHE_TTL > 0 (por defecto 30 s)
+    """
+    from lib.cache import CachedRepository, CACHE_TTL
+
+    backend = (backend or os.getenv('DATA_BACKEND', 'appwrite')).lower()
+
+    with _repositories_lock:
+        if backend not in _repositories:
+            if backend == 'memory':
+                repository = InMemoryRepository()
+            elif backend == 'sqlite':
+                repository = SQLiteRepository(os.getenv('SQLITE_PATH', 'gift_exchange.db'))
+            else:
+                repository = ClientRepository(backend)
+            _repositories[backend] = CachedRepository(repository) if CACHE_TTL > 0 else repository
+        return _repositories[backend]
@@ -4,8 +4,13 @@ Garantiza que nadie se toque a sí mismo y no hay intercambios equivalentes
 Portado desde TypeScript (sorteo.ts)
 """
 
+import hashlib
+import os
 import random
-from typing import List, Dict, Tuple
+import secrets
+import time
+from array import array
+from typing import List, Dict, Tuple, Iterable, Optional, Sequence, Callable, Any, NamedTuple, Union
 
 
 def shuffle(array: list) -> list:
@@ -54,127 +59,752 @@ def is_valid_assignment(participants: List[dict], assignments: Dict[str, str]) -
     return True
 
 
-def create_valid_assignment(participants: List[dict]) -> Dict[str, str]:
+# Marcas en el arreglo de sucesores de una asignación compacta
+NO_ASSIGNMENT = -1   # el participante no tiene asignación
+UNKNOWN_TARGET = -2  # el destino no es un participante conocido
+
+
+class CompactAssignment(NamedTuple):
     """
-    Crea una asignación circular válida para un grupo de participantes
-    Evita ciclos de 2 (A->B, B->A) garantizando un ciclo más largo
+    Representación compacta de una asignación
+    
+    Los ids se mapean una sola vez a índices densos y el ciclo se guarda
+    como un arreglo de enteros de 4 bytes: successor[i] es el índice al que
+    le regala ids[i]. Un millón de participantes ocupan 4 MB en lugar de un
+    diccionario de cadenas; la conversión a {id: id} se hace solo al guardar.
+    """
+    ids: List[str]
+    successor: array
+    
+    def to_dict(self) -> Dict[str, str]:
+        """Convierte a {participant_id: assigned_to_id} (frontera de persistencia)"""
+        ids = self.ids
+        return {ids[i]: ids[j] for i, j in enumerate(self.successor) if j >= 0}
+
+
+def index_participants(participants: List[dict]) -> Dict[str, int]:
+    """
+    Mapea cada id de participante a su índice denso
+    
+    Args:
+        participants: Lista de participantes con id
+        
+    Returns:
+        Diccionario {participant_id: índice}
+    """
+    return {p['id']: i for i, p in enumerate(participants)}
+
+
+def compact_from_dict(participants: List[dict], assignments: Dict[str, str],
+                      index: Optional[Dict[str, int]] = None) -> CompactAssignment:
+    """
+    Convierte un diccionario de asignaciones a la representación compacta
+    
+    Args:
+        participants: Lista de participantes (define el orden de los índices)
+        assignments: Diccionario {participant_id: assigned_to_id}
+        index: Resultado de index_participants si ya se calculó
+        
+    Returns:
+        CompactAssignment; quien no tiene asignación queda en NO_ASSIGNMENT y
+        los destinos desconocidos en UNKNOWN_TARGET
+    """
+    if index is None:
+        index = index_participants(participants)
+    successor = array('i', [NO_ASSIGNMENT]) * len(participants)
+    for participant_id, assigned_to_id in assignments.items():
+        i = index.get(participant_id)
+        if i is not None:
+            successor[i] = index.get(assigned_to_id, UNKNOWN_TARGET)
+    return CompactAssignment([p['id'] for p in participants], successor)
+
+
+def sattolo_cycle(n: int, rng: Optional[random.Random] = None) -> array:
+    """
+    Algoritmo de Sattolo: genera un ciclo único de longitud n en una pasada
+    
+    A diferencia de Fisher-Yates, j se elige en [0, i) y nunca igual a i,
+    por lo que el resultado siempre es un solo ciclo que recorre a todos
+    (cada uno de los (n-1)! ciclos posibles es igualmente probable).
+    
+    Args:
+        n: Número de elementos
+        rng: Generador aleatorio (por defecto el módulo random)
+        
+    Returns:
+        Arreglo `successor` (array('i')) donde successor[i] es el índice al que apunta i
+    """
+    successor = array('i', range(n))
+    randrange = (rng or random).randrange
+    for i in range(n - 1, 0, -1):
+        j = randrange(i)
+        successor[i], successor[j] = successor[j], successor[i]
+    return successor
+
+
+def create_compact_assignment(participants: List[dict], rng: Optional[random.Random] = None) -> CompactAssignment:
+    """
+    Crea una asignación circular válida en representación compacta
+    
+    Igual que create_valid_assignment pero sin construir el diccionario;
+    útil para simulaciones y sorteos muy grandes. El diccionario
+    {participant_id: assigned_to_id} se construye solo al combinar y guardar
+    los grupos (ver as_dict y lib.assignment_store).
     
     Args:
         participants: Lista de participantes con id y category
+        rng: Generador aleatorio (por defecto el módulo random)
         
     Returns:
-        Diccionario con las asignaciones {participant_id: assigned_to_id}
+        CompactAssignment con un ciclo único
         
     Raises:
-        Exception: Si no se puede generar una asignación válida
+        Exception: Si hay menos de 3 participantes
     """
     n = len(participants)
     
     if n < 2:
         raise Exception('Se necesitan al menos 2 participantes para el sorteo')
     
-    # Para evitar ciclos de 2, creamos un ciclo único que incluye a todos
-    # Esto garantiza que si A->B, B nunca apuntará a A directamente
-    max_attempts = 1000
+    # Con 2 participantes la única asignación posible es A->B, B->A
+    if n == 2:
+        raise Exception('Con solo 2 participantes no se puede evitar un intercambio equivalente')
+    
+    return CompactAssignment([p['id'] for p in participants], sattolo_cycle(n, rng))
+
+
+def create_valid_assignment(participants: List[dict], rng: Optional[random.Random] = None) -> Dict[str, str]:
+    """
+    Crea una asignación circular válida para un grupo de participantes
+    Evita ciclos de 2 (A->B, B->A) generando un ciclo único con Sattolo
+    
+    Un ciclo único de longitud n >= 3 nunca contiene autoasignaciones ni
+    intercambios equivalentes, así que no hace falta reintentar ni validar:
+    el costo es una sola pasada O(n) y no varía entre ejecuciones.
     
-    for attempt in range(max_attempts):
-        shuffled = shuffle(participants)
-        assignments = {}
+    Para no construir el diccionario (grupos muy grandes) usa
+    create_compact_assignment.
+    
+    Args:
+        participants: Lista de participantes con id y category
+        rng: Generador aleatorio (por defecto el módulo random); con un
+            random.Random sembrado el sorteo es reproducible
         
-        # Crear un ciclo: cada persona apunta a la siguiente, la última apunta a la primera
-        for i in range(n):
-            next_index = (i + 1) % n
-            assignments[shuffled[i]['id']] = shuffled[next_index]['id']
+    Returns:
+        Diccionario con las asignaciones {participant_id: assigned_to_id}
         
-        # Validar que no hay ciclos de 2
-        if is_valid_assignment(participants, assignments):
-            return assignments
+    Raises:
+        Exception: Si hay menos de 3 participantes
+    """
+    return create_compact_assignment(participants, rng).to_dict()
+
+
+def as_dict(assignments: Union[CompactAssignment, Dict[str, str]]) -> Dict[str, str]:
+    """
+    Asignaciones como {participant_id: assigned_to_id}
     
-    raise Exception('No se pudo generar una asignación válida después de múltiples intentos')
+    Convierte una CompactAssignment; un diccionario se devuelve tal cual.
+    """
+    if isinstance(assignments, CompactAssignment):
+        return assignments.to_dict()
+    return assignments
 
 
-def perform_sorteo(elite_participants: List[dict], diversion_participants: List[dict]) -> Dict[str, str]:
+def draw_group(participants: List[dict],
+               exclusions: Optional[Dict[str, Iterable[str]]] = None,
+               exclude_same: Sequence[str] = (),
+               costs: Optional[Callable[[List[dict]], Any]] = None,
+               time_budget: Optional[float] = None,
+               rng: Optional[random.Random] = None) -> Union[CompactAssignment, Dict[str, str]]:
+    """
+    Sortea un solo grupo eligiendo el motor adecuado
+    
+    Sin restricciones adicionales usa el ciclo de Sattolo; con exclusiones
+    usa el motor de emparejamiento de lib.sorteo_solver y con costos el
+    optimizador de lib.sorteo_optimizer.
+    
+    Args:
+        participants: Lista de participantes con id y category
+        exclusions: Grafo de exclusiones {participant_id: ids prohibidos}
+        exclude_same: Campos que no pueden coincidir entre quien da y quien recibe
+        costs: Función que recibe los participantes del grupo y devuelve su
+            matriz de costos n x n (ver lib.sorteo_optimizer.build_cost_matrix)
+        time_budget: Segundos máximos para optimizar cada grupo
+        rng: Generador aleatorio (por defecto el módulo random)
+        
+    Returns:
+        CompactAssignment (ciclo de Sattolo) o diccionario con las
+        asignaciones {participant_id: assigned_to_id} (solver y optimizador)
+    """
+    if costs is not None:
+        from lib.sorteo_optimizer import optimize_assignment, forbid_pairs
+        matrix = costs(participants)
+        if exclusions or exclude_same:
+            matrix = forbid_pairs(matrix, participants, exclusions, exclude_same)
+        return optimize_assignment(participants, matrix, time_budget)
+    
+    if not exclusions and not exclude_same:
+        return create_compact_assignment(participants, rng)
+    
+    from lib.sorteo_solver import solve_with_exclusions
+    return solve_with_exclusions(participants, exclusions, exclude_same, rng)
+
+
+def new_seed() -> int:
+    """
+    Genera una semilla de 64 bits para un sorteo reproducible
+    
+    Returns:
+        Semilla aleatoria criptográficamente segura
+    """
+    return secrets.randbits(64)
+
+
+def group_rng(seed: int, group: str) -> random.Random:
+    """
+    Generador determinista de un grupo a partir de la semilla del sorteo
+    
+    Depende solo de (seed, group), así que el resultado de cada grupo no
+    cambia según el orden o el proceso en que se sortee.
+    """
+    return random.Random(f'{seed}:{group}')
+
+
+def _draw_seeded(group: str, participants: List[dict], options: dict,
+                 seed: Optional[int], rng: Optional[random.Random]) -> Union[CompactAssignment, Dict[str, str]]:
+    """Sortea un grupo con su generador derivado de la semilla, si la hay"""
+    if seed is not None:
+        participants = sorted(participants, key=lambda p: p['id'])
+        rng = group_rng(seed, group)
+    return draw_group(participants, rng=rng, **options)
+
+
+def perform_sorteo(elite_participants: List[dict], diversion_participants: List[dict],
+                   exclusions: Optional[Dict[str, Iterable[str]]] = None,
+                   exclude_same: Sequence[str] = (),
+                   costs: Optional[Callable[[List[dict]], Any]] = None,
+                   time_budget: Optional[float] = None,
+                   seed: Optional[int] = None,
+                   rng: Optional[random.Random] = None) -> Dict[str, str]:
     """
     Realiza el sorteo por categoría
     
+    Con `seed` el sorteo es reproducible: cada categoría usa su propio
+    generador derivado de la semilla y los participantes se ordenan por id,
+    así que el orden en que llegan de la base de datos no importa
+    (ver create_audit_record y replay).
+    
     Args:
         elite_participants: Lista de participantes de categoría élite
         diversion_participants: Lista de participantes de categoría diversión
+        exclusions: Grafo de exclusiones {participant_id: ids prohibidos},
+            ver lib.sorteo_solver.build_exclusions (opcional)
+        exclude_same: Campos que no pueden coincidir entre quien da y quien
+            recibe, p. ej. ('household',) (opcional)
+        costs: Función que devuelve la matriz de costos de cada categoría;
+            activa el modo optimizador (opcional)
+        time_budget: Segundos máximos del optimizador por categoría (opcional)
+        seed: Semilla del sorteo (opcional, ver new_seed)
+        rng: Generador aleatorio a usar cuando no hay semilla (opcional)
         
     Returns:
         Diccionario con todas las asignaciones {participant_id: assigned_to_id}
         
     Raises:
         Exception: Si hay solo 1 participante en alguna categoría
+        SorteoInfeasibleError: Si las exclusiones no permiten ningún sorteo
     """
     assignments = {}
     
+    options = {
+        'exclusions': exclusions,
+        'exclude_same': exclude_same,
+        'costs': costs,
+        'time_budget': time_budget
+    }
+    
     # Sorteo para categoría Élite
     if len(elite_participants) >= 2:
-        elite_assignments = create_valid_assignment(elite_participants)
-        assignments.update(elite_assignments)
+        elite_assignments = _draw_seeded('elite', elite_participants, options, seed, rng)
+        assignments.update(as_dict(elite_assignments))
     elif len(elite_participants) == 1:
         raise Exception('Solo hay 1 participante en categoría Élite, no se puede asignar')
     
     # Sorteo para categoría Diversión
     if len(diversion_participants) >= 2:
-        diversion_assignments = create_valid_assignment(diversion_participants)
-        assignments.update(diversion_assignments)
+        diversion_assignments = _draw_seeded('diversion', diversion_participants, options, seed, rng)
+        assignments.update(as_dict(diversion_assignments))
     elif len(diversion_participants) == 1:
         raise Exception('Solo hay 1 participante en categoría Diversión, no se puede asignar')
     
     return assignments
 
 
-def validate_assignments(participants: List[dict], assignments: Dict[str, str]) -> dict:
+def _pick_giver(assignments: Dict[str, str], candidates: Optional[Sequence[str]], avoid: Tuple[str, ...]) -> Optional[str]:
+    """
+    Elige al azar a alguien con asignación que no esté en `avoid`
+    
+    Con `candidates` (lista de ids del mismo grupo) la elección es O(1);
+    sin ella hay que copiar las llaves del diccionario.
+    """
+    pool = candidates if candidates is not None else list(assignments)
+    if not pool:
+        return None
+    for _ in range(32):
+        giver = pool[random.randrange(len(pool))]
+        if giver in assignments and giver not in avoid:
+            return giver
+    return next((g for g in pool if g in assignments and g not in avoid), None)
+
+
+def insert_participant(assignments: Dict[str, str], new_id: str,
+                       candidates: Optional[Sequence[str]] = None) -> Dict[str, str]:
+    """
+    Inserta a un participante nuevo en un sorteo ya realizado
+    
+    Elige a alguien A del grupo (A -> B) y coloca al nuevo en medio:
+    A -> nuevo -> B. El ciclo de A crece en uno, así que se mantienen las
+    reglas (sin autoasignación ni intercambios equivalentes) y nadie más
+    cambia de amigo secreto.
+    
+    Args:
+        assignments: Asignaciones actuales del grupo {participant_id: assigned_to_id};
+            se actualiza en el mismo diccionario
+        new_id: ID del participante nuevo
+        candidates: IDs del mismo grupo entre los cuales elegir a A
+            (por defecto cualquiera de `assignments`)
+        
+    Returns:
+        Solo las asignaciones que cambiaron (2 documentos por actualizar)
+        
+    Raises:
+        Exception: Si el participante ya tiene asignación o no hay grupo donde insertarlo
+    """
+    if new_id in assignments:
+        raise Exception(f'El participante {new_id} ya tiene una asignación')
+    
+    giver = _pick_giver(assignments, candidates, (new_id,))
+    if giver is None:
+        raise Exception('No hay un sorteo existente en el grupo donde insertar al participante')
+    
+    target = assignments[giver]
+    updates = {giver: new_id, new_id: target}
+    assignments.update(updates)
+    return updates
+
+
+def remove_participant(assignments: Dict[str, str], participant_id: str,
+                       giver_id: Optional[str] = None,
+                       candidates: Optional[Sequence[str]] = None) -> Dict[str, str]:
+    """
+    Retira a un participante de un sorteo ya realizado y repara el ciclo
+    
+    Si P -> X -> S, quien le regalaba a X (P) ahora le regala a S. Si el
+    ciclo tenía 3 personas quedaría el intercambio equivalente P <-> S; en
+    ese caso se une con otro ciclo eligiendo a alguien C (C -> D):
+    P -> D y C -> S.
+    
+    Args:
+        assignments: Asignaciones actuales del grupo {participant_id: assigned_to_id};
+            se actualiza en el mismo diccionario
+        participant_id: ID del participante que sale
+        giver_id: ID de quien le regalaba (si se conoce, p. ej. consultando
+            assigned_to_id en la base de datos, la operación es O(1))
+        candidates: IDs del mismo grupo entre los cuales elegir a C
+        
+    Returns:
+        Solo las asignaciones que cambiaron (1 o 2 documentos por actualizar,
+        además de borrar al participante que sale)
+        
+    Raises:
+        Exception: Si el participante no tiene asignación o el grupo queda con
+            menos de 3 personas
+    """
+    if participant_id not in assignments:
+        raise Exception(f'El participante {participant_id} no tiene asignación')
+    
+    if giver_id is None:
+        giver_id = next((g for g, t in assignments.items() if t == participant_id), None)
+    if giver_id is None or assignments.get(giver_id) != participant_id:
+        raise Exception(f'No se encontró quién le regala a {participant_id}')
+    
+    target = assignments.pop(participant_id)
+    updates = {giver_id: target}
+    
+    if assignments.get(target) == giver_id:
+        # Quedó un intercambio equivalente: unirlo con otro ciclo
+        other = _pick_giver(assignments, candidates, (giver_id, target))
+        if other is None:
+            assignments[participant_id] = target
+            raise Exception('El grupo quedaría con solo 2 participantes, no se puede mantener el sorteo')
+        updates = {giver_id: assignments[other], other: target}
+    
+    assignments.update(updates)
+    return updates
+
+
+# Por debajo de este total de participantes el costo de levantar procesos
+# supera al del sorteo y se ejecuta en el proceso actual
+PARALLEL_THRESHOLD = 20000
+
+
+def group_participants(participants: List[dict], key: str = 'category') -> Dict[str, List[dict]]:
+    """
+    Agrupa participantes por un campo (categoría, oficina, equipo...)
+    
+    Args:
+        participants: Lista de participantes
+        key: Campo por el cual agrupar
+        
+    Returns:
+        Diccionario {valor_del_campo: [participantes]}
+    """
+    groups: Dict[str, List[dict]] = {}
+    for participant in participants:
+        groups.setdefault(participant.get(key), []).append(participant)
+    return groups
+
+
+def _draw_chunk(chunk: List[Tuple[str, List[dict]]], options: dict,
+                seed: Optional[int] = None) -> List[Tuple[str, Any, float, Optional[str]]]:
+    """
+    Sortea un lote de grupos (se ejecuta dentro de un proceso del pool)
+    
+    Las asignaciones compactas viajan de vuelta al proceso principal como
+    arreglos de enteros, que se serializan mucho más rápido que un diccionario.
+    
+    Returns:
+        Lista de (grupo, asignaciones o None, segundos, error o None)
+    """
+    results = []
+    for name, members in chunk:
+        start = time.perf_counter()
+        try:
+            if len(members) == 1:
+                raise Exception(f"Solo hay 1 participante en el grupo '{name}', no se puede asignar")
+            assignments = _draw_seeded(name, members, options, seed, None) if members else {}
+            results.append((name, assignments, time.perf_counter() - start, None))
+        except Exception as e:
+            results.append((name, None, time.perf_counter() - start, str(e)))
+    return results
+
+
+def _split_chunks(groups: Dict[str, List[dict]], workers: int) -> List[List[Tuple[str, List[dict]]]]:
+    """
+    Reparte los grupos en lotes de tamaño parecido (el más grande primero)
+    para que cada envío al pool amortice el costo de serializar
+    """
+    target = max(1, workers * 4)
+    chunks: List[List[Tuple[str, List[dict]]]] = [[] for _ in range(min(target, len(groups)))]
+    loads = [0] * len(chunks)
+    for name, members in sorted(groups.items(), key=lambda item: len(item[1]), reverse=True):
+        lightest = loads.index(min(loads))
+        chunks[lightest].append((name, members))
+        loads[lightest] += len(members)
+    return chunks
+
+
+def perform_sorteo_batch(groups: Dict[str, List[dict]],
+                         max_workers: Optional[int] = None,
+                         exclusions: Optional[Dict[str, Iterable[str]]] = None,
+                         exclude_same: Sequence[str] = (),
+                         costs: Optional[Callable[[List[dict]], Any]] = None,
+                         time_budget: Optional[float] = None,
+                         seed: Optional[int] = None) -> dict:
+    """
+    Realiza el sorteo de cualquier número de grupos independientes en paralelo
+    
+    Cada grupo (categoría, oficina, equipo, nivel de presupuesto...) se sortea
+    por separado en un pool de procesos. Con pocos participantes se sortea en
+    el proceso actual.
+    
+    Args:
+        groups: Diccionario {nombre_del_grupo: [participantes]}
+            (ver group_participants)
+        max_workers: Procesos a usar (por defecto todos los núcleos; 1 = en serie)
+        exclusions: Grafo de exclusiones {participant_id: ids prohibidos} (opcional)
+        exclude_same: Campos que no pueden coincidir entre quien da y quien recibe (opcional)
+        costs: Función de matriz de costos por grupo; debe poder enviarse a otro
+            proceso (función de módulo o functools.partial, no lambda) (opcional)
+        time_budget: Segundos máximos del optimizador por grupo (opcional)
+        seed: Semilla del sorteo; cada grupo usa group_rng(seed, nombre) (opcional)
+        
+    Returns:
+        Dict con 'assignments' (todas las asignaciones combinadas),
+        'timings' ({grupo: segundos}), 'errors' ({grupo: mensaje}) y
+        'elapsed' (segundos totales)
+    """
+    start = time.perf_counter()
+    options = {
+        'exclusions': exclusions,
+        'exclude_same': exclude_same,
+        'costs': costs,
+        'time_budget': time_budget
+    }
+    
+    workers = max_workers or os.cpu_count() or 1
+    total = sum(len(members) for members in groups.values())
+    
+    if workers == 1 or len(groups) < 2 or total < PARALLEL_THRESHOLD:
+        results = _draw_chunk(list(groups.items()), options, seed)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        
+        chunks = _split_chunks(groups, workers)
+        results = []
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            for chunk_results in executor.map(_draw_chunk, chunks, [options] * len(chunks), [seed] * len(chunks)):
+                results.extend(chunk_results)
+    
+    assignments: Dict[str, str] = {}
+    timings: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
+    for name, group_assignments, seconds, error in results:
+        timings[name] = seconds
+        if error is not None:
+            errors[name] = error
+        else:
+            assignments.update(as_dict(group_assignments))
+    
+    return {
+        'assignments': assignments,
+        'timings': timings,
+        'errors': errors,
+        'elapsed': time.perf_counter() - start
+    }
+
+
+# ============== AUDITORÍA ==============
+
+AUDIT_VERSION = 1
+
+
+def fingerprint_participants(participants: List[dict], group_by: str = 'category') -> str:
+    """
+    Huella SHA-256 de la entrada del sorteo (ids y grupo de cada participante)
+    
+    No depende del orden en que lleguen los participantes.
+    """
+    digest = hashlib.sha256()
+    for participant_id, group in sorted((p['id'], str(p.get(group_by))) for p in participants):
+        digest.update(f'{participant_id}\x1f{group}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def hash_assignments(assignments: Dict[str, str]) -> str:
+    """
+    Huella SHA-256 del resultado del sorteo (independiente del orden)
+    """
+    digest = hashlib.sha256()
+    for participant_id, assigned_to_id in sorted(assignments.items()):
+        digest.update(f'{participant_id}\x1f{assigned_to_id}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def create_audit_record(participants: List[dict], assignments: Dict[str, str], seed: int,
+                        group_by: str = 'category') -> dict:
+    """
+    Crea el registro de auditoría compacto de un sorteo con semilla
+    
+    Con la semilla y los mismos participantes, replay vuelve a derivar
+    exactamente las mismas asignaciones sin leer la base de datos.
+    
+    Args:
+        participants: Participantes que entraron al sorteo
+        assignments: Resultado del sorteo
+        seed: Semilla usada en perform_sorteo / perform_sorteo_batch
+        group_by: Campo con el que se formaron los grupos
+        
+    Returns:
+        Dict con 'version', 'seed', 'group_by', 'participants', 'input_fingerprint' y 'output_hash'
+    """
+    return {
+        'version': AUDIT_VERSION,
+        'seed': seed,
+        'group_by': group_by,
+        'participants': len(participants),
+        'input_fingerprint': fingerprint_participants(participants, group_by),
+        'output_hash': hash_assignments(assignments)
+    }
+
+
+def replay(participants: List[dict], audit: dict, **options) -> Dict[str, str]:
+    """
+    Vuelve a derivar un sorteo a partir de su registro de auditoría
+    
+    Args:
+        participants: Participantes del sorteo original (en cualquier orden)
+        audit: Registro creado por create_audit_record
+        **options: Las mismas restricciones del sorteo original
+            (exclusions, exclude_same, costs, time_budget)
+        
+    Returns:
+        Diccionario con las asignaciones {participant_id: assigned_to_id}
+        
+    Raises:
+        Exception: Si los participantes o el resultado no coinciden con el registro
+    """
+    group_by = audit.get('group_by', 'category')
+    if fingerprint_participants(participants, group_by) != audit['input_fingerprint']:
+        raise Exception('Los participantes no coinciden con los del sorteo auditado')
+    
+    groups = group_participants(participants, group_by)
+    result = perform_sorteo_batch(groups, max_workers=1, seed=audit['seed'], **options)
+    if result['errors']:
+        raise Exception('; '.join(result['errors'].values()))
+    
+    if hash_assignments(result['assignments']) != audit['output_hash']:
+        raise Exception('El sorteo re-derivado no coincide con el registro de auditoría')
+    
+    return result['assignments']
+
+
+# Máximo de mensajes de error que se formatean por validación
+MAX_VALIDATION_ERRORS = 100
+
+
+def _format_error(kind: str, participant_id: str, assigned_to_id: Optional[str] = None,
+                  category: Optional[str] = None, target_category: Optional[str] = None) -> str:
+    """Construye el mensaje de un error de validación (solo para los que se reportan)"""
+    if kind == 'missing':
+        return f"Participante {participant_id} no tiene asignación"
+    if kind == 'self':
+        return f"Participante {participant_id} se asignó a sí mismo"
+    if kind == 'exchange':
+        return f"Intercambio equivalente detectado: {participant_id} <-> {assigned_to_id}"
+    if kind == 'unknown':
+        return f"Asignación inválida: {participant_id} -> {assigned_to_id} (no existe)"
+    return (
+        f"Asignación entre categorías diferentes: {participant_id} ({category}) -> "
+        f"{assigned_to_id} ({target_category})"
+    )
+
+
+def _validation_report(found: List[tuple], error_count: int, total: int) -> dict:
+    """Arma el reporte común de validate_assignments y validate_compact"""
+    valid = error_count == 0
+    return {
+        'valid': valid,
+        'errors': [_format_error(*args) for args in found],
+        'error_count': error_count,
+        'summary': f"Validación {'exitosa' if valid else 'fallida'}: {total} asignaciones"
+    }
+
+
+def validate_assignments(participants: List[dict], assignments: Dict[str, str],
+                         max_errors: Optional[int] = MAX_VALIDATION_ERRORS) -> dict:
     """
     Valida las asignaciones del sorteo y retorna un reporte
     
+    Revisa cobertura, autoasignaciones, intercambios equivalentes, destinos
+    inexistentes y cruces de categoría en una sola pasada sobre las
+    asignaciones. Los mensajes solo se construyen para los primeros
+    `max_errors` errores; el total queda en 'error_count'.
+    
     Args:
         participants: Lista de todos los participantes
         assignments: Diccionario con las asignaciones
+        max_errors: Máximo de mensajes a reportar (None = todos)
         
     Returns:
-        Dict con 'valid' (bool), 'errors' (List[str]) y 'summary' (str)
+        Dict con 'valid' (bool), 'errors' (List[str]), 'error_count' (int) y 'summary' (str)
     """
-    errors = []
-    
-    # Verificar que todos tengan asignación
-    for participant in participants:
-        if participant['id'] not in assignments:
-            errors.append(f"Participante {participant['id']} no tiene asignación")
+    category_of = {p['id']: p['category'] for p in participants}
+    cap = max_errors if max_errors is not None else float('inf')
+    found: List[tuple] = []
+    error_count = 0
+    covered = 0
     
-    # Verificar que nadie se toque a sí mismo
     for participant_id, assigned_to_id in assignments.items():
+        in_group = participant_id in category_of
+        if in_group:
+            covered += 1
+        
+        # Nadie puede tocarse a sí mismo
         if participant_id == assigned_to_id:
-            errors.append(f"Participante {participant_id} se asignó a sí mismo")
-    
-    # Verificar que no haya intercambios equivalentes
-    for participant_id, assigned_to_id in assignments.items():
+            error_count += 1
+            if len(found) < cap:
+                found.append(('self', participant_id))
+        
+        # No puede haber intercambios equivalentes
         if assignments.get(assigned_to_id) == participant_id:
-            errors.append(f"Intercambio equivalente detectado: {participant_id} <-> {assigned_to_id}")
+            error_count += 1
+            if len(found) < cap:
+                found.append(('exchange', participant_id, assigned_to_id))
+        
+        # El destino debe ser un participante válido de la misma categoría
+        if assigned_to_id not in category_of:
+            error_count += 1
+            if len(found) < cap:
+                found.append(('unknown', participant_id, assigned_to_id))
+        elif in_group and category_of[participant_id] != category_of[assigned_to_id]:
+            error_count += 1
+            if len(found) < cap:
+                found.append(('category', participant_id, assigned_to_id,
+                              category_of[participant_id], category_of[assigned_to_id]))
     
-    # Verificar que todos los assigned_to_id sean participantes válidos
-    participant_ids = {p['id'] for p in participants}
-    for participant_id, assigned_to_id in assignments.items():
-        if assigned_to_id not in participant_ids:
-            errors.append(f"Asignación inválida: {participant_id} -> {assigned_to_id} (no existe)")
+    # Todos deben tener asignación (solo se recorre de nuevo si falta alguien)
+    if covered < len(category_of):
+        for participant_id in category_of:
+            if participant_id not in assignments:
+                error_count += 1
+                if len(found) < cap:
+                    found.append(('missing', participant_id))
     
-    # Verificar asignaciones por categoría
-    participants_by_id = {p['id']: p for p in participants}
-    for participant_id, assigned_to_id in assignments.items():
-        if participant_id in participants_by_id and assigned_to_id in participants_by_id:
-            if participants_by_id[participant_id]['category'] != participants_by_id[assigned_to_id]['category']:
-                errors.append(
-                    f"Asignación entre categorías diferentes: {participant_id} ({participants_by_id[participant_id]['category']}) -> "
-                    f"{assigned_to_id} ({participants_by_id[assigned_to_id]['category']})"
-                )
+    return _validation_report(found, error_count, len(assignments))
+
+
+def validate_compact(assignment: CompactAssignment, categories: Optional[Sequence[str]] = None,
+                     max_errors: Optional[int] = MAX_VALIDATION_ERRORS) -> dict:
+    """
+    Valida una asignación compacta con operaciones vectorizadas de NumPy
     
-    valid = len(errors) == 0
-    summary = f"Validación {'exitosa' if valid else 'fallida'}: {len(assignments)} asignaciones"
+    Mismo reporte que validate_assignments, pero sobre el arreglo de
+    sucesores (sin diccionarios ni cadenas salvo para los errores reportados).
     
-    return {
-        'valid': valid,
-        'errors': errors,
-        'summary': summary
+    Args:
+        assignment: CompactAssignment a validar
+        categories: Categoría de cada participante, alineada con assignment.ids (opcional)
+        max_errors: Máximo de mensajes a reportar (None = todos)
+        
+    Returns:
+        Dict con 'valid' (bool), 'errors' (List[str]), 'error_count' (int) y 'summary' (str)
+    """
+    import numpy as np
+    
+    ids = assignment.ids
+    successor = np.frombuffer(assignment.successor, dtype=np.int32) if len(assignment.successor) else np.zeros(0, np.int32)
+    n = len(successor)
+    positions = np.arange(n)
+    
+    assigned = successor >= 0
+    target = np.where(assigned, successor, 0)
+    
+    checks = {
+        'missing': successor == NO_ASSIGNMENT,
+        'self': assigned & (successor == positions),
+        'exchange': assigned & assigned[target] & (successor[target] == positions),
+        'unknown': successor == UNKNOWN_TARGET,
     }
+    if categories is not None:
+        code_of: Dict[str, int] = {}
+        codes = np.fromiter((code_of.setdefault(c, len(code_of)) for c in categories), dtype=np.int32, count=n)
+        checks['category'] = assigned & (codes != codes[target])
+    
+    error_count = int(sum(int(mask.sum()) for mask in checks.values()))
+    cap = max_errors if max_errors is not None else error_count
+    found: List[tuple] = []
+    
+    for kind, mask in checks.items():
+        for i in np.flatnonzero(mask)[:max(0, cap - len(found))].tolist():
+            j = int(successor[i])
+            if kind in ('missing', 'self'):
+                found.append((kind, ids[i]))
+            elif kind == 'unknown':
+                found.append((kind, ids[i], '?'))
+            elif kind == 'exchange':
+                found.append((kind, ids[i], ids[j]))
+            else:
+                found.append((kind, ids[i], ids[j], categories[i], categories[j]))
+    
+    return _validation_report(found, error_count, int(assigned.sum() + checks['unknown'].sum()))
@@ -0,0 +1,459 @@
+"""
+Motor de sorteo con restricciones (exclusiones)
+Además de las reglas básicas (nadie se toca a sí mismo y no hay intercambios
+equivalentes) permite prohibir parejas concretas: parejas, mismo hogar,
+mismo equipo o "no repetir con quien te tocó el año pasado"
+
+El algoritmo trabaja sobre índices enteros en tres fases:
+1. Emparejamiento: parte de un ciclo aleatorio (Sattolo), libera las
+   asignaciones prohibidas y las repara con caminos de aumento sobre el
+   grafo de asignaciones permitidas. Si algún participante no tiene camino
+   de aumento no existe ninguna asignación válida (teorema de König) y se
+   reporta de inmediato.
+2. Fusión de ciclos: une los ciclos resultantes intercambiando sucesores,
+   lo que elimina los intercambios equivalentes (ciclos de 2). Si no lo
+   logra se reintenta desde otro ciclo aleatorio (MERGE_RESTARTS veces).
+3. Backtracking exacto para grupos pequeños cuando la fusión no basta.
+
+Evitar los ciclos de 2 con exclusiones arbitrarias es NP-difícil, así que en
+grupos grandes la fase 2 es heurística: si se agota se lanza
+SorteoSearchExhaustedError (puede existir una asignación) y no
+SorteoInfeasibleError, que solo se usa cuando se demuestra que no existe.
+"""
+
+import random
+from collections import deque
+from typing import List, Dict, Iterable, Optional, Sequence, Set
+
+from lib.sorteo import sattolo_cycle
+
+
+# Intentos aleatorios antes de recurrir a la búsqueda exhaustiva
+RANDOM_PROBES = 64
+# Tamaño máximo de grupo para el backtracking exacto
+BACKTRACK_LIMIT = 12
+# Nodos máximos que explora el backtracking antes de rendirse
+BACKTRACK_NODES = 200_000
+# Reintentos de emparejamiento + fusión antes de rendirse en grupos grandes
+MERGE_RESTARTS = 8
+
+
+class SorteoInfeasibleError(Exception):
+    """No existe ninguna asignación que cumpla todas las restricciones"""
+
+
+class SorteoSearchExhaustedError(Exception):
+    """
+    La búsqueda heurística no encontró una asignación sin intercambios
+    equivalentes; no demuestra que no exista
+    """
+
+
+def build_exclusions(pairs: Optional[Iterable[Sequence[str]]] = None,
+                     previous_assignments: Optional[Dict[str, str]] = None) -> Dict[str, Set[str]]:
+    """
+    Construye el grafo de exclusiones {participant_id: {ids prohibidos}}
+
+    Args:
+        pairs: Parejas que no pueden tocarse entre sí en ningún sentido
+            (por ejemplo parejas sentimentales)
+        previous_assignments: Asignaciones del año anterior; cada persona no
+            puede volver a tocarle a la misma
+
+    Returns:
+        Diccionario de exclusiones dirigidas
+    """
+    exclusions: Dict[str, Set[str]] = {}
+
+    for a, b in pairs or ():
+        exclusions.setdefault(a, set()).add(b)
+        exclusions.setdefault(b, set()).add(a)
+
+    for giver, receiver in (previous_assignments or {}).items():
+        if receiver:
+            exclusions.setdefault(giver, set()).add(receiver)
+
+    return exclusions
+
+
+def solve_with_exclusions(participants: List[dict],
+                          exclusions: Optional[Dict[str, Iterable[str]]] = None,
+                          exclude_same: Sequence[str] = (),
+                          rng: Optional[random.Random] = None,
+                          stats: Optional[Dict[str, int]] = None) -> Dict[str, str]:
+    """
+    Crea una asignación válida respetando exclusiones
+
+    Args:
+        participants: Lista de participantes con id y category
+        exclusions: Grafo de exclusiones {participant_id: ids prohibidos}
+            (ver build_exclusions)
+        exclude_same: Campos de los participantes que no pueden coincidir
+            entre quien da y quien recibe, p. ej. ('household', 'team').
+            Un valor None o vacío no excluye a nadie
+        rng: Generador aleatorio (por defecto el módulo random); con un
+            random.Random sembrado el resultado es reproducible
+        stats: Diccionario opcional donde se acumulan contadores del trabajo
+            realizado: 'conflicts' (asignaciones prohibidas a reparar),
+            'direct', 'short_paths' y 'bfs' (cómo se reparó cada una),
+            'cycles' (ciclos antes de fusionar) y 'backtracking'
+
+    Returns:
+        Diccionario con las asignaciones {participant_id: assigned_to_id}
+
+    Raises:
+        SorteoInfeasibleError: Si no existe ninguna asignación válida
+        SorteoSearchExhaustedError: Si el grupo es mayor que BACKTRACK_LIMIT y
+            la fusión de ciclos no encontró una asignación tras MERGE_RESTARTS intentos,
+            o si el backtracking supera BACKTRACK_NODES
+        Exception: Si hay menos de 3 participantes
+    """
+    n = len(participants)
+
+    if n < 2:
+        raise Exception('Se necesitan al menos 2 participantes para el sorteo')
+    if n == 2:
+        raise Exception('Con solo 2 participantes no se puede evitar un intercambio equivalente')
+
+    rng = rng or random
+    stats = stats if stats is not None else {}
+    for key in ('conflicts', 'direct', 'short_paths', 'bfs', 'cycles', 'backtracking'):
+        stats.setdefault(key, 0)
+    ids = [p['id'] for p in participants]
+    index = {pid: i for i, pid in enumerate(ids)}
+
+    # Exclusiones explícitas como conjuntos de índices (se ignoran ids de otros grupos)
+    excluded: List[Optional[Set[int]]] = [None] * n
+    for pid, targets in (exclusions or {}).items():
+        i = index.get(pid)
+        if i is None:
+            continue
+        blocked = {index[t] for t in targets if t in index}
+        if blocked:
+            excluded[i] = blocked
+
+    # Etiquetas de grupo codificadas como una tupla por participante
+    labels: Optional[List[tuple]] = None
+    if exclude_same:
+        labels = [tuple(p.get(field) or None for field in exclude_same) for p in participants]
+        _check_group_sizes(participants, labels, exclude_same)
+
+    def allowed(u: int, v: int) -> bool:
+        if u == v:
+            return False
+        blocked = excluded[u]
+        if blocked is not None and v in blocked:
+            return False
+        if labels is not None:
+            for a, b in zip(labels[u], labels[v]):
+                if a is not None and a == b:
+                    return False
+        return True
+
+    def signature(u: int) -> Optional[tuple]:
+        # Participantes sin exclusiones propias y con las mismas etiquetas
+        # tienen exactamente los mismos destinos permitidos
+        if excluded[u] is not None:
+            return None
+        return labels[u] if labels is not None else ()
+
+    for _ in range(MERGE_RESTARTS if n > BACKTRACK_LIMIT else 1):
+        successor = _find_cycle_cover(ids, allowed, signature, rng, stats)
+        if _merge_cycles(successor, allowed, rng, stats):
+            break
+    else:
+        if n > BACKTRACK_LIMIT:
+            raise SorteoSearchExhaustedError(
+                f'No se encontró un sorteo sin intercambios equivalentes tras {MERGE_RESTARTS} intentos; '
+                f'puede existir, pero las exclusiones son demasiado restrictivas para la búsqueda'
+            )
+        stats['backtracking'] += 1
+        successor = _backtrack(n, allowed, rng)
+        if successor is None:
+            raise SorteoInfeasibleError(
+                'No existe una asignación sin intercambios equivalentes que respete las exclusiones'
+            )
+
+    return {ids[i]: ids[successor[i]] for i in range(n)}
+
+
+def _check_group_sizes(participants: List[dict], labels: List[tuple], exclude_same: Sequence[str]) -> None:
+    """
+    Descarta en O(n) los casos imposibles por tamaño de grupo: los miembros
+    de un grupo de tamaño g deben regalar fuera de él, así que se necesita
+    g <= n - g (condición de Hall)
+    """
+    n = len(participants)
+    for k, field in enumerate(exclude_same):
+        sizes: Dict[object, int] = {}
+        for label in labels:
+            if label[k] is not None:
+                sizes[label[k]] = sizes.get(label[k], 0) + 1
+        for value, size in sizes.items():
+            if size > n - size:
+                raise SorteoInfeasibleError(
+                    f"El grupo '{value}' ({field}) tiene {size} de {n} participantes; "
+                    f"no hay suficientes personas fuera del grupo"
+                )
+
+
+def _find_cycle_cover(ids: List[str], allowed, signature, rng, stats: Dict[str, int]) -> List[int]:
+    """
+    Encuentra una permutación donde todas las asignaciones están permitidas
+
+    Parte de un ciclo de Sattolo y solo repara las asignaciones prohibidas,
+    así que con exclusiones dispersas el trabajo extra es proporcional al
+    número de conflictos y no a n².
+    """
+    n = len(ids)
+    successor = sattolo_cycle(n, rng)
+    owner = [0] * n  # owner[v] = quién regala a v, -1 si v está libre
+    for u in range(n):
+        owner[successor[u]] = u
+
+    free_rows = []
+    free_cols = _FreeTargets(rng)
+    for u in range(n):
+        v = successor[u]
+        if not allowed(u, v):
+            successor[u] = -1
+            owner[v] = -1
+            free_rows.append(u)
+            free_cols.add(v)
+
+    randrange = rng.randrange
+    stats['conflicts'] += len(free_rows)
+
+    for u in free_rows:
+        # 1. Un destino libre permitido directamente
+        target = free_cols.find(lambda v: allowed(u, v))
+        if target is not None:
+            successor[u] = target
+            owner[target] = u
+            free_cols.discard(target)
+            stats['direct'] += 1
+            continue
+
+        # 2. Camino de aumento corto: u toma el destino de w y w toma uno libre
+        augmented = False
+        for _ in range(RANDOM_PROBES):
+            v = randrange(n)
+            w = owner[v]
+            if w < 0 or not allowed(u, v):
+                continue
+            f = free_cols.find(lambda c: allowed(w, c), exhaustive=False)
+            if f is not None:
+                successor[u], owner[v] = v, u
+                successor[w], owner[f] = f, w
+                free_cols.discard(f)
+                augmented = True
+                break
+        if augmented:
+            stats['short_paths'] += 1
+            continue
+
+        # 3. Búsqueda exacta en anchura sobre el grafo implícito
+        stats['bfs'] += 1
+        if not _augment(u, n, successor, owner, free_cols, allowed, signature):
+            raise SorteoInfeasibleError(
+                f'No existe ninguna asignación válida: el participante {ids[u]} '
+                f'no puede regalarle a nadie sin romper las exclusiones'
+            )
+
+    return successor
+
+
+class _FreeTargets:
+    """
+    Conjunto de destinos libres con muestreo aleatorio y borrado en O(1)
+    (lista + posiciones, borrando por intercambio con el último)
+    """
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.items: List[int] = []
+        self.position: Dict[int, int] = {}
+
+    def __contains__(self, v: int) -> bool:
+        return v in self.position
+
+    def add(self, v: int) -> None:
+        self.position[v] = len(self.items)
+        self.items.append(v)
+
+    def discard(self, v: int) -> None:
+        i = self.position.pop(v, None)
+        if i is None:
+            return
+        last = self.items.pop()
+        if last != v:
+            self.items[i] = last
+            self.position[last] = i
+
+    def find(self, accept, exhaustive: bool = True) -> Optional[int]:
+        """Prueba destinos al azar y, si ninguno sirve, recorre todos"""
+        items = self.items
+        if not items:
+            return None
+        for _ in range(min(RANDOM_PROBES, len(items))):
+            v = items[self.rng.randrange(len(items))]
+            if accept(v):
+                return v
+        if exhaustive:
+            return next((v for v in items if accept(v)), None)
+        return None
+
+
+def _augment(root: int, n: int, successor: List[int], owner: List[int], free_cols: '_FreeTargets',
+             allowed, signature) -> bool:
+    """
+    Busca un camino de aumento desde `root` (BFS) sin construir el grafo
+
+    Cada destino se visita una sola vez. Los participantes con la misma firma
+    de restricciones (ver `signature`) permiten los mismos destinos salvo a sí
+    mismos: el primero que se expande visita todos menos el suyo propio, así
+    que a los siguientes solo les queda por probar ese destino.
+    """
+    unvisited = set(range(n))
+    parent_row: Dict[int, int] = {}
+    first_expanded: Dict[tuple, int] = {}
+    queue = deque([root])
+
+    while queue:
+        u = queue.popleft()
+        key = signature(u)
+        candidates = unvisited
+        if key is not None:
+            first = first_expanded.setdefault(key, u)
+            if first != u:
+                candidates = {first} & unvisited
+        for v in list(candidates):
+            if not allowed(u, v):
+                continue
+            unvisited.discard(v)
+            parent_row[v] = u
+            if v in free_cols:
+                # Invertir el camino encontrado
+                free_cols.discard(v)
+                while True:
+                    row = parent_row[v]
+                    previous = successor[row]
+                    successor[row] = v
+                    owner[v] = row
+                    if row == root:
+                        return True
+                    v = previous
+            queue.append(owner[v])
+
+    return False
+
+
+def _merge_cycles(successor: List[int], allowed, rng, stats: Dict[str, int]) -> bool:
+    """
+    Une los ciclos de la permutación en uno solo cuando es posible
+
+    Dos ciclos se unen eligiendo a en el primero y b en el segundo e
+    intercambiando sus destinos. Los ciclos de 3 o más que no se puedan
+    unir se dejan como están; solo los de 2 son obligatorios.
+
+    Returns:
+        False si quedó algún intercambio equivalente sin resolver
+    """
+    n = len(successor)
+    seen = [False] * n
+    cycles = []
+    for start in range(n):
+        if seen[start]:
+            continue
+        cycle = []
+        u = start
+        while not seen[u]:
+            seen[u] = True
+            cycle.append(u)
+            u = successor[u]
+        cycles.append(cycle)
+
+    stats['cycles'] += len(cycles)
+    if len(cycles) == 1:
+        return True
+
+    cycles.sort(key=len, reverse=True)
+    main = cycles[0]
+    leftovers = []
+    randrange = rng.randrange
+
+    def try_merge(cycle: List[int], exhaustive: bool) -> bool:
+        for _ in range(RANDOM_PROBES):
+            a = main[randrange(len(main))]
+            b = cycle[randrange(len(cycle))]
+            if allowed(a, successor[b]) and allowed(b, successor[a]):
+                successor[a], successor[b] = successor[b], successor[a]
+                return True
+        if exhaustive:
+            for b in cycle:
+                for a in main:
+                    if allowed(a, successor[b]) and allowed(b, successor[a]):
+                        successor[a], successor[b] = successor[b], successor[a]
+                        return True
+        return False
+
+    for cycle in cycles[1:]:
+        if try_merge(cycle, exhaustive=len(cycle) == 2):
+            main.extend(cycle)
+        else:
+            leftovers.append(cycle)
+
+    return len(main) > 2 and all(len(cycle) > 2 for cycle in leftovers)
+
+
+def _backtrack(n: int, allowed, rng) -> Optional[List[int]]:
+    """
+    Búsqueda exacta para grupos pequeños con comprobación hacia adelante:
+    asigna primero a quien tiene menos destinos posibles, poda en cuanto
+    alguien sin asignar se queda sin destino (o un destino sin quién le
+    regale) y corta tras BACKTRACK_NODES nodos
+
+    Raises:
+        SorteoSearchExhaustedError: Si se supera BACKTRACK_NODES sin decidir
+    """
+    targets = [[v for v in range(n) if allowed(u, v)] for u in range(n)]
+    givers = [[u for u in range(n) if allowed(u, v)] for v in range(n)]
+    successor = [-1] * n
+    owner = [-1] * n
+    nodes = 0
+
+    def options(u: int) -> List[int]:
+        return [v for v in targets[u] if owner[v] < 0 and successor[v] != u]
+
+    def place(remaining: int) -> bool:
+        nonlocal nodes
+        if remaining == 0:
+            return True
+        nodes += 1
+        if nodes > BACKTRACK_NODES:
+            raise SorteoSearchExhaustedError(
+                f'La búsqueda exacta superó {BACKTRACK_NODES} nodos sin decidir el sorteo'
+            )
+
+        best, best_options = -1, None
+        for u in range(n):
+            if successor[u] >= 0:
+                continue
+            candidates = options(u)
+            if not candidates:
+                return False
+            if best_options is None or len(candidates) < len(best_options):
+                best, best_options = u, candidates
+        for v in range(n):
+            if owner[v] < 0 and not any(successor[u] < 0 and successor[v] != u for u in givers[v]):
+                return False
+
+        rng.shuffle(best_options)
+        for v in best_options:
+            successor[best], owner[v] = v, best
+            if place(remaining - 1):
+                return True
+            successor[best], owner[v] = -1, -1
+        return False
+
+    return successor if place(n) else None
@@ -4,7 +4,8 @@ Portado desde TypeScript (supabase.ts)
 """
 
 import os
-from typing import Optional, List, Dict, Any
+import sys
+from typing import Optional, List, Dict, Any, Iterator
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
@@ -24,18 +25,57 @@ if not SUPABASE_URL or not SUPABASE_ANON_KEY:
 # Crear cliente de Supabase
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
 
+# Filas por página al recorrer tablas (PostgREST limita a 1000 por defecto)
+PAGE_SIZE = int(os.getenv('SUPABASE_PAGE_SIZE', 500))
+
 
 # ============== PARTICIPANTS ==============
 
-def get_participants() -> List[Dict[str, Any]]:
+def iter_participants(page_size: int = PAGE_SIZE, category: Optional[str] = None,
+                      after: Optional[str] = None,
+                      fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre todos los participantes página por página (cursor por id)
+    
+    Args:
+        page_size: Filas por consulta
+        category: Solo participantes de esta categoría (opcional)
+        after: id después del cual empezar (para reanudar)
+        fields: Columnas a traer (lista de columnas de PostgREST); None trae todas
+        
+    Yields:
+        Participantes ordenados por id
+    """
+    # El id siempre se pide porque es el cursor
+    columns = ','.join(['id'] + [field for field in fields if field != 'id']) if fields else '*'
+    
+    cursor = after
+    while True:
+        query = supabase.table('participants').select(columns)
+        if category:
+            query = query.eq('category', category)
+        if cursor:
+            query = query.gt('id', cursor)
+        rows = query.order('id').limit(page_size).execute().data
+        
+        yield from rows
+        
+        if len(rows) < page_size:
+            return
+        cursor = rows[-1]['id']
+
+
+def get_participants(fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     """
     Obtiene todos los participantes
     
+    Args:
+        fields: Columnas a traer, p. ej. ['id', 'category'] (None = todas)
+        
     Returns:
         Lista de participantes
     """
-    response = supabase.table('participants').select('*').execute()
-    return response.data
+    return list(iter_participants(fields=fields))
 
 
 def get_participant_by_id(participant_id: str) -> Optional[Dict[str, Any]]:
@@ -66,7 +106,37 @@ def check_name_exists(encrypted_name: str) -> bool:
     return len(response.data) > 0
 
 
-def create_participant(encrypted_name: str, category: str, gift_options: List[str], password_hash: str, gift_images: Optional[List[str]] = None) -> Dict[str, Any]:
+def get_participant_by_name_index(name_index: str) -> Optional[Dict[str, Any]]:
+    """
+    Obtiene un participante por el índice ciego de su nombre (una lectura indexada)
+    
+    Args:
+        name_index: Índice del nombre (lib.encryption.name_index)
+        
+    Returns:
+        Datos del participante o None si no existe
+    """
+    response = supabase.table('participants').select('*').eq('name_index', name_index).limit(1).execute()
+    return response.data[0] if response.data else None
+
+
+def check_name_index_exists(name_index: str) -> bool:
+    """
+    Verifica si ya existe un participante con el mismo nombre (por índice ciego)
+    
+    A diferencia de check_name_exists, funciona aunque el nombre encriptado
+    use un salt/nonce aleatorio.
+    
+    Args:
+        name_index: Índice del nombre (lib.encryption.name_index)
+        
+    Returns:
+        True si existe, False en caso contrario
+    """
+    return get_participant_by_name_index(name_index) is not None
+
+
+def create_participant(encrypted_name: str, category: str, gift_options: List[str], password_hash: str, gift_images: Optional[List[str]] = None, name_index: Optional[str] = None) -> Dict[str, Any]:
     """
     Crea un nuevo participante
     
@@ -76,6 +146,7 @@ def create_participant(encrypted_name: str, category: str, gift_options: List[st
         gift_options: Lista de opciones de regalo
         password_hash: Hash de la contraseña del participante
         gift_images: Lista de URLs de imágenes de regalos (opcional)
+        name_index: Índice ciego del nombre para búsquedas (opcional)
         
     Returns:
         Datos del participante creado
@@ -90,6 +161,8 @@ def create_participant(encrypted_name: str, category: str, gift_options: List[st
         'password_hash': password_hash,
         'gift_images': gift_images or []
     }
+    if name_index:
+        data['name_index'] = name_index
     
     response = supabase.table('participants').insert(data).execute()
     
@@ -108,7 +181,7 @@ def update_participant_assignment(participant_id: str, assigned_to_id: str) -> D
         assigned_to_id: UUID del participante asignado
         
     Returns:
-        Datos del participante actualizado
+        id y campo escrito (igual en todos los backends)
     """
     data = {'assigned_to_id': assigned_to_id}
     
@@ -117,7 +190,53 @@ def update_participant_assignment(participant_id: str, assigned_to_id: str) -> D
     if not response.data:
         raise Exception(f'Error al actualizar asignación para {participant_id}')
     
-    return response.data[0]
+    return {**data, 'id': participant_id}
+
+
+def update_participant(participant_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Actualiza campos de un participante
+    
+    Args:
+        participant_id: ID del participante
+        data: Campos a actualizar (p. ej. {'password_hash': ...})
+        
+    Returns:
+        id y campos escritos (igual en todos los backends)
+    """
+    response = supabase.table('participants').update(data).eq('id', participant_id).execute()
+    
+    if not response.data:
+        raise Exception(f'Error al actualizar participante {participant_id}')
+    
+    return {**data, 'id': participant_id}
+
+
+def commit_assignments(assignments: Dict[str, str]) -> Dict[str, str]:
+    """
+    Guarda las asignaciones de un sorteo en una sola llamada
+    
+    Usa la función commit_assignments de la base de datos
+    (supabase/migration_commit_assignments.sql), que aplica todas las
+    asignaciones en un UPDATE y devuelve los IDs que no existen. Es atómica:
+    si la sentencia falla, no se guarda ninguna asignación.
+    
+    Args:
+        assignments: Diccionario {participant_id: assigned_to_id}
+        
+    Returns:
+        Diccionario {participant_id: error} con las asignaciones que fallaron
+        (vacío si todas se guardaron)
+    """
+    if not assignments:
+        return {}
+    
+    try:
+        response = supabase.rpc('commit_assignments', {'assignments': assignments}).execute()
+    except Exception as e:
+        return {participant_id: str(e) for participant_id in assignments}
+    
+    return {row['participant_id']: 'El participante no existe' for row in response.data or []}
 
 
 # ============== SETTINGS ==============
@@ -165,29 +284,88 @@ def update_settings(updates: Dict[str, Any]) -> Dict[str, Any]:
     return response.data[0]
 
 
+# ============== ASSIGNMENT SNAPSHOTS ==============
+
+def save_assignment_snapshot(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Guarda el snapshot de un sorteo como una fila (ver lib/assignment_store.py)
+    
+    Args:
+        snapshot: Snapshot creado con create_snapshot
+        
+    Returns:
+        Snapshot guardado
+    """
+    response = supabase.table('assignment_snapshots').insert(snapshot).execute()
+    
+    if not response.data:
+        raise Exception('Error al guardar el sorteo')
+    
+    return response.data[0]
+
+
+def get_assignment_snapshot(draw_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Obtiene el snapshot de un sorteo con una sola lectura
+    
+    Args:
+        draw_id: ID del sorteo (por defecto el más reciente)
+        
+    Returns:
+        Snapshot o None si no existe
+    """
+    query = supabase.table('assignment_snapshots').select('*')
+    if draw_id:
+        query = query.eq('draw_id', draw_id)
+    else:
+        query = query.order('created_at', desc=True)
+    
+    response = query.limit(1).execute()
+    return response.data[0] if response.data else None
+
+
+def get_current_draw_id() -> Optional[str]:
+    """
+    Obtiene el ID del sorteo más reciente sin traer el sorteo empaquetado
+    
+    Returns:
+        draw_id o None si no hay sorteos
+    """
+    response = (supabase.table('assignment_snapshots').select('draw_id')
+                .order('created_at', desc=True).limit(1).execute())
+    return response.data[0]['draw_id'] if response.data else None
+
+
 # ============== UTILITY FUNCTIONS ==============
 
 def reset_all_assignments() -> None:
     """
     Reinicia todas las asignaciones (útil para testing)
     ADVERTENCIA: Esta función eliminará todas las asignaciones
+    
+    También guarda un snapshot vacío (reset_draw) para que el último sorteo
+    deje de tener prioridad sobre assigned_to_id en resolve_match.
     """
     supabase.table('participants').update({'assigned_to_id': None}).neq('id', '00000000-0000-0000-0000-000000000000').execute()
+    
+    # Este módulo expone save_assignment_snapshot, así que sirve como repositorio
+    from lib.assignment_store import reset_draw
+    reset_draw(sys.modules[__name__])
     update_settings({'sorteo_completed': False, 'names_revealed': False})
 
 
-def get_participants_by_category(category: str) -> List[Dict[str, Any]]:
+def get_participants_by_category(category: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     """
     Obtiene participantes filtrados por categoría
     
     Args:
         category: 'elite' o 'diversion'
+        fields: Columnas a traer (None = todas)
         
     Returns:
         Lista de participantes de la categoría especificada
     """
-    response = supabase.table('participants').select('*').eq('category', category).execute()
-    return response.data
+    return list(iter_participants(category=category, fields=fields))
 
 
 def delete_participant(participant_id: str) -> None:
@@ -275,45 +453,3 @@ def delete_gift_image(participant_id: str, option_index: int) -> None:
                 break
     except:
         pass
-
-
-# ============== PASSWORD FUNCTIONS ==============
-
-def get_participant_by_name_and_password(name: str, password_hash: str, encryption_password: str) -> Optional[Dict[str, Any]]:
-    """
-    Obtiene un participante por nombre (sin encriptar) y contraseña
-    
-    Args:
-        name: Nombre del participante en texto plano
-        password_hash: Hash de la contraseña para comparar
-        encryption_password: Contraseña de encriptación para desencriptar nombres
-        
-    Returns:
-        Datos del participante o None si no existe o la contraseña es incorrecta
-    """
-    from lib.encryption import decrypt
-    
-    # Obtener todos los participantes
-    response = supabase.table('participants').select('*').execute()
-    
-    if not response.data:
-        return None
-    
-    # Buscar el participante desencriptando nombres
-    for participant in response.data:
-        try:
-            decrypted_name = decrypt(participant['encrypted_name'], encryption_password)
-            
-            # Verificar si el nombre coincide (ignorando mayúsculas/minúsculas y espacios extra)
-            if decrypted_name.strip().lower() == name.strip().lower():
-                # Verificar que el hash de contraseña coincida
-                if participant.get('password_hash') == password_hash:
-                    return participant
-                else:
-                    # Nombre correcto pero contraseña incorrecta
-                    return None
-        except:
-            # Si hay error al desencriptar, continuar con el siguiente
-            continue
-    
-    return None
@@ -0,0 +1,293 @@
+"""
+Script para rotar la contraseña de encriptación de los nombres e imágenes
+Recorre los participantes por páginas (iter_participants del backend elegido
+con DATA_BACKEND), desencripta cada
+nombre con la contraseña anterior, lo vuelve a encriptar con la nueva (formato
+v2), recalcula el índice ciego y escribe los cambios en lotes concurrentes
+
+Las imágenes de regalo encriptadas (AppWrite Storage) también se derivan de
+la contraseña: se descargan, se vuelven a encriptar con la nueva y se suben
+como archivos nuevos; gift_images se actualiza con las URLs nuevas y solo
+entonces se borran los archivos anteriores. Con --skip-images solo se rotan
+los nombres (las imágenes dejarían de verse con la contraseña nueva).
+
+Solo hay una página en memoria a la vez. Al terminar cada página se guarda un
+checkpoint (cursor + contadores), así que si el proceso se interrumpe basta con
+volver a ejecutarlo para continuar. Los registros que ya están con la clave
+nueva se detectan y se omiten.
+
+Las contraseñas se leen de OLD_ENCRYPTION_PASSWORD y NEW_ENCRYPTION_PASSWORD
+(o se piden por consola). Al terminar, actualiza ENCRYPTION_PASSWORD con la
+nueva contraseña en .env / Secrets.
+
+USO: python rotate_encryption_key.py [--page-size 100] [--workers 8]
+                                     [--checkpoint rotation_checkpoint.json]
+                                     [--restart] [--dry-run] [--skip-images]
+"""
+
+import argparse
+import getpass
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from lib.repository import get_repository
+from lib.encryption import decrypt, decrypt_many, decrypt_stream, encrypt, is_encrypted_stream, name_index
+
+
+DEFAULT_CHECKPOINT = 'rotation_checkpoint.json'
+
+
+def load_checkpoint(path: str, restart: bool) -> dict:
+    """Lee el checkpoint o crea uno nuevo"""
+    if not restart and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {'cursor': None, 'pages': 0, 'rotated': 0, 'skipped': 0, 'failed': [], 'done': False}
+
+
+def save_checkpoint(path: str, checkpoint: dict) -> None:
+    """Escribe el checkpoint de forma atómica (archivo temporal + reemplazo)"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def iter_pages(repo, cursor, page_size: int):
+    """Páginas (listas) de participantes después de `cursor`, leídas en streaming"""
+    participants = repo.iter_participants(page_size=page_size, after=cursor)
+    while True:
+        page = list(islice(participants, page_size))
+        if not page:
+            return
+        yield page
+
+
+def rotate_page(participants: list, old_password: str, new_password: str):
+    """
+    Calcula las actualizaciones de una página
+
+    Returns:
+        (updates, skipped, failed): updates es una lista de (id, data)
+    """
+    names = decrypt_many([participant.get('encrypted_name', '') for participant in participants], old_password)
+
+    updates, skipped, failed = [], 0, []
+    for participant, name in zip(participants, names):
+        if name['error']:
+            # ¿Ya se rotó en una ejecución anterior?
+            try:
+                decrypt(participant.get('encrypted_name', ''), new_password)
+                skipped += 1
+            except Exception:
+                failed.append({'id': participant['id'], 'error': name['error']})
+            continue
+
+        updates.append((participant['id'], {
+            'encrypted_name': encrypt(name['value'], new_password),
+            'name_index': name_index(name['value'], new_password),
+        }))
+
+    return updates, skipped, failed
+
+
+def rotate_images(participant: dict, old_password: str, new_password: str):
+    """
+    Vuelve a encriptar las imágenes de regalo de un participante
+
+    Cada imagen se descarga y desencripta en archivos temporales y se sube
+    como un archivo nuevo encriptado con la contraseña nueva; el anterior no
+    se toca (se borra con delete_replaced_images después de guardar las URLs
+    nuevas). Las que no están encriptadas o ya tienen la clave nueva se dejan
+    igual. Si algo falla se borran los archivos nuevos de este participante.
+
+    Returns:
+        (images, replaced): la lista gift_images con las URLs nuevas y los
+        IDs de los archivos reemplazados, o None si no cambió nada
+
+    Raises:
+        Exception: Si una imagen no se puede desencriptar con ninguna contraseña
+    """
+    from lib.appwrite_client import delete_gift_file, download_gift_image, upload_gift_image
+    from lib.image_cache import file_id_from_url
+
+    images = list(participant.get('gift_images') or [])
+    replaced, uploaded = [], []
+    try:
+        for option_index, url in enumerate(images):
+            file_id = file_id_from_url(url)
+            if not file_id:
+                continue
+
+            with tempfile.TemporaryFile() as encrypted, tempfile.NamedTemporaryFile(suffix='.img') as plain:
+                download_gift_image(file_id, encrypted)
+                encrypted.seek(0)
+                if not is_encrypted_stream(encrypted.read(16)):
+                    continue
+                try:
+                    encrypted.seek(0)
+                    decrypt_stream(encrypted, plain, old_password)
+                except Exception:
+                    # ¿Ya se rotó en una ejecución anterior? (si no, propaga el error)
+                    encrypted.seek(0)
+                    plain.seek(0)
+                    plain.truncate()
+                    decrypt_stream(encrypted, plain, new_password)
+                    continue
+
+                plain.seek(0)
+                images[option_index] = upload_gift_image(participant['id'], option_index, plain,
+                                                         f'option_{option_index}', encryption_password=new_password)
+                uploaded.append(file_id_from_url(images[option_index]))
+                replaced.append(file_id)
+    except Exception:
+        for file_id in uploaded:
+            delete_gift_file(file_id)
+        raise
+
+    return (images, replaced) if replaced else None
+
+
+def rotate_page_images(executor: ThreadPoolExecutor, participants: list, old_password: str, new_password: str):
+    """
+    Rota en paralelo las imágenes de una página
+
+    Returns:
+        (images, replaced, failed): images es {id: gift_images nuevas} y
+        replaced {id: IDs de los archivos reemplazados}
+    """
+    def rotate(participant):
+        try:
+            return participant['id'], rotate_images(participant, old_password, new_password), None
+        except Exception as e:
+            return participant['id'], None, {'id': participant['id'], 'error': f'imágenes: {e}'}
+
+    with_images = [participant for participant in participants if participant.get('gift_images')]
+    images, replaced, failed = {}, {}, []
+    for document_id, rotated, failure in executor.map(rotate, with_images):
+        if failure:
+            failed.append(failure)
+        elif rotated is not None:
+            images[document_id], replaced[document_id] = rotated
+    return images, replaced, failed
+
+
+def delete_replaced_images(executor: ThreadPoolExecutor, replaced: dict, failed_ids: set) -> None:
+    """
+    Borra los archivos reemplazados de los participantes cuya actualización
+    se guardó; los de las que fallaron siguen siendo los vigentes
+    """
+    from lib.appwrite_client import delete_gift_file
+
+    file_ids = [file_id for document_id, file_ids in replaced.items() if document_id not in failed_ids
+                for file_id in file_ids]
+    list(executor.map(delete_gift_file, file_ids))
+
+
+def write_updates(repo, executor: ThreadPoolExecutor, updates: list) -> list:
+    """Escribe las actualizaciones en paralelo y devuelve los fallos"""
+    def write(update):
+        document_id, data = update
+        try:
+            repo.update_participant(document_id, data)
+            return None
+        except Exception as e:
+            return {'id': document_id, 'error': str(e)}
+
+    return [failure for failure in executor.map(write, updates) if failure]
+
+
+def read_password(env_name: str, prompt: str) -> str:
+    return os.getenv(env_name) or getpass.getpass(prompt)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Rotación de la contraseña de encriptación')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=8, help='Escrituras concurrentes')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT)
+    parser.add_argument('--restart', action='store_true', help='Ignorar el checkpoint y empezar de cero')
+    parser.add_argument('--dry-run', action='store_true', help='Calcular sin escribir en la base de datos')
+    parser.add_argument('--skip-images', action='store_true', help='Rotar solo los nombres')
+    args = parser.parse_args()
+
+    print("🔑 Rotación de la contraseña de encriptación")
+    print("=" * 60)
+
+    old_password = read_password('OLD_ENCRYPTION_PASSWORD', 'Contraseña anterior: ')
+    new_password = read_password('NEW_ENCRYPTION_PASSWORD', 'Contraseña nueva: ')
+    if not old_password or not new_password or old_password == new_password:
+        print("❌ Las contraseñas deben existir y ser distintas")
+        return 1
+
+    checkpoint = load_checkpoint(args.checkpoint, args.restart)
+    if checkpoint['done']:
+        print(f"✅ La rotación ya terminó según {args.checkpoint} (usa --restart para repetirla)")
+        return 0
+    if checkpoint['cursor']:
+        print(f"↪️  Continuando después de {checkpoint['cursor']} ({checkpoint['rotated']} ya rotados)")
+
+    repo = get_repository()
+    start = time.perf_counter()
+    processed = 0
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for participants in iter_pages(repo, checkpoint['cursor'], args.page_size):
+            updates, skipped, failed = rotate_page(participants, old_password, new_password)
+            replaced = {}
+            if not args.dry_run and not args.skip_images:
+                images, replaced, image_failures = rotate_page_images(executor, participants, old_password, new_password)
+                failed += image_failures
+                data_by_id = dict(updates)
+                for document_id, gift_images in images.items():
+                    data_by_id.setdefault(document_id, {})['gift_images'] = gift_images
+                updates = list(data_by_id.items())
+            if not args.dry_run:
+                failed += write_updates(repo, executor, updates)
+
+            failed_ids = {failure['id'] for failure in failed}
+            delete_replaced_images(executor, replaced, failed_ids)
+            checkpoint['rotated'] += sum(1 for document_id, data in updates
+                                         if 'encrypted_name' in data and document_id not in failed_ids)
+            checkpoint['skipped'] += skipped
+            checkpoint['failed'] += failed
+            checkpoint['pages'] += 1
+            checkpoint['cursor'] = participants[-1]['id']
+            if not args.dry_run:
+                save_checkpoint(args.checkpoint, checkpoint)
+
+            processed += len(participants)
+            rate = processed / (time.perf_counter() - start)
+            print(f"   📄 Página {checkpoint['pages']}: {processed:,} procesados ({rate:,.0f}/s), "
+                  f"{checkpoint['rotated']:,} rotados, {checkpoint['skipped']:,} ya rotados, "
+                  f"{len(checkpoint['failed']):,} con error")
+
+    checkpoint['done'] = not checkpoint['failed']
+    if not args.dry_run:
+        save_checkpoint(args.checkpoint, checkpoint)
+
+    print()
+    print("=" * 60)
+    print(f"⏱️  {processed:,} participantes en {time.perf_counter() - start:.1f} s")
+    if checkpoint['failed']:
+        print(f"❌ {len(checkpoint['failed'])} registros con error (ver {args.checkpoint}):")
+        for failure in checkpoint['failed'][:10]:
+            print(f"   - {failure['id']}: {failure['error']}")
+        print("   Corrige los errores y ejecuta con --restart para reintentarlos")
+        return 1
+
+    if args.dry_run:
+        print("ℹ️  Simulación: no se escribió nada")
+    else:
+        print("✅ ROTACIÓN COMPLETADA")
+        print("   Actualiza ENCRYPTION_PASSWORD con la contraseña nueva en .env / Secrets")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,6 +6,7 @@ USO: python setup_appwrite_schema.py
 """
 
 import os
+import time
 from dotenv import load_dotenv
 from appwrite.client import Client
 from appwrite.services.databases import Databases
@@ -19,6 +20,7 @@ APPWRITE_API_KEY = os.getenv('APPWRITE_API_KEY')
 APPWRITE_DATABASE_ID = os.getenv('APPWRITE_DATABASE_ID')
 APPWRITE_PARTICIPANTS_COLLECTION_ID = os.getenv('APPWRITE_PARTICIPANTS_COLLECTION_ID')
 APPWRITE_SETTINGS_COLLECTION_ID = os.getenv('APPWRITE_SETTINGS_COLLECTION_ID')
+APPWRITE_ASSIGNMENTS_COLLECTION_ID = os.getenv('APPWRITE_ASSIGNMENTS_COLLECTION_ID')
 
 # Inicializar cliente
 client = Client()
@@ -44,6 +46,14 @@ participants_attributes = [
         'required': True,
         'array': False
     },
+    {
+        'key': 'name_index',
+        'type': 'string',
+        'size': 64,
+        'required': False,
+        'array': False,
+        'default': None
+    },
     {
         'key': 'category',
         'type': 'enum',
@@ -121,6 +131,27 @@ for attr in participants_attributes:
 
 print()
 
+# Índice único del índice ciego del nombre (login y duplicados en una lectura)
+print("   Creando índice único 'idx_name_index'...", end=' ')
+time.sleep(3)  # AppWrite crea los atributos de forma asíncrona
+try:
+    databases.create_index(
+        database_id=APPWRITE_DATABASE_ID,
+        collection_id=APPWRITE_PARTICIPANTS_COLLECTION_ID,
+        key='idx_name_index',
+        type='unique',
+        attributes=['name_index']
+    )
+    print("✅")
+except Exception as e:
+    error_msg = str(e)
+    if 'already exists' in error_msg.lower():
+        print("⚠️  Ya existe")
+    else:
+        print(f"❌ Error: {error_msg} (vuelve a ejecutar el script en unos segundos)")
+
+print()
+
 # ============== SETTINGS COLLECTION ==============
 print("2️⃣  Configurando collection 'settings'...")
 print()
@@ -180,6 +211,58 @@ for attr in settings_attributes:
         else:
             print(f"❌ Error: {error_msg}")
 
+print()
+
+# ============== ASSIGNMENTS COLLECTION ==============
+# Un documento por sorteo con el mapa de asignaciones empaquetado (lib/assignment_store.py)
+print("3️⃣  Configurando collection 'assignments'...")
+print()
+
+assignments_attributes = [
+    {'key': 'version', 'type': 'integer', 'required': True},
+    {'key': 'created_at', 'type': 'string', 'size': 32, 'required': True},
+    {'key': 'seed', 'type': 'string', 'size': 32, 'required': False},
+    {'key': 'count', 'type': 'integer', 'required': True},
+    {'key': 'output_hash', 'type': 'string', 'size': 64, 'required': True},
+    {'key': 'metadata', 'type': 'string', 'size': 65535, 'required': False, 'default': '{}'},
+    {'key': 'packed', 'type': 'string', 'size': 10000000, 'required': True}
+]
+
+if not APPWRITE_ASSIGNMENTS_COLLECTION_ID:
+    print("   ⚠️  APPWRITE_ASSIGNMENTS_COLLECTION_ID no está configurado, se omite")
+else:
+    for attr in assignments_attributes:
+        try:
+            key = attr['key']
+            attr_type = attr['type']
+            
+            print(f"   Creando atributo '{key}' ({attr_type})...", end=' ')
+            
+            if attr_type == 'string':
+                databases.create_string_attribute(
+                    database_id=APPWRITE_DATABASE_ID,
+                    collection_id=APPWRITE_ASSIGNMENTS_COLLECTION_ID,
+                    key=key,
+                    size=attr['size'],
+                    required=attr['required'],
+                    default=attr.get('default')
+                )
+            elif attr_type == 'integer':
+                databases.create_integer_attribute(
+                    database_id=APPWRITE_DATABASE_ID,
+                    collection_id=APPWRITE_ASSIGNMENTS_COLLECTION_ID,
+                    key=key,
+                    required=attr['required']
+                )
+            
+            print("✅")
+        except Exception as e:
+            error_msg = str(e)
+            if 'Attribute already exists' in error_msg or 'already exists' in error_msg.lower():
+                print("⚠️  Ya existe")
+            else:
+                print(f"❌ Error: {error_msg}")
+
 print()
 print("=" * 60)
 print("✅ SCHEMA CONFIGURADO")
@@ -0,0 +1,298 @@
+"""
+Simulador Monte Carlo del sorteo para planear capacidad y restricciones
+Genera poblaciones sintéticas (categorías, hogares, parejas, equipos y
+sorteo del año anterior), corre miles de sorteos con lib.sorteo_solver en un
+pool de procesos y reporta la distribución del tiempo de solución, del
+trabajo de reparación (conflictos, caminos de aumento, búsquedas BFS) y de
+los sorteos que fallan: imposibles (no existe asignación, incluidas las
+categorías con menos de 3 participantes) y búsquedas agotadas (la heurística
+se rindió; puede existir una asignación)
+
+Los resultados se procesan conforme llegan (ventana acotada de tareas y
+estadísticas incrementales), así que la memoria no crece con el número de
+sorteos. Con --jsonl cada sorteo también se escribe en un archivo JSON Lines.
+
+USO: python simulate_sorteo.py --trials 2000 --participants 500 \
+         [--elite-ratio 0.3] [--household-size 3] [--couples 0.2] [--teams 0] \
+         [--exclude-previous] [--workers 4] [--jsonl sorteos.jsonl] [--output resumen.json]
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from lib.sorteo import create_valid_assignment, group_participants
+from lib.sorteo_solver import (SorteoInfeasibleError, SorteoSearchExhaustedError, build_exclusions,
+                               solve_with_exclusions)
+
+
+STAT_KEYS = ('conflicts', 'direct', 'short_paths', 'bfs', 'cycles', 'backtracking')
+OUTCOMES = ('ok', 'infeasible', 'exhausted', 'error')
+TRIALS_PER_TASK = 10
+MAX_ERROR_EXAMPLES = 5
+
+
+class LogHistogram:
+    """
+    Histograma con cubetas logarítmicas para estimar percentiles en memoria
+    constante (el cero se cuenta aparte)
+    """
+
+    def __init__(self, low: float, high: float, per_decade: int = 20):
+        self.low = low
+        self.per_decade = per_decade
+        self.bins = [0] * (int(math.ceil(math.log10(high / low) * per_decade)) + 1)
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        if value <= 0:
+            self.zeros += 1
+            return
+        index = int(math.log10(max(value, self.low) / self.low) * self.per_decade)
+        self.bins[min(index, len(self.bins) - 1)] += 1
+
+    def percentile(self, q: float) -> float:
+        """Límite superior de la cubeta que contiene el percentil q (0-100)"""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = self.zeros
+        if seen >= rank:
+            return 0.0
+        for index, amount in enumerate(self.bins):
+            seen += amount
+            if seen >= rank:
+                return min(self.low * 10 ** ((index + 1) / self.per_decade), self.maximum)
+        return self.maximum
+
+    def summary(self) -> dict:
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean': self.total / self.count,
+            'min': self.minimum,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.maximum,
+        }
+
+
+def make_population(config: dict, rng: random.Random) -> list:
+    """Genera participantes sintéticos con categoría, hogar y equipo"""
+    n = config['participants']
+    participants = []
+    household = 0
+    remaining_in_household = 0
+
+    for i in range(n):
+        if remaining_in_household == 0:
+            household += 1
+            remaining_in_household = max(1, int(rng.expovariate(1 / config['household_size'])) + 1)
+        remaining_in_household -= 1
+        participants.append({
+            'id': f'sim-{i:07d}',
+            'category': 'elite' if rng.random() < config['elite_ratio'] else 'diversion',
+            'household': f'h{household}' if config['household_size'] > 1 else None,
+            'team': f't{rng.randrange(config["teams"])}' if config['teams'] else None,
+        })
+
+    return participants
+
+
+def run_trial(trial: int, config: dict) -> dict:
+    """Corre un sorteo simulado completo (todas las categorías)"""
+    rng = random.Random(f"{config['seed']}:{trial}")
+    participants = make_population(config, rng)
+    groups = group_participants(participants)
+
+    couples = []
+    ids = [p['id'] for p in participants]
+    for _ in range(int(len(ids) * config['couples'] / 2)):
+        couples.append((ids[rng.randrange(len(ids))], ids[rng.randrange(len(ids))]))
+
+    previous = {}
+    if config['exclude_previous']:
+        for members in groups.values():
+            if len(members) >= 3:
+                previous.update(create_valid_assignment(members, rng))
+
+    exclusions = build_exclusions(pairs=couples, previous_assignments=previous)
+    exclude_same = tuple(field for field, enabled in (('household', config['household_size'] > 1),
+                                                      ('team', bool(config['teams']))) if enabled)
+
+    stats = {}
+    result = {'trial': trial, 'ok': True, 'outcome': 'ok', 'error': None}
+    start = time.perf_counter()
+    try:
+        for category, members in groups.items():
+            if len(members) < 3:
+                raise SorteoInfeasibleError(
+                    f"La categoría '{category}' tiene {len(members)} participantes; se necesitan al menos 3"
+                )
+            solve_with_exclusions(members, exclusions, exclude_same, rng=rng, stats=stats)
+    except Exception as e:
+        result['ok'] = False
+        if isinstance(e, SorteoInfeasibleError):
+            result['outcome'] = 'infeasible'
+        elif isinstance(e, SorteoSearchExhaustedError):
+            result['outcome'] = 'exhausted'
+        else:
+            result['outcome'] = 'error'
+        result['error'] = f'{type(e).__name__}: {e}'
+    result['seconds'] = time.perf_counter() - start
+    for key in STAT_KEYS:
+        result[key] = stats.get(key, 0)
+    return result
+
+
+def run_trials(first: int, count: int, config: dict) -> list:
+    """Tarea del pool: un bloque de sorteos consecutivos"""
+    return [run_trial(trial, config) for trial in range(first, first + count)]
+
+
+def simulate(config: dict, trials: int, workers: int, jsonl_path: str = None):
+    """
+    Corre la simulación y entrega un resumen acumulado cada vez que termina
+    un bloque de sorteos
+
+    Mantiene como máximo workers * 2 tareas en vuelo.
+    """
+    histograms = {'seconds': LogHistogram(1e-6, 1e3)}
+    for key in STAT_KEYS:
+        histograms[key] = LogHistogram(1, 1e9, per_decade=10)
+    outcomes = Counter({outcome: 0 for outcome in OUTCOMES})
+    failures = Counter()
+    examples = []
+    completed = 0
+
+    jsonl = open(jsonl_path, 'w', encoding='utf-8') if jsonl_path else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            next_trial = 0
+
+            while next_trial < trials or pending:
+                while next_trial < trials and len(pending) < workers * 2:
+                    count = min(TRIALS_PER_TASK, trials - next_trial)
+                    pending.add(executor.submit(run_trials, next_trial, count, config))
+                    next_trial += count
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for result in future.result():
+                        completed += 1
+                        outcomes[result['outcome']] += 1
+                        histograms['seconds'].add(result['seconds'])
+                        for key in STAT_KEYS:
+                            histograms[key].add(result[key])
+                        if not result['ok']:
+                            failures[result['error'].split(':')[0]] += 1
+                            if len(examples) < MAX_ERROR_EXAMPLES:
+                                examples.append(result['error'])
+                        if jsonl:
+                            jsonl.write(json.dumps(result) + '\n')
+
+                yield {
+                    'completed': completed,
+                    'failures': sum(failures.values()),
+                    'infeasible': outcomes['infeasible'],
+                    'exhausted': outcomes['exhausted'],
+                    'errors': outcomes['error'],
+                    'failure_types': dict(failures),
+                    'failure_examples': examples,
+                    'distributions': {key: h.summary() for key, h in histograms.items()},
+                }
+    finally:
+        if jsonl:
+            jsonl.close()
+
+
+def positive_int(value: str) -> int:
+    """Tipo de argparse para enteros >= 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'debe ser al menos 1 (se recibió {value})')
+    return number
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Simulación Monte Carlo del sorteo')
+    parser.add_argument('--trials', type=positive_int, default=1000)
+    parser.add_argument('--participants', type=int, default=500)
+    parser.add_argument('--elite-ratio', type=float, default=0.3)
+    parser.add_argument('--household-size', type=float, default=1, help='Tamaño medio de hogar (1 = sin hogares)')
+    parser.add_argument('--couples', type=float, default=0.0, help='Fracción de participantes en pareja')
+    parser.add_argument('--teams', type=int, default=0, help='Número de equipos (0 = sin equipos)')
+    parser.add_argument('--exclude-previous', action='store_true', help='Prohibir repetir el sorteo anterior')
+    parser.add_argument('--workers', type=positive_int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--jsonl', help='Archivo JSON Lines con cada sorteo')
+    parser.add_argument('--output', default='simulacion_sorteo.json')
+    args = parser.parse_args()
+
+    config = {
+        'participants': args.participants,
+        'elite_ratio': args.elite_ratio,
+        'household_size': args.household_size,
+        'couples': args.couples,
+        'teams': args.teams,
+        'exclude_previous': args.exclude_previous,
+        'seed': args.seed,
+    }
+
+    print("🎲 Simulación del sorteo")
+    print("=" * 50)
+    print(f"   {args.trials:,} sorteos de {args.participants:,} participantes, {args.workers} procesos")
+
+    start = time.perf_counter()
+    last_print = start
+    report = None
+    for report in simulate(config, args.trials, args.workers, args.jsonl):
+        now = time.perf_counter()
+        if now - last_print >= 2 or report['completed'] == args.trials:
+            rate = report['completed'] / (now - start)
+            print(f"   ⏱️  {report['completed']:,}/{args.trials:,} sorteos "
+                  f"({rate:,.0f}/s), {report['infeasible']:,} imposibles, "
+                  f"{report['exhausted']:,} con búsqueda agotada")
+            last_print = now
+
+    report['config'] = config
+    report['elapsed_s'] = time.perf_counter() - start
+
+    seconds = report['distributions']['seconds']
+    print()
+    print(f"📊 Tiempo por sorteo: p50={seconds['p50'] * 1000:.2f} ms, "
+          f"p99={seconds['p99'] * 1000:.2f} ms, máx={seconds['max'] * 1000:.2f} ms")
+    print(f"   Conflictos reparados (p99): {report['distributions']['conflicts']['p99']:.0f}, "
+          f"búsquedas BFS (máx): {report['distributions']['bfs']['max']:.0f}")
+    print(f"   Sorteos imposibles: {report['infeasible']:,} ({report['infeasible'] / args.trials:.1%})")
+    print(f"   Búsquedas agotadas (puede existir asignación): {report['exhausted']:,} "
+          f"({report['exhausted'] / args.trials:.1%})")
+    if report['errors']:
+        print(f"   ⚠️  Otros errores: {report['errors']:,} (ver failure_examples en {args.output})")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Resumen guardado en {args.output}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,25 @@
+-- Migración: Guardar cada sorteo como una sola fila (snapshot de asignaciones)
+
+-- Una fila por sorteo con el mapa {participant_id: assigned_to_id}
+-- empaquetado (zlib + base64), la semilla y los metadatos. El sorteo vigente
+-- es el más reciente. Ver lib/assignment_store.py
+CREATE TABLE IF NOT EXISTS assignment_snapshots (
+    draw_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    seed TEXT,
+    count INTEGER NOT NULL,
+    output_hash TEXT NOT NULL,
+    metadata TEXT NOT NULL DEFAULT '{}',
+    packed TEXT NOT NULL
+);
+
+-- Búsqueda del sorteo vigente
+CREATE INDEX IF NOT EXISTS idx_assignment_snapshots_created_at
+ON assignment_snapshots(created_at DESC);
+
+ALTER TABLE assignment_snapshots ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Enable insert for everyone" ON assignment_snapshots FOR INSERT WITH CHECK (true);
+CREATE POLICY "Enable read for everyone" ON assignment_snapshots FOR SELECT USING (true);
+
+COMMENT ON TABLE assignment_snapshots IS 'Un sorteo por fila con las asignaciones empaquetadas';
@@ -0,0 +1,26 @@
+-- Migración: Guardar todas las asignaciones de un sorteo en una sola llamada
+
+-- Recibe {participant_id: assigned_to_id} y aplica todas las asignaciones con
+-- un solo UPDATE (una transacción). Devuelve los IDs que no existen para
+-- reportarlos como fallidos. Se usa desde commit_assignments() en
+-- lib/supabase_client.py
+CREATE OR REPLACE FUNCTION commit_assignments(assignments JSONB)
+RETURNS TABLE (participant_id UUID)
+LANGUAGE SQL
+AS $$
+    WITH input AS (
+        SELECT key::UUID AS id, value::UUID AS assigned_to_id
+        FROM jsonb_each_text(assignments)
+    ),
+    updated AS (
+        UPDATE participants p
+        SET assigned_to_id = input.assigned_to_id
+        FROM input
+        WHERE p.id = input.id
+        RETURNING p.id
+    )
+    SELECT input.id FROM input
+    WHERE input.id NOT IN (SELECT id FROM updated);
+$$;
+
+COMMENT ON FUNCTION commit_assignments(JSONB) IS 'Guarda las asignaciones de un sorteo y devuelve los IDs inexistentes';
@@ -0,0 +1,15 @@
+-- Migración: Agregar el índice ciego del nombre a la tabla participants
+
+-- HMAC-SHA256 (hex) del nombre normalizado; permite login y detección de
+-- duplicados con una sola consulta de igualdad
+ALTER TABLE participants
+ADD COLUMN IF NOT EXISTS name_index TEXT;
+
+-- Índice único: un nombre no puede registrarse dos veces
+CREATE UNIQUE INDEX IF NOT EXISTS idx_participants_name_index
+ON participants(name_index);
+
+COMMENT ON COLUMN participants.name_index IS 'Índice ciego (HMAC) del nombre normalizado para búsquedas por nombre';
+
+-- Nota: los registros anteriores quedan con name_index NULL y el login no los
+-- encuentra; complétalos con python backfill_name_index.py
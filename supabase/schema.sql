@@ -16,6 +16,7 @@ create table public.participants (
   id uuid default gen_random_uuid() primary key,
   created_at timestamp with time zone default timezone('utc'::text, now()) not null,
   encrypted_name text not null,
+  name_index text unique,
   category text not null check (category in ('elite', 'diversion')),
   gift_options jsonb not null default '[]'::jsonb,
   assigned_to_id uuid references public.participants(id),
@@ -34,3 +35,41 @@ create policy "Enable update for everyone" on public.participants for update usi
 -- Policies for settings
 create policy "Enable read for everyone" on public.settings for select using (true);
 create policy "Enable update for everyone" on public.settings for update using (true);
+
+-- Save all assignments of a draw in one call (see migration_commit_assignments.sql)
+create or replace function public.commit_assignments(assignments jsonb)
+returns table (participant_id uuid)
+language sql
+as $$
+  with input as (
+    select key::uuid as id, value::uuid as assigned_to_id
+    from jsonb_each_text(assignments)
+  ),
+  updated as (
+    update public.participants p
+    set assigned_to_id = input.assigned_to_id
+    from input
+    where p.id = input.id
+    returning p.id
+  )
+  select input.id from input
+  where input.id not in (select id from updated);
+$$;
+
+-- One row per draw with the packed assignment map (see migration_assignment_snapshots.sql)
+create table public.assignment_snapshots (
+  draw_id text primary key,
+  version integer not null,
+  created_at timestamp with time zone not null,
+  seed text,
+  count integer not null,
+  output_hash text not null,
+  metadata text not null default '{}',
+  packed text not null
+);
+
+create index idx_assignment_snapshots_created_at on public.assignment_snapshots(created_at desc);
+
+alter table public.assignment_snapshots enable row level security;
+create policy "Enable insert for everyone" on public.assignment_snapshots for insert with check (true);
+create policy "Enable read for everyone" on public.assignment_snapshots for select using (true);
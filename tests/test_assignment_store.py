@@ -0,0 +1,110 @@
+import json
+import random
+
+import pytest
+
+from lib.assignment_store import (audit_draw, commit_draw, create_snapshot, pack_assignments, reset_draw,
+                                  resolve_match, snapshot_assignments, unpack_assignments)
+from lib.cache import CachedRepository
+from lib.repository import InMemoryRepository, SQLiteRepository
+from lib.sorteo import create_compact_assignment, hash_assignments
+
+
+def make_participants(repo, count=6):
+    for i in range(count):
+        repo.create_participant(f'enc-{i}', 'diversion', ['a', 'b', 'c'], 'hash')
+    return sorted(p['id'] for p in repo.get_participants(fields=['id']))
+
+
+def cycle(ids, shift=1):
+    return {ids[i]: ids[(i + shift) % len(ids)] for i in range(len(ids))}
+
+
+@pytest.mark.parametrize('assignments', [
+    {},
+    {'a': 'b'},
+    {'a': 'b', 'b': 'c', 'c': 'a'},
+    {'año': 'über', 'über': 'ñandú', 'ñandú': 'año'},
+])
+def test_pack_roundtrip(assignments):
+    assert unpack_assignments(pack_assignments(assignments)) == assignments
+
+
+def test_pack_compact_assignment():
+    participants = [{'id': f'p{i}'} for i in range(50)]
+    compact = create_compact_assignment(participants, random.Random(3))
+    assert unpack_assignments(pack_assignments(compact)) == compact.to_dict()
+
+    snapshot = create_snapshot(compact, seed=2 ** 64 - 1)
+    assert snapshot['count'] == 50
+    assert snapshot['seed'] == str(2 ** 64 - 1)
+    assert snapshot['output_hash'] == hash_assignments(compact.to_dict())
+
+
+def test_unpack_rejects_garbage():
+    with pytest.raises(Exception):
+        unpack_assignments('no es base64')
+
+
+def test_snapshot_map_is_read_only():
+    snapshot = create_snapshot({'a': 'b', 'b': 'c', 'c': 'a'})
+    assignments = snapshot_assignments(snapshot)
+    assert snapshot_assignments(snapshot) is assignments
+    with pytest.raises(TypeError):
+        assignments['a'] = 'c'
+
+
+@pytest.mark.parametrize('backend', [InMemoryRepository, SQLiteRepository,
+                                     lambda: CachedRepository(InMemoryRepository(), ttl=60)])
+def test_draw_reset_resolve(backend):
+    repo = backend()
+    ids = make_participants(repo)
+    draw = cycle(ids)
+    participant = repo.get_participant_by_id(ids[0])
+
+    commit_draw(repo, draw, seed=7, metadata={'category': 'diversion'})
+    assert resolve_match(repo, participant) == draw[ids[0]]
+
+    repo.reset_all_assignments()
+    participant = repo.get_participant_by_id(ids[0])
+    assert resolve_match(repo, participant) is None
+    assert repo.get_settings()['sorteo_completed'] is False
+
+    redraw = cycle(ids, 2)
+    commit_draw(repo, redraw)
+    assert resolve_match(repo, participant) == redraw[ids[0]]
+
+
+def test_reset_draw_supersedes_snapshot_for_assigned_to_id():
+    repo = InMemoryRepository()
+    ids = make_participants(repo)
+    commit_draw(repo, cycle(ids))
+
+    # Sorteo guardado por participante (sin snapshot) después de uno con snapshot
+    fallback = cycle(ids, 2)
+    repo.commit_assignments(fallback)
+    reset_draw(repo, {'superseded_by': 'commit_assignments'})
+
+    participant = repo.get_participant_by_id(ids[0])
+    assert resolve_match(repo, participant) == fallback[ids[0]]
+
+
+def test_audit_draw():
+    repo = InMemoryRepository()
+    ids = make_participants(repo)
+    snapshot = commit_draw(repo, cycle(ids), seed=11, metadata={'category': 'diversion'})
+
+    report = audit_draw(repo)
+    assert report['draw_id'] == snapshot['draw_id']
+    assert report['hash_ok'] is True
+    assert report['assignments'] == cycle(ids)
+    assert report['metadata'] == {'category': 'diversion'}
+    assert 'packed' not in report
+
+    reset = reset_draw(repo)
+    assert json.loads(reset['metadata']) == {'reset': True}
+    assert audit_draw(repo)['assignments'] == {}
+    assert audit_draw(repo, snapshot['draw_id'])['hash_ok'] is True
+
+    with pytest.raises(Exception):
+        audit_draw(repo, 'no-existe')
@@ -0,0 +1,109 @@
+from lib.assignment_store import commit_draw
+from lib.cache import CachedRepository
+from lib.repository import InMemoryRepository
+
+
+def make_cached(count=4):
+    inner = InMemoryRepository()
+    for i in range(count):
+        inner.create_participant(f'enc-{i}', 'diversion', ['a', 'b', 'c'], 'hash', name_index=f'idx-{i}')
+    return inner, CachedRepository(inner, ttl=60)
+
+
+def test_reads_are_served_from_cache():
+    inner, repo = make_cached()
+    repo.get_settings()
+    repo.get_settings()
+    assert repo.cache_metrics()['hits'] == 1
+
+    inner.update_settings({'names_revealed': True})  # Otro proceso
+    assert repo.get_settings()['names_revealed'] is False
+
+
+def test_returned_values_are_copies():
+    _, repo = make_cached()
+    participant = repo.get_participants()[0]
+    participant['category'] = 'elite'
+    assert repo.get_participant_by_id(participant['id'])['category'] == 'diversion'
+    assert repo.get_participants()[0]['category'] == 'diversion'
+
+
+def test_update_settings_invalidates():
+    _, repo = make_cached()
+    assert repo.get_settings()['sorteo_completed'] is False
+    repo.update_settings({'sorteo_completed': True})
+    assert repo.get_settings()['sorteo_completed'] is True
+
+
+def test_participant_writes_invalidate():
+    _, repo = make_cached()
+    participant = repo.get_participants()[0]
+    repo.get_participant_by_id(participant['id'])
+    repo.get_participant_by_name_index('idx-0')
+
+    repo.update_participant(participant['id'], {'gift_options': ['x', 'y', 'z']})
+    assert repo.get_participant_by_id(participant['id'])['gift_options'] == ['x', 'y', 'z']
+    assert {tuple(p['gift_options']) for p in repo.get_participants()} >= {('x', 'y', 'z')}
+
+    created = repo.create_participant('enc-new', 'elite', ['a', 'b', 'c'], 'hash', name_index='idx-new')
+    assert repo.get_participant_by_name_index('idx-new')['id'] == created['id']
+    assert len(repo.get_participants_by_category('elite')) == 1
+
+    repo.delete_participant(created['id'])
+    assert repo.get_participant_by_id(created['id']) is None
+    assert repo.get_participants_by_category('elite') == []
+
+
+def test_commit_and_reset_invalidate():
+    _, repo = make_cached()
+    ids = [p['id'] for p in repo.get_participants(fields=['id'])]
+    for participant_id in ids:
+        repo.get_participant_by_id(participant_id)
+
+    assignments = {ids[i]: ids[(i + 1) % len(ids)] for i in range(len(ids))}
+    assert repo.commit_assignments(assignments) == {}
+    assert all(repo.get_participant_by_id(pid)['assigned_to_id'] == assignments[pid] for pid in ids)
+
+    repo.reset_all_assignments()
+    assert all(repo.get_participant_by_id(pid)['assigned_to_id'] is None for pid in ids)
+
+
+def test_guard_bypasses_cache():
+    inner, repo = make_cached()
+    repo.get_settings()
+    inner.update_settings({'sorteo_completed': True})  # Otro proceso termina el sorteo
+    assert repo.get_settings_uncached()['sorteo_completed'] is True
+
+
+def test_current_snapshot_is_fetched_once_per_draw(monkeypatch):
+    inner, repo = make_cached()
+    ids = [p['id'] for p in repo.get_participants(fields=['id'])]
+    first = commit_draw(repo, {ids[0]: ids[1], ids[1]: ids[2], ids[2]: ids[0]})
+
+    reads = []
+    read_snapshot = inner.get_assignment_snapshot
+    monkeypatch.setattr(inner, 'get_assignment_snapshot', lambda draw_id=None: reads.append(draw_id) or read_snapshot(draw_id))
+    for _ in range(3):
+        assert repo.get_assignment_snapshot()['draw_id'] == first['draw_id']
+    assert reads == [first['draw_id']]
+
+    # Otro proceso guarda un snapshot más reciente: se ve al vencer el draw_id vigente
+    second = commit_draw(inner, {ids[0]: ids[2], ids[2]: ids[1], ids[1]: ids[0]})
+    assert repo.get_current_draw_id() == second['draw_id']
+    assert repo.get_assignment_snapshot()['draw_id'] == first['draw_id']
+    repo.current_draw_ttl = 0
+    repo.cache.invalidate(lambda key: key[0] == 'current_draw')  # Como si hubiera vencido
+    assert repo.get_assignment_snapshot()['draw_id'] == second['draw_id']
+    assert repo.get_assignment_snapshot()['draw_id'] == second['draw_id']
+    assert reads == [first['draw_id'], second['draw_id']]
+    assert repo.get_assignment_snapshot(first['draw_id'])['draw_id'] == first['draw_id']
+
+
+def test_misses_are_not_cached():
+    inner, repo = make_cached()
+    assert repo.get_participant_by_name_index('idx-new') is None
+
+    # Otro proceso registra al participante: el login lo encuentra sin esperar el TTL
+    created = inner.create_participant('enc-new', 'diversion', ['a', 'b', 'c'], 'hash', name_index='idx-new')
+    assert repo.get_participant_by_name_index('idx-new')['id'] == created['id']
+    assert repo.get_participant_by_id(created['id'])['id'] == created['id']
@@ -0,0 +1,153 @@
+import base64
+import hashlib
+import io
+import os
+
+import pytest
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from lib.encryption import (FORMAT_LEGACY, FORMAT_V2, IV_LENGTH, SALT_LENGTH, STREAM_HEADER_LENGTH,
+                            ciphertext_version, decrypt, decrypt_many, decrypt_stream, derive_key, encrypt,
+                            encrypt_legacy, encrypt_many, encrypt_stream, is_encrypted_stream, name_index,
+                            normalize_name)
+from lib.password_hashing import hash_password, needs_rehash, parse_hash, verify_password
+
+
+PASSWORD = 'clave-de-prueba'
+
+
+def legacy_ciphertext(text, password, salt):
+    iv = os.urandom(IV_LENGTH)
+    ciphertext = AESGCM(derive_key(password, salt)).encrypt(iv, text.encode('utf-8'), None)
+    return base64.b64encode(salt + iv + ciphertext).decode('utf-8')
+
+
+@pytest.mark.parametrize('text', ['', 'Ana', 'María José Núñez', '🎁' * 100])
+def test_v2_roundtrip(text):
+    encrypted = encrypt(text, PASSWORD)
+    assert ciphertext_version(encrypted) == FORMAT_V2
+    assert encrypt(text, PASSWORD) != encrypted  # Nonce aleatorio
+    assert decrypt(encrypted, PASSWORD) == text
+
+
+def test_wrong_password_and_garbage_raise():
+    encrypted = encrypt('Ana', PASSWORD)
+    with pytest.raises(Exception):
+        decrypt(encrypted, 'otra')
+    for garbage in ['', 'no es base64!', base64.b64encode(b'\x02corto').decode()]:
+        with pytest.raises(Exception):
+            decrypt(garbage, PASSWORD)
+
+
+def test_legacy_ciphertext():
+    encrypted = encrypt_legacy('Ana', PASSWORD)
+    assert decrypt(encrypted, PASSWORD) == 'Ana'
+
+    salt = b'\x01' + os.urandom(SALT_LENGTH - 1)
+    encrypted = legacy_ciphertext('Beto', PASSWORD, salt)
+    assert ciphertext_version(encrypted) == FORMAT_LEGACY
+    assert decrypt(encrypted, PASSWORD) == 'Beto'
+
+
+def test_legacy_salt_starting_with_v2_marker():
+    # Se detecta como v2; decrypt debe recurrir al formato legacy
+    encrypted = legacy_ciphertext('Carla', PASSWORD, b'\x02' + os.urandom(SALT_LENGTH - 1))
+    assert ciphertext_version(encrypted) == FORMAT_V2
+    assert decrypt(encrypted, PASSWORD) == 'Carla'
+    with pytest.raises(Exception):
+        decrypt(encrypted, 'otra')
+
+
+def test_encrypt_and_decrypt_many():
+    names = [f'Participante {i}' for i in range(20)]
+    encrypted = [item['value'] for item in encrypt_many(names, PASSWORD, max_workers=4)]
+    encrypted[3] = 'corrupto'
+    encrypted[7] = encrypt_legacy(names[7], PASSWORD)
+
+    results = decrypt_many(encrypted, PASSWORD, max_workers=4)
+    assert [item['value'] for item in results] == names[:3] + [None] + names[4:]
+    assert results[3]['error'] and all(item['error'] is None for i, item in enumerate(results) if i != 3)
+    assert decrypt_many([], PASSWORD) == []
+    with pytest.raises(ValueError):
+        decrypt_many(encrypted, PASSWORD, mode='fiber')
+
+
+def encrypted_stream(data, chunk_size=16):
+    dst = io.BytesIO()
+    assert encrypt_stream(io.BytesIO(data), dst, PASSWORD, chunk_size=chunk_size) == len(data)
+    return dst.getvalue()
+
+
+@pytest.mark.parametrize('size', [0, 1, 15, 16, 17, 64, 100])
+def test_stream_roundtrip(size):
+    data = os.urandom(size)
+    sealed = encrypted_stream(data)
+    assert is_encrypted_stream(sealed[:16])
+    dst = io.BytesIO()
+    assert decrypt_stream(io.BytesIO(sealed), dst, PASSWORD) == size
+    assert dst.getvalue() == data
+
+
+def test_stream_rejects_tampering():
+    data = os.urandom(100)
+    sealed = encrypted_stream(data)
+    block = 16 + 16  # Bloque + tag
+
+    tampered = bytearray(sealed)
+    tampered[STREAM_HEADER_LENGTH + 5] ^= 1
+    header = bytearray(sealed)
+    header[8] ^= 1  # Prefijo del nonce (autenticado como dato asociado)
+    first, second = STREAM_HEADER_LENGTH, STREAM_HEADER_LENGTH + block
+    swapped = sealed[:first] + sealed[second:second + block] + sealed[first:second] + sealed[second + block:]
+
+    cases = [
+        bytes(tampered),
+        bytes(header),
+        swapped,
+        sealed[:-1],  # Último bloque truncado
+        sealed[:STREAM_HEADER_LENGTH + 2 * block],  # Sin los últimos bloques
+        sealed[:STREAM_HEADER_LENGTH - 1],  # Encabezado incompleto
+        b'no es un archivo encriptado',
+    ]
+    for case in cases:
+        with pytest.raises(Exception):
+            decrypt_stream(io.BytesIO(case), io.BytesIO(), PASSWORD)
+    with pytest.raises(Exception):
+        decrypt_stream(io.BytesIO(sealed), io.BytesIO(), 'otra')
+
+
+def test_name_index_normalization():
+    assert normalize_name('  María   José\tNÚÑEZ ') == 'maría josé núñez'
+    index = name_index('María José', PASSWORD)
+    assert len(index) == 64
+    assert name_index('  maría   JOSÉ ', PASSWORD) == index
+    assert name_index('Maria Jose', PASSWORD) != index
+    assert name_index('María José', 'otra') != index
+
+
+@pytest.mark.parametrize('scheme, params', [
+    ('scrypt', {'n': 2 ** 4, 'r': 1, 'p': 1}),
+    ('pbkdf2_sha256', {'iterations': 1000}),
+])
+def test_password_hashing(scheme, params):
+    password_hash = hash_password('secreto', scheme, params)
+    assert parse_hash(password_hash)['params'] == params
+    assert hash_password('secreto', scheme, params) != password_hash  # Salt aleatorio
+    assert verify_password('secreto', password_hash)
+    assert not verify_password('Secreto', password_hash)
+    assert needs_rehash(password_hash)  # Costos distintos a los configurados
+
+
+def test_legacy_password_hash_and_rehash():
+    legacy = hashlib.sha256('secreto'.encode('utf-8')).hexdigest()
+    assert verify_password('secreto', legacy)
+    assert not verify_password('otro', legacy)
+    assert needs_rehash(legacy)
+
+    current = hash_password('secreto')
+    assert verify_password('secreto', current)
+    assert not needs_rehash(current)
+
+    for invalid in ['', 'scrypt$roto', 'texto cualquiera']:
+        assert not verify_password('secreto', invalid)
+        assert needs_rehash(invalid)
@@ -0,0 +1,57 @@
+import pytest
+
+from lib.repository import InMemoryRepository, Repository, SQLiteRepository
+
+
+def make_repository(backend, count=7):
+    repo = backend()
+    for i in range(count):
+        repo.create_participant(f'enc-{i}', 'elite' if i % 2 else 'diversion', ['a', 'b', 'c'], 'hash')
+    return repo
+
+
+def test_repository_is_abstract():
+    with pytest.raises(TypeError):
+        Repository()
+
+
+@pytest.mark.parametrize('backend', [InMemoryRepository, SQLiteRepository])
+@pytest.mark.parametrize('page_size', [1, 3, 100])
+def test_iter_participants_pages(backend, page_size):
+    repo = make_repository(backend)
+    ids = sorted(p['id'] for p in repo.get_participants(fields=['id']))
+
+    assert [p['id'] for p in repo.iter_participants(page_size=page_size)] == ids
+    assert [p['id'] for p in repo.iter_participants(page_size=page_size, after=ids[2])] == ids[3:]
+    elite = [p['id'] for p in repo.iter_participants(page_size=page_size, category='elite', fields=['id'])]
+    assert elite == sorted(p['id'] for p in repo.get_participants_by_category('elite'))
+
+
+def test_in_memory_pages_read_under_one_lock_each():
+    repo = make_repository(InMemoryRepository)
+    acquisitions = []
+
+    class CountingLock:
+        def __init__(self, lock):
+            self.lock = lock
+
+        def __enter__(self):
+            acquisitions.append(1)
+            return self.lock.__enter__()
+
+        def __exit__(self, *exc):
+            return self.lock.__exit__(*exc)
+
+    repo._lock = CountingLock(repo._lock)
+    assert len(list(repo.iter_participants(page_size=3))) == 7
+    assert len(acquisitions) == 1 + 3  # listado de ids + 3 páginas
+
+
+@pytest.mark.parametrize('backend', [InMemoryRepository, SQLiteRepository])
+def test_updates_return_written_fields(backend):
+    repo = make_repository(backend)
+    participant_id = repo.get_participants(fields=['id'])[0]['id']
+    assert repo.update_participant(participant_id, {'gift_options': ['x', 'y', 'z']}) == \
+        {'id': participant_id, 'gift_options': ['x', 'y', 'z']}
+    assert repo.update_participant_assignment(participant_id, 'otro') == {'id': participant_id, 'assigned_to_id': 'otro'}
+    assert repo.get_participant_by_id(participant_id)['gift_options'] == ['x', 'y', 'z']
@@ -0,0 +1,91 @@
+"""
+Pruebas del optimizador de costos contra enumeración exhaustiva
+"""
+
+import itertools
+import time
+
+import numpy as np
+import pytest
+
+from lib.sorteo_optimizer import _is_valid_successor, _repair_cycles, optimize_assignment
+from lib.sorteo_solver import SorteoInfeasibleError
+
+
+def brute_force_cost(costs):
+    """Costo mínimo sin autoasignaciones, ciclos de 2 ni parejas prohibidas (inf si no hay)"""
+    n = len(costs)
+    best = np.inf
+    for perm in itertools.permutations(range(n)):
+        if any(perm[u] == u or perm[perm[u]] == u for u in range(n)):
+            continue
+        best = min(best, sum(costs[u][perm[u]] for u in range(n)))
+    return best
+
+
+def assignment_cost(costs, participants, result):
+    index = {p['id']: i for i, p in enumerate(participants)}
+    return sum(costs[index[a]][index[b]] for a, b in result.items())
+
+
+@pytest.mark.parametrize('n', range(3, 8))
+def test_cost_matches_brute_force(n):
+    rng = np.random.default_rng(n)
+    participants = [{'id': str(i), 'category': 'diversion'} for i in range(n)]
+    for _ in range(60):
+        costs = rng.integers(0, 10, (n, n)).astype(np.float64)
+        costs[rng.random((n, n)) < 0.15] = np.inf
+        np.fill_diagonal(costs, np.inf)
+        expected = brute_force_cost(costs)
+
+        if not np.isfinite(expected):
+            with pytest.raises(SorteoInfeasibleError):
+                optimize_assignment(participants, costs)
+            continue
+
+        result = optimize_assignment(participants, costs)
+        assert all(result[result[pid]] != pid != result[pid] for pid in result)
+        assert assignment_cost(costs, participants, result) == expected
+
+
+def test_time_budget_is_respected():
+    n = 300
+    participants = [{'id': str(i), 'category': 'diversion'} for i in range(n)]
+    costs = np.random.default_rng(0).random((n, n))
+    np.fill_diagonal(costs, np.inf)
+
+    start = time.perf_counter()
+    result = optimize_assignment(participants, costs, time_budget=0.05)
+    assert time.perf_counter() - start < 2
+    assert all(result[result[pid]] != pid != result[pid] for pid in result)
+
+
+def assert_valid_draw(costs, participants, result):
+    """Permutación completa, sin ciclos de 1 o 2 ni parejas prohibidas"""
+    ids = sorted(p['id'] for p in participants)
+    assert sorted(result) == ids
+    assert sorted(result.values()) == ids
+    assert all(result[result[pid]] != pid != result[pid] for pid in result)
+    assert np.isfinite(assignment_cost(costs, participants, result))
+
+
+@pytest.mark.parametrize('n', [12, 20, 29])
+def test_expired_budget_with_forbidden_pairs(n):
+    rng = np.random.default_rng(n)
+    participants = [{'id': str(i), 'category': 'diversion'} for i in range(n)]
+    for _ in range(40):
+        costs = rng.integers(0, 10, (n, n)).astype(np.float64)
+        costs[rng.random((n, n)) < 0.3] = np.inf
+        np.fill_diagonal(costs, np.inf)
+        assert_valid_draw(costs, participants, optimize_assignment(participants, costs, time_budget=0.0))
+
+
+def test_repair_keeps_a_permutation_with_chained_self_loops():
+    # Al reparar una autoasignación puede elegirse otra como pareja
+    n = 12
+    forbidden = np.eye(n, dtype=bool)
+    for seed in range(50):
+        matrix = np.random.default_rng(seed).random((n, n))
+        successor = np.arange(n)
+        assert _repair_cycles(matrix, forbidden, successor)
+        assert _is_valid_successor(successor, forbidden)
@@ -0,0 +1,97 @@
+"""
+Pruebas del motor de sorteo con exclusiones contra enumeración exhaustiva
+"""
+
+import itertools
+import random
+import time
+
+import pytest
+
+from lib.sorteo_solver import SorteoInfeasibleError, build_exclusions, solve_with_exclusions
+
+
+def is_valid(ids, successor, allowed):
+    """Sin autoasignaciones, sin intercambios equivalentes y respetando exclusiones"""
+    return all(
+        successor[u] != u and successor[successor[u]] != u and allowed(ids[u], ids[successor[u]])
+        for u in range(len(ids))
+    )
+
+
+def brute_force_feasible(ids, allowed):
+    n = len(ids)
+    return any(is_valid(ids, perm, allowed) for perm in itertools.permutations(range(n)))
+
+
+def make_case(rng, n):
+    participants = [{'id': str(i), 'category': 'diversion',
+                     'household': rng.choice([None, 'a', 'b', 'c'])} for i in range(n)]
+    pairs = [(str(rng.randrange(n)), str(rng.randrange(n))) for _ in range(rng.randrange(n))]
+    previous = {str(i): str(rng.randrange(n)) for i in range(n) if rng.random() < 0.3}
+    exclusions = build_exclusions(pairs=pairs, previous_assignments=previous)
+    exclude_same = ('household',) if rng.random() < 0.5 else ()
+    return participants, exclusions, exclude_same
+
+
+def make_allowed(participants, exclusions, exclude_same):
+    by_id = {p['id']: p for p in participants}
+
+    def allowed(a, b):
+        if a == b or b in exclusions.get(a, ()):
+            return False
+        return not any(by_id[a].get(f) and by_id[a].get(f) == by_id[b].get(f) for f in exclude_same)
+
+    return allowed
+
+
+def test_single_exclusion_with_three_participants():
+    participants = [{'id': str(i), 'category': 'diversion'} for i in range(3)]
+    for seed in range(200):
+        result = solve_with_exclusions(participants, {'1': {'2'}}, rng=random.Random(seed))
+        assert result == {'0': '2', '2': '1', '1': '0'}
+
+
+@pytest.mark.parametrize('n', range(3, 9))
+def test_matches_brute_force(n):
+    rng = random.Random(n)
+    for case in range(200 if n < 8 else 30):
+        participants, exclusions, exclude_same = make_case(rng, n)
+        ids = [p['id'] for p in participants]
+        allowed = make_allowed(participants, exclusions, exclude_same)
+        feasible = brute_force_feasible(ids, allowed)
+
+        try:
+            result = solve_with_exclusions(participants, exclusions, exclude_same, rng=random.Random(case))
+        except SorteoInfeasibleError:
+            assert not feasible, f'falso "sin solución" en el caso {case}'
+            continue
+
+        assert feasible
+        index = {pid: i for i, pid in enumerate(ids)}
+        assert is_valid(ids, [index[result[pid]] for pid in ids], allowed)
+
+
+def test_large_feasible_group_with_households():
+    # Dos hogares de 20: cada quien debe regalarle a alguien del otro hogar
+    participants = [{'id': str(i), 'category': 'diversion', 'household': 'ab'[i % 2]} for i in range(40)]
+    exclusions = {'0': {'1', '3'}, '2': {'1'}}
+    by_id = {p['id']: p for p in participants}
+    for seed in range(50):
+        result = solve_with_exclusions(participants, exclusions, ('household',), rng=random.Random(seed))
+        for giver, receiver in result.items():
+            assert receiver not in exclusions.get(giver, ())
+            assert by_id[giver]['household'] != by_id[receiver]['household']
+            assert result[receiver] != giver
+
+
+@pytest.mark.parametrize('n', [10, 12])
+def test_forced_swap_is_rejected_quickly(n):
+    # 0 solo puede regalarle a 1 y 1 solo a 0: el único sorteo sería un intercambio
+    participants = [{'id': str(i), 'category': 'diversion'} for i in range(n)]
+    others = {str(i) for i in range(2, n)}
+    exclusions = {'0': others, '1': others}
+    start = time.perf_counter()
+    with pytest.raises(SorteoInfeasibleError):
+        solve_with_exclusions(participants, exclusions, rng=random.Random(n))
+    assert time.perf_counter() - start < 1.0